@@ -91,15 +91,19 @@ def setup_pgvector():
         return False
 
 def verify_openai_key():
-    """Verify OpenAI API key is working"""
+    """Verify OpenAI API key and the configured embedding providers are working"""
     try:
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        # Test API key with a simple embedding request
-        response = client.embeddings.create(
-            input="test",
-            model="text-embedding-ada-002"
+        from software_auction.fastapi_app.services.embedding_providers import (
+            document_embedding_provider,
+            similarity_embedding_provider,
         )
+        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Listing models checks the key without spending tokens
+        client.models.list()
         logger.info("OpenAI API key verified successfully")
+        # Probe each provider once; the document provider must also match the vector column
+        for provider in {document_embedding_provider(), similarity_embedding_provider()}:
+            logger.info(f"Embedding provider verified: {provider.verify()}")
         return True
     except Exception as e:
         logger.error(f"Error verifying OpenAI API key: {e}")
@@ -133,6 +137,15 @@ def start_fastapi_server():
     )
     return fastapi_process
 
+def start_job_worker():
+    """Start the background job worker that runs queued ingestion and enrichment jobs"""
+    print("Starting job worker...")
+    return subprocess.Popen(
+        [sys.executable, str(BASE_DIR / 'manage.py'), 'run_job_worker'],
+        cwd=str(BASE_DIR),
+        env=os.environ.copy()
+    )
+
 def apply_migrations():
     """Apply Django migrations"""
     try:
@@ -148,6 +161,8 @@ def main():
     """Main function to start both servers"""
     # Store the current working directory
     original_cwd = os.getcwd()
+    # Server and worker subprocesses, stopped on the way out
+    children = []
     
     try:
         # Kill any existing processes on both ports
@@ -157,7 +172,7 @@ def main():
         
         # Start FastAPI server
         logger.info("Starting FastAPI server...")
-        fastapi_process = start_fastapi_server()
+        children.append(start_fastapi_server())
         
         # Wait a moment for FastAPI to start
         time.sleep(2)
@@ -171,6 +186,9 @@ def main():
         if not apply_migrations():
             logger.error("Database migration failed")
             sys.exit(1)
+
+        # Jobs queued by the Enrich button and /api/rag/ingest run here
+        children.append(start_job_worker())
         
         # Initialize required services
         if not verify_openai_key():
@@ -191,18 +209,16 @@ def main():
         
     except KeyboardInterrupt:
         logger.info("\nShutting down servers...")
-        if 'fastapi_process' in locals():
-            fastapi_process.terminate()
-            fastapi_process.wait()
         
     except Exception as e:
         logger.error(f"Error starting servers: {e}")
-        if 'fastapi_process' in locals():
-            fastapi_process.terminate()
-            fastapi_process.wait()
         sys.exit(1)
         
     finally:
+        # Also stops the children when a startup check exits early
+        for process in children:
+            process.terminate()
+            process.wait()
         # Restore the original working directory
         os.chdir(original_cwd)
 
@@ -1,4 +1,6 @@
+import atexit
 import os
+import sys
 from django.apps import AppConfig
 from django.conf import settings
 
@@ -7,4 +9,28 @@ class SoftwareAuctionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "software_auction"
     #model_path = os.path.join(settings.MODELS, 'test_model.keras')
-    #model = keras.models.load_model(model_path)
\ No newline at end of file
+    #model = keras.models.load_model(model_path)
+
+    def ready(self):
+        if not self._serves_requests():
+            return
+
+        # Build and warm the shared HybridRAG / AnalysisService off the
+        # import path; readiness is reported by the /ready/ endpoint
+        from .fastapi_app import lifecycle
+        lifecycle.startup(background=True)
+        atexit.register(lifecycle.shutdown)
+
+    @staticmethod
+    def _serves_requests() -> bool:
+        """Skip warm-up for management commands and the runserver reloader parent"""
+        if os.getenv('RAG_WARMUP', '1') == '0':
+            return False
+        argv = sys.argv
+        script = os.path.basename(argv[0]) if argv else ''
+        if script == 'manage.py' and (len(argv) < 2 or argv[1] != 'runserver'):
+            return False
+        if script in ('manage.py', 'server_script.py'):
+            # Only the autoreloader child process serves requests
+            return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+        return True
@@ -0,0 +1,15 @@
+import importlib
+
+# name -> module exposing run(**options) -> dict; run with `manage.py run_benchmark <name>`
+BENCHMARKS = {
+    'concurrency': 'software_auction.benchmarks.concurrency',
+    'filtered_search': 'software_auction.benchmarks.filtered_search',
+    'quantization': 'software_auction.benchmarks.quantization',
+    'retrieval': 'software_auction.benchmarks.retrieval',
+}
+
+
+def get_benchmark(name: str):
+    if name not in BENCHMARKS:
+        raise ValueError(f"Unknown benchmark: {name}")
+    return importlib.import_module(BENCHMARKS[name])
@@ -0,0 +1,172 @@
+import math
+import random
+import time
+from typing import Dict, List, Any, Callable, Iterable, Optional
+
+from django.db import connection, transaction
+
+from software_auction.fastapi_app.models import Document
+from software_auction.fastapi_app.rag.vector_index import (
+    vector_index_definitions,
+    drop_vector_indexes,
+    restore_vector_indexes,
+    create_vector_index,
+)
+
+EMBEDDING_DIMENSIONS = 1536
+
+# A case regresses against a baseline run when p95 latency grows by more than
+# LATENCY_TOLERANCE (relative) or recall drops by more than RECALL_TOLERANCE (absolute)
+LATENCY_TOLERANCE = 0.2
+RECALL_TOLERANCE = 0.01
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max in milliseconds"""
+    ms = [s * 1000 for s in seconds]
+    return {
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'max_ms': round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def timed(fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def recall_at_k(found: Iterable, expected: Iterable) -> float:
+    expected = set(expected)
+    if not expected:
+        return 1.0
+    return len(expected & set(found)) / len(expected)
+
+
+def random_vectors(count: int, seed: int = 0, dimensions: int = EMBEDDING_DIMENSIONS) -> List[List[float]]:
+    rng = random.Random(seed)
+    return [[rng.random() for _ in range(dimensions)] for _ in range(count)]
+
+
+def pgvector_version() -> Optional[str]:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def environment() -> Dict[str, Any]:
+    """Server versions and settings that move benchmark numbers between runs"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT current_setting('server_version'), current_setting('shared_buffers'), "
+            "current_setting('work_mem'), current_setting('max_parallel_workers_per_gather')"
+        )
+        server_version, shared_buffers, work_mem, parallel_workers = cursor.fetchone()
+    return {
+        'postgres_version': server_version,
+        'pgvector_version': pgvector_version(),
+        'shared_buffers': shared_buffers,
+        'work_mem': work_mem,
+        'max_parallel_workers_per_gather': parallel_workers,
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    latency_tolerance: float = LATENCY_TOLERANCE,
+                    recall_tolerance: float = RECALL_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Cases (results entries with a 'case' key) present in both runs whose p95
+    latency or recall got worse by more than the tolerances.
+    """
+    before = {result['case']: result for result in baseline.get('results', []) if 'case' in result}
+    regressions = []
+    for result in current.get('results', []):
+        old = before.get(result.get('case'))
+        if old is None:
+            continue
+        if old.get('p95_ms') and result.get('p95_ms', 0) > old['p95_ms'] * (1 + latency_tolerance):
+            regressions.append({'case': result['case'], 'metric': 'p95_ms',
+                                'baseline': old['p95_ms'], 'current': result['p95_ms']})
+        if 'recall' in old and result.get('recall', 0) < old['recall'] - recall_tolerance:
+            regressions.append({'case': result['case'], 'metric': 'recall',
+                                'baseline': old['recall'], 'current': result['recall']})
+    return regressions
+
+
+def benchmark_rows(tag: str) -> int:
+    return Document.objects.filter(metadata__contains={'benchmark': tag}).count()
+
+
+def seed_benchmark_rows(tag: str, rows: int, batch_size: int = 50_000, build_index: bool = True) -> Dict[str, Any]:
+    """
+    Top up synthetic Document rows tagged metadata.benchmark = tag to `rows`.
+
+    Vectors are generated server side so seeding 1M rows doesn't ship 6GB of
+    floats over the wire. Each row also carries boolean metadata keys p50,
+    p10 and p1 that match 50%, 10% and 1% of the rows, for filter
+    selectivity tests. ANN indexes are dropped during the load and rebuilt;
+    with build_index=False a table that had none is left without one.
+    """
+    existing = benchmark_rows(tag)
+    if existing >= rows:
+        return {'seeded': 0, 'rows': existing, 'seconds': 0.0}
+
+    start = time.perf_counter()
+    deferred = vector_index_definitions()
+    drop_vector_indexes()
+    try:
+        table = Document._meta.db_table
+        for first in range(existing, rows, batch_size):
+            last = min(first + batch_size, rows) - 1
+            with transaction.atomic(), connection.cursor() as cursor:
+                # The correlated "WHERE i IS NOT NULL" makes Postgres draw a new vector per row
+                cursor.execute(f"""
+                    INSERT INTO {table} (content, embedding, metadata, content_hash, created_at, updated_at)
+                    SELECT
+                        'benchmark document ' || i,
+                        (SELECT array_agg(random()::real) FROM generate_series(1, %s) WHERE i IS NOT NULL)::vector,
+                        jsonb_build_object(
+                            'benchmark', %s::text,
+                            'type', 'benchmark',
+                            'p50', i %% 2 = 0,
+                            'p10', i %% 10 = 0,
+                            'p1', i %% 100 = 0,
+                            'timestamp', extract(epoch FROM now()) - i
+                        ),
+                        '', now(), now()
+                    FROM generate_series(%s, %s) AS i
+                """, [EMBEDDING_DIMENSIONS, tag, first, last])
+    finally:
+        if deferred:
+            restore_vector_indexes(deferred)
+        elif build_index:
+            create_vector_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Document._meta.db_table}")
+
+    return {'seeded': rows - existing, 'rows': rows, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def delete_benchmark_rows(tag: str) -> int:
+    deleted, _ = Document.objects.filter(metadata__contains={'benchmark': tag}).delete()
+    return deleted
+
+
+def exact_search(run: Callable[[], Any]):
+    """Evaluate run() with ANN index scans disabled, giving the exact top-k"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('enable_indexscan', 'off', true)")
+        return run()
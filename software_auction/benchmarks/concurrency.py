@@ -0,0 +1,168 @@
+"""
+Concurrent requests against the FastAPI app.
+
+Serves the stub OpenAI API (stub_server) on a free local port, points the
+shared OpenAI clients at it and sends bursts of N simultaneous requests to
+each endpoint in ENDPOINTS through httpx's ASGI transport, so the app runs
+on this process's event loop exactly as it does under uvicorn. While a
+burst is in flight a health check is timed as well.
+
+Handlers that await the async client finish N requests in about the time
+of one: `speedup` (N x single-request time / burst wall time) stays close
+to N and the health check stays fast. A handler that blocks the event loop
+serializes the burst, so its speedup sits near 1 and the health check
+waits behind it.
+"""
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import httpx
+
+from software_auction.fastapi_app.services.openai_clients import close_openai_clients
+from software_auction.fastapi_app.settings import STUB_SERVER_CONFIG
+
+from .common import latency_summary
+
+logger = logging.getLogger(__name__)
+
+TAG = 'concurrency'
+CONCURRENCY = (1, 8, 32)
+# name -> (method, path, JSON body)
+ENDPOINTS = {
+    'text_query': ('POST', '/api/rag/text_query', {'query': "Summarize the benefits of code review."}),
+    'generate_insights': ('POST', '/api/speech/generate-insights/', {'text': "Quarterly planning meeting notes."}),
+}
+HEALTH_CHECK = ('GET', '/api/health-check', None)
+# Sequential requests whose median is the single-request time
+BASELINE_REQUESTS = 5
+# Head start for a burst before the health check is sent
+PROBE_DELAY = 0.05
+REQUEST_TIMEOUT = 120.0
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_stub_server(latency_scale: float):
+    """Stub OpenAI API on a background thread; returns (server, thread, base_url)"""
+    import uvicorn
+    from .stub_server import create_app
+
+    # No simulated errors or rate limits: the benchmark measures the app, not the retry path
+    config = {**STUB_SERVER_CONFIG, 'LATENCY_SCALE': latency_scale, 'ERROR_RATE': 0.0, 'RATE_LIMITS': {}}
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, name='stub-server', daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("Stub server did not start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def _request(client: httpx.AsyncClient, method: str, path: str,
+                   body: Optional[Dict[str, Any]]) -> Tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, json=body)
+        ok = response.status_code < 400
+    except httpx.HTTPError as e:
+        logger.warning(f"{method} {path} failed: {str(e)}")
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+async def _burst(client: httpx.AsyncClient, endpoint: str, concurrency: int):
+    """(wall seconds, [(seconds, ok)] per request, health check seconds)"""
+    method, path, body = ENDPOINTS[endpoint]
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(_request(client, method, path, body)) for _ in range(concurrency)]
+    await asyncio.sleep(PROBE_DELAY)
+    probe_seconds, _ = await _request(client, *HEALTH_CHECK)
+    results = await asyncio.gather(*tasks)
+    return time.perf_counter() - start, results, probe_seconds
+
+
+async def _run_endpoint(client: httpx.AsyncClient, endpoint: str, concurrency: Sequence[int]) -> List[Dict[str, Any]]:
+    method, path, body = ENDPOINTS[endpoint]
+    baseline = [await _request(client, method, path, body) for _ in range(BASELINE_REQUESTS)]
+    single = statistics.median(seconds for seconds, _ in baseline)
+
+    results = []
+    for level in concurrency:
+        wall, requests, probe = await _burst(client, endpoint, level)
+        results.append({
+            'case': f"{endpoint} c={level}",
+            'endpoint': endpoint,
+            'concurrency': level,
+            'wall_ms': round(wall * 1000, 3),
+            'single_request_ms': round(single * 1000, 3),
+            # ~concurrency when requests overlap, ~1 when the event loop serializes them
+            'speedup': round(level * single / wall, 2) if wall else 0.0,
+            'health_check_ms': round(probe * 1000, 3),
+            'errors': sum(1 for _, ok in requests if not ok),
+            **latency_summary([seconds for seconds, _ in requests]),
+        })
+        logger.info(f"Concurrency benchmark {results[-1]['case']}: speedup {results[-1]['speedup']}")
+    return results
+
+
+async def _run(concurrency: Sequence[int], endpoints: Sequence[str]) -> List[Dict[str, Any]]:
+    from software_auction.fastapi_app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark',
+                                     timeout=REQUEST_TIMEOUT) as client:
+            results = []
+            for endpoint in endpoints:
+                results.extend(await _run_endpoint(client, endpoint, concurrency))
+            return results
+    finally:
+        # The async client's pool belongs to this event loop
+        await close_openai_clients()
+
+
+def run(concurrency: Sequence[int] = None, endpoints: Sequence[str] = None, latency_scale: float = 1.0,
+        **options) -> Dict[str, Any]:
+    concurrency = sorted(concurrency or CONCURRENCY)
+    endpoints = list(endpoints or ENDPOINTS)
+    unknown = [endpoint for endpoint in endpoints if endpoint not in ENDPOINTS]
+    if unknown:
+        raise ValueError(f"Unknown endpoint(s): {', '.join(unknown)}. Choose from: {', '.join(ENDPOINTS)}")
+
+    server, thread, base_url = _start_stub_server(latency_scale)
+    saved = {key: os.environ.get(key) for key in ('OPENAI_BASE_URL', 'OPENAI_API_KEY')}
+    os.environ.update({'OPENAI_BASE_URL': f"{base_url}/v1", 'OPENAI_API_KEY': 'stub'})
+    try:
+        # Drop clients created before the environment pointed at the stub
+        asyncio.run(close_openai_clients())
+        results = asyncio.run(_run(concurrency, endpoints))
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return {
+        'benchmark': TAG,
+        'concurrency': concurrency,
+        'endpoints': endpoints,
+        'latency_scale': latency_scale,
+        'stub_latency': STUB_SERVER_CONFIG['LATENCY'],
+        'results': results,
+    }
@@ -0,0 +1,108 @@
+"""
+Filtered ANN search latency and recall.
+
+Seeds synthetic rows (1M by default), then runs the same random query
+vectors unfiltered and under metadata filters of 50%, 10% and 1%
+selectivity, with each filtered-search strategy:
+
+    plain      the ANN scan as-is; selective filters return fewer than k rows
+    overfetch  ef_search / probes widened by RETRIEVAL_CONFIG['FILTER_OVERFETCH']
+    iterative  pgvector >= 0.8 iterative index scans (relaxed order)
+
+Recall is measured against an exact scan with the same filter.
+"""
+import logging
+from typing import Dict, List, Any
+
+from software_auction.fastapi_app.models import Document
+from software_auction.fastapi_app.rag.retrieval import filter_expression, search_params
+from software_auction.fastapi_app.rag.vector_index import ann_search_params, distance_expression
+from software_auction.fastapi_app.settings import VECTOR_INDEX_CONFIG
+
+from .common import (
+    delete_benchmark_rows,
+    exact_search,
+    latency_summary,
+    pgvector_version,
+    random_vectors,
+    recall_at_k,
+    seed_benchmark_rows,
+    timed,
+)
+
+logger = logging.getLogger(__name__)
+
+TAG = 'filtered_search'
+FILTERS = {
+    'none': None,
+    'p50': {'p50': True},
+    'p10': {'p10': True},
+    'p1': {'p1': True},
+}
+
+
+def _top_k(query_vector: List[float], k: int, filters) -> List[int]:
+    documents = Document.objects.all()
+    if filters:
+        documents = documents.filter(filter_expression(filters))
+    return list(
+        documents.annotate(distance=distance_expression(query_vector))
+        .order_by('distance')
+        .values_list('id', flat=True)[:k]
+    )
+
+
+def _search(query_vector: List[float], k: int, filters, params: Dict[str, Any]) -> List[int]:
+    with ann_search_params(**params):
+        return _top_k(query_vector, k, filters)
+
+
+def run(rows: int = 1_000_000, queries: int = 50, k: int = 10, keep: bool = False, **options) -> Dict[str, Any]:
+    seeding = seed_benchmark_rows(TAG, rows)
+    logger.info(f"Benchmark data ready: {seeding}")
+
+    version = pgvector_version()
+    strategies = ['plain', 'overfetch']
+    if version and tuple(int(part) for part in version.split('.')[:2]) >= (0, 8):
+        strategies.append('iterative')
+
+    query_vectors = random_vectors(queries, seed=42)
+    results = []
+    try:
+        for filter_name, filters in FILTERS.items():
+            expected = [exact_search(lambda: _top_k(vector, k, filters)) for vector in query_vectors]
+            for strategy in strategies:
+                if filters is None and strategy != 'plain':
+                    continue
+                params = search_params(k, filters=filters, strategy=strategy)
+                # Warm the index pages before timing
+                _search(query_vectors[0], k, filters, params)
+
+                latencies, recalls, returned = [], [], []
+                for vector, truth in zip(query_vectors, expected):
+                    found, seconds = timed(_search, vector, k, filters, params)
+                    latencies.append(seconds)
+                    recalls.append(recall_at_k(found, truth))
+                    returned.append(len(found))
+
+                results.append({
+                    'filter': filter_name,
+                    'strategy': strategy,
+                    **latency_summary(latencies),
+                    f'recall_at_{k}': round(sum(recalls) / len(recalls), 4),
+                    'avg_returned': round(sum(returned) / len(returned), 2),
+                })
+    finally:
+        if not keep:
+            delete_benchmark_rows(TAG)
+
+    return {
+        'benchmark': TAG,
+        'rows': rows,
+        'queries': queries,
+        'k': k,
+        'pgvector_version': version,
+        'index_config': VECTOR_INDEX_CONFIG,
+        'seeding': seeding,
+        'results': results,
+    }
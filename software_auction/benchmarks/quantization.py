@@ -0,0 +1,127 @@
+"""
+Index size, build time, latency and recall for compressed vector indexes.
+
+Builds an HNSW index on each representation in turn over the same seeded
+rows (full-precision vector, halfvec, binary quantization) and runs the
+same random queries through rag.retrieval.vector_search, i.e. a coarse
+search on the index followed by an exact rerank on the stored vectors.
+Recall is reported with the configured RERANK_FACTOR and without rerank
+(factor 1), against an exact scan.
+"""
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from django.db import connection
+
+from software_auction.fastapi_app.models import Document
+from software_auction.fastapi_app.rag.retrieval import vector_search
+from software_auction.fastapi_app.rag.vector_index import (
+    create_vector_index,
+    distance_expression,
+    drop_vector_indexes,
+    restore_vector_indexes,
+    vector_index_definitions,
+)
+from software_auction.fastapi_app.settings import VECTOR_INDEX_CONFIG
+
+from .common import (
+    delete_benchmark_rows,
+    exact_search,
+    latency_summary,
+    pgvector_version,
+    random_vectors,
+    recall_at_k,
+    seed_benchmark_rows,
+    timed,
+)
+
+logger = logging.getLogger(__name__)
+
+TAG = 'quantization'
+VARIANTS = (None, 'halfvec', 'binary')
+
+
+def _relation_size(name: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_relation_size(%s::regclass)", [name])
+        return cursor.fetchone()[0]
+
+
+def _exact_ids(query_vector, k: int):
+    return list(
+        Document.objects.annotate(distance=distance_expression(query_vector))
+        .order_by('distance')
+        .values_list('id', flat=True)[:k]
+    )
+
+
+def _measure(query_vectors, expected, k: int, quantization: Optional[str], rerank_factor: int = None) -> Dict[str, Any]:
+    # Warm the index pages before timing
+    vector_search(query_vectors[0], k=k, quantization=quantization or 'none', rerank_factor=rerank_factor)
+    latencies, recalls = [], []
+    for vector, truth in zip(query_vectors, expected):
+        hits, seconds = timed(
+            vector_search, vector, k=k, quantization=quantization or 'none', rerank_factor=rerank_factor
+        )
+        latencies.append(seconds)
+        recalls.append(recall_at_k([hit['id'] for hit in hits], truth))
+    return {**latency_summary(latencies), f'recall_at_{k}': round(sum(recalls) / len(recalls), 4)}
+
+
+def run(rows: int = 1_000_000, queries: int = 50, k: int = 10, keep: bool = False, **options) -> Dict[str, Any]:
+    seeding = seed_benchmark_rows(TAG, rows)
+    logger.info(f"Benchmark data ready: {seeding}")
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_table_size(%s::regclass), current_setting('shared_buffers')",
+            [Document._meta.db_table]
+        )
+        table_bytes, shared_buffers = cursor.fetchone()
+
+    query_vectors = random_vectors(queries, seed=7)
+    expected = [exact_search(lambda: _exact_ids(vector, k)) for vector in query_vectors]
+
+    original = vector_index_definitions()
+    drop_vector_indexes()
+    results = []
+    try:
+        for quantization in VARIANTS:
+            start = time.perf_counter()
+            index = create_vector_index('hnsw', quantization=quantization or 'none')
+            build_seconds = time.perf_counter() - start
+            size = _relation_size(index['name'])
+
+            result = {
+                'quantization': quantization or 'none',
+                'index': index['name'],
+                'opclass': index['opclass'],
+                'build_seconds': round(build_seconds, 3),
+                'index_bytes': size,
+                'index_mb': round(size / (1024 * 1024), 1),
+                'index_bytes_per_row': round(size / max(rows, 1), 1),
+                'reranked': _measure(query_vectors, expected, k, quantization),
+            }
+            if quantization:
+                result['rerank_factor'] = VECTOR_INDEX_CONFIG.get('RERANK_FACTOR', 4)
+                result['no_rerank'] = _measure(query_vectors, expected, k, quantization, rerank_factor=1)
+            results.append(result)
+            drop_vector_indexes()
+    finally:
+        drop_vector_indexes()
+        restore_vector_indexes(original)
+        if not keep:
+            delete_benchmark_rows(TAG)
+
+    return {
+        'benchmark': TAG,
+        'rows': rows,
+        'queries': queries,
+        'k': k,
+        'pgvector_version': pgvector_version(),
+        'table_bytes': table_bytes,
+        'shared_buffers': shared_buffers,
+        'seeding': seeding,
+        'results': results,
+    }
@@ -0,0 +1,215 @@
+"""
+Retrieval latency and recall across corpus sizes and index settings.
+
+Grows one synthetic corpus through each size in `sizes` (10k to 10M rows)
+and, at every size, runs the same random queries through
+rag.retrieval.vector_search - the database half of get_factual_context,
+without the embedding call - under:
+
+    seqscan   no ANN index (exact; skipped above SEQSCAN_MAX_ROWS)
+    hnsw      one index per m value, queried at each ef_search value
+    ivfflat   default lists for the row count, queried at each probes value
+
+Each case is repeated at every concurrency level, with one thread and
+database connection per concurrent client. Results are flat records keyed
+by 'case' so two runs can be diffed with common.compare_results.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Any, Callable, Sequence
+
+from django.db import connection
+
+from software_auction.fastapi_app.models import Document
+from software_auction.fastapi_app.rag.retrieval import vector_search
+from software_auction.fastapi_app.rag.vector_index import (
+    create_vector_index,
+    distance_expression,
+    drop_vector_indexes,
+    restore_vector_indexes,
+    vector_index_definitions,
+)
+from software_auction.fastapi_app.settings import VECTOR_DISTANCE_METRIC, VECTOR_INDEX_CONFIG
+
+from .common import (
+    delete_benchmark_rows,
+    environment,
+    exact_search,
+    latency_summary,
+    random_vectors,
+    recall_at_k,
+    seed_benchmark_rows,
+)
+
+logger = logging.getLogger(__name__)
+
+TAG = 'retrieval'
+SIZES = (10_000, 100_000, 1_000_000)
+M_VALUES = (8, 16, 32)
+EF_SEARCH_VALUES = (10, 20, 40, 80, 160, 320)
+PROBES_VALUES = (1, 2, 4, 8, 16, 32)
+CONCURRENCY = (1, 4, 16)
+# Exact scans over larger corpora take minutes per query at high concurrency
+SEQSCAN_MAX_ROWS = 1_000_000
+
+
+def _exact_ids(query_vector, k: int) -> List[int]:
+    return list(
+        Document.objects.annotate(distance=distance_expression(query_vector))
+        .order_by('distance')
+        .values_list('id', flat=True)[:k]
+    )
+
+
+def _relation_size(name: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_relation_size(%s::regclass)", [name])
+        return cursor.fetchone()[0]
+
+
+def _client(search: Callable, query_vectors: Sequence, offset: int, barrier: threading.Barrier,
+            latencies: List[float], found: List[tuple], errors: List[Exception]):
+    """One concurrent client: every query once, starting at its own offset"""
+    try:
+        barrier.wait()
+        for step in range(len(query_vectors)):
+            position = (offset + step) % len(query_vectors)
+            start = time.perf_counter()
+            hits = search(query_vectors[position])
+            latencies.append(time.perf_counter() - start)
+            found.append((position, [hit['id'] for hit in hits]))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        # Each thread gets its own Django connection; don't leak it
+        connection.close()
+
+
+def _measure(search: Callable, query_vectors, expected, k: int, concurrency: int) -> Dict[str, Any]:
+    # Warm the index pages before timing
+    search(query_vectors[0])
+
+    latencies, found, errors = [], [], []
+    barrier = threading.Barrier(concurrency + 1)
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(search, query_vectors, i * len(query_vectors) // concurrency, barrier, latencies, found, errors),
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    recalls = [recall_at_k(ids, expected[position]) for position, ids in found]
+    return {
+        'queries': len(latencies),
+        'qps': round(len(latencies) / wall_seconds, 1) if wall_seconds else 0.0,
+        **latency_summary(latencies),
+        'recall': round(sum(recalls) / len(recalls), 4),
+    }
+
+
+def _cases(rows: int, query_vectors, expected, k: int, concurrency: Sequence[int],
+           index: Dict[str, Any], setting: str, values: Sequence, build_seconds: float = None) -> List[Dict[str, Any]]:
+    results = []
+    index_bytes = _relation_size(index['name']) if index else 0
+    for value in values:
+        params = {setting: value} if setting else {}
+
+        def search(vector, params=params):
+            return vector_search(vector, k=k, quantization='none', **params)
+
+        for clients in concurrency:
+            label = index['type'] if index else 'seqscan'
+            options = dict(index['options']) if index else {}
+            case = '/'.join(
+                [f"rows={rows}", label]
+                + [f"{key}={option}" for key, option in options.items()]
+                + [f"{key}={option}" for key, option in params.items()]
+                + [f"concurrency={clients}"]
+            )
+            result = {
+                'case': case,
+                'rows': rows,
+                'index': label,
+                **options,
+                **params,
+                'concurrency': clients,
+                'k': k,
+                **_measure(search, query_vectors, expected, k, clients),
+            }
+            if index:
+                result['index_mb'] = round(index_bytes / (1024 * 1024), 1)
+                result['build_seconds'] = build_seconds
+            logger.info(f"{case}: p95 {result['p95_ms']}ms, recall {result['recall']}, {result['qps']} qps")
+            results.append(result)
+    return results
+
+
+def _build(index_type: str, **params):
+    drop_vector_indexes()
+    start = time.perf_counter()
+    index = create_vector_index(index_type, quantization='none', **params)
+    return index, round(time.perf_counter() - start, 3)
+
+
+def run(rows: int = None, queries: int = 50, k: int = 10, keep: bool = False, sizes: Sequence[int] = None,
+        m_values: Sequence[int] = None, ef_search_values: Sequence[int] = None,
+        probes_values: Sequence[int] = None, concurrency: Sequence[int] = None, **options) -> Dict[str, Any]:
+    sizes = sorted(sizes or ([rows] if rows else SIZES))
+    m_values = m_values or M_VALUES
+    ef_search_values = ef_search_values or EF_SEARCH_VALUES
+    probes_values = probes_values or PROBES_VALUES
+    concurrency = concurrency or CONCURRENCY
+
+    query_vectors = random_vectors(queries, seed=11)
+    original = vector_index_definitions()
+    drop_vector_indexes()
+    seeding, results = [], []
+    try:
+        for size in sizes:
+            # The corpus only grows, so each size tops up the previous one
+            seeding.append({'size': size, **seed_benchmark_rows(TAG, size, build_index=False)})
+            drop_vector_indexes()
+            total_rows = Document.objects.count()
+            expected = [exact_search(lambda: _exact_ids(vector, k)) for vector in query_vectors]
+
+            if size <= SEQSCAN_MAX_ROWS:
+                results.extend(_cases(size, query_vectors, expected, k, concurrency, None, None, [None]))
+
+            for m in m_values:
+                index, build_seconds = _build('hnsw', m=m)
+                results.extend(_cases(size, query_vectors, expected, k, concurrency,
+                                      index, 'ef_search', ef_search_values, build_seconds))
+
+            index, build_seconds = _build('ivfflat')
+            results.extend(_cases(size, query_vectors, expected, k, concurrency,
+                                  index, 'probes', probes_values, build_seconds))
+            drop_vector_indexes()
+            logger.info(f"Retrieval benchmark finished {size} rows ({total_rows} documents in table)")
+    finally:
+        drop_vector_indexes()
+        restore_vector_indexes(original)
+        if not keep:
+            delete_benchmark_rows(TAG)
+
+    return {
+        'benchmark': TAG,
+        'sizes': sizes,
+        'queries': queries,
+        'k': k,
+        'environment': environment(),
+        'metric': VECTOR_DISTANCE_METRIC,
+        'hnsw_ef_construction': VECTOR_INDEX_CONFIG['HNSW_EF_CONSTRUCTION'],
+        'seeding': seeding,
+        'results': results,
+    }
@@ -0,0 +1,418 @@
+"""
+Local stand-in for the OpenAI and Google Custom Search APIs.
+
+    python manage.py run_stub_server
+    export OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub
+    export GOOGLE_CSE_URL=http://127.0.0.1:8900/customsearch/v1
+
+Implements the endpoints the project calls: embeddings, chat completions
+(including streaming), audio transcriptions, audio speech, models and
+custom search. Response content is a deterministic function of the request:
+the same text always gets the same embedding and the same prompt the same
+reply. Embeddings are signed feature hashes of the words, so texts that
+share vocabulary are close and retrieval behaves plausibly.
+
+Latency is sampled per endpoint from a lognormal distribution with the
+configured median and p99, ERROR_RATE of requests fail with a 5xx, and
+per-endpoint RPM/TPM token buckets answer 429 with Retry-After and
+x-ratelimit-* headers like the real API. Counters are served at /stub/stats.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from software_auction.fastapi_app.settings import STUB_SERVER_CONFIG
+
+# z-score of the 99th percentile of a standard normal
+Z_99 = 2.3263
+WORD = re.compile(r"\w+")
+# Embedding dimensions per model; unknown models get the ada-002 size
+MODEL_DIMENSIONS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+}
+VOCABULARY = (
+    "software auction bidding platform vendor contract license pricing market analysis knowledge "
+    "customer integration security deployment performance latency throughput database search vector "
+    "report insight recommendation strategy evaluation requirement feature release support budget"
+).split()
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, ~26 ms)
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def _seed(*parts: Any) -> int:
+    digest = hashlib.sha256("\x00".join(str(part) for part in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, like the OpenAI rule of thumb"""
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=100_000)
+def _word_features(model: str, word: str, dimensions: int) -> tuple:
+    """8 (index, sign) pairs a word adds to its text's embedding"""
+    rng = random.Random(_seed(model, word))
+    return tuple((rng.randrange(dimensions), 1.0 if rng.random() < 0.5 else -1.0) for _ in range(8))
+
+
+def stub_embedding(model: str, text: str, dimensions: int) -> List[float]:
+    """Unit vector from signed feature hashing of the lower-cased words"""
+    vector = [0.0] * dimensions
+    words = WORD.findall(text.lower())
+    for word in words:
+        for index, sign in _word_features(model, word, dimensions):
+            vector[index] += sign
+    if not words:
+        rng = random.Random(_seed(model, text))
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def stub_words(count: int, *seed_parts: Any) -> List[str]:
+    rng = random.Random(_seed(*seed_parts))
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+class LatencyModel:
+    """Lognormal latency with a given median and 99th percentile"""
+
+    def __init__(self, median_ms: float, p99_ms: float, token_ms: float = 0.0, scale: float = 1.0,
+                 rng: random.Random = None):
+        self.mu = math.log(max(median_ms, 0.001) / 1000)
+        self.sigma = math.log(p99_ms / median_ms) / Z_99 if p99_ms > median_ms > 0 else 0.0
+        self.token_seconds = token_ms / 1000
+        self.scale = scale
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        if self.scale <= 0:
+            return 0.0
+        return self.scale * self.rng.lognormvariate(self.mu, self.sigma)
+
+    def token_gap(self) -> float:
+        return self.scale * self.token_seconds
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute token buckets"""
+
+    def __init__(self, rpm: Optional[int], tpm: Optional[int]):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm or 0)
+        self.tokens = float(tpm or 0)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> Optional[float]:
+        """Take capacity for one request; returns seconds to wait instead when over the limit"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self.updated_at = now - self.updated_at, now
+            if self.rpm:
+                self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+            if self.tpm:
+                self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+            wait = 0.0
+            if self.rpm and self.requests < 1:
+                wait = max(wait, (1 - self.requests) * 60 / self.rpm)
+            if self.tpm and self.tokens < tokens:
+                wait = max(wait, (min(tokens, self.tpm) - self.tokens) * 60 / self.tpm)
+            if wait:
+                return wait
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= tokens
+            return None
+
+    def headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.rpm:
+            headers['x-ratelimit-limit-requests'] = str(self.rpm)
+            headers['x-ratelimit-remaining-requests'] = str(int(self.requests))
+        if self.tpm:
+            headers['x-ratelimit-limit-tokens'] = str(self.tpm)
+            headers['x-ratelimit-remaining-tokens'] = str(int(self.tokens))
+        return headers
+
+
+class StubState:
+    """Latency models, rate limiters and counters shared by the endpoints"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.rng = random.Random(config['SEED'])
+        self.latency = {
+            name: LatencyModel(spec['MEDIAN_MS'], spec['P99_MS'], spec.get('TOKEN_MS', 0.0),
+                               config['LATENCY_SCALE'], self.rng)
+            for name, spec in config['LATENCY'].items()
+        }
+        self.limiters = {
+            name: RateLimiter(spec.get('RPM'), spec.get('TPM'))
+            for name, spec in config['RATE_LIMITS'].items()
+        }
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.time()
+        self.counters = {
+            name: {'requests': 0, 'errors': 0, 'rate_limited': 0, 'tokens': 0}
+            for name in self.config['LATENCY']
+        }
+
+    async def admit(self, endpoint: str, tokens: int = 1, google: bool = False):
+        """
+        Apply rate limiting, latency and error injection for one request.
+        Returns (error_response or None, headers for the successful response).
+        """
+        counters = self.counters[endpoint]
+        counters['requests'] += 1
+        limiter = self.limiters.get(endpoint)
+        headers = {}
+        if limiter is not None:
+            wait = limiter.acquire(tokens)
+            headers = limiter.headers()
+            if wait is not None:
+                counters['rate_limited'] += 1
+                headers.update({'retry-after': str(math.ceil(wait)), 'retry-after-ms': str(int(wait * 1000))})
+                return _error(429, "Rate limit reached (stub)", 'rate_limit_exceeded', google, headers), headers
+
+        await asyncio.sleep(self.latency[endpoint].sample())
+        if self.rng.random() < self.config['ERROR_RATE']:
+            counters['errors'] += 1
+            status = self.rng.choice((500, 502, 503))
+            return _error(status, "Injected server error (stub)", 'server_error', google), headers
+
+        counters['tokens'] += tokens
+        return None, headers
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'endpoints': self.counters,
+            'config': {key: self.config[key] for key in ('LATENCY_SCALE', 'ERROR_RATE', 'SEED')},
+        }
+
+
+def _error(status: int, message: str, code: str, google: bool = False, headers: Dict[str, str] = None):
+    if google:
+        body = {'error': {'code': status, 'message': message, 'status': code.upper()}}
+    else:
+        kind = 'requests' if status == 429 else 'server_error'
+        body = {'error': {'message': message, 'type': kind, 'param': None, 'code': code}}
+    return JSONResponse(status_code=status, content=body, headers=headers)
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get('content') or ''
+        if isinstance(content, list):
+            content = " ".join(part.get('text', '') for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def stub_reply(messages: List[Dict[str, Any]], max_tokens: Optional[int], json_mode: bool) -> str:
+    """Deterministic reply; mirrors the section layout that callers parse"""
+    prompt = _message_text(messages)
+    length = min(max_tokens or STUB_SERVER_CONFIG['COMPLETION_TOKENS'], STUB_SERVER_CONFIG['COMPLETION_TOKENS'])
+    words = stub_words(length, 'chat', prompt)
+    text = " ".join(words)
+    if json_mode:
+        return json.dumps({'response': text})
+    if 'CONTENT TYPE:' in prompt:
+        half = len(words) // 2
+        return f"SUMMARY:\n{' '.join(words[:half])}\n\nCONTENT TYPE:\nTechnical documentation\n{' '.join(words[half:])}"
+    return text
+
+
+def create_app(config: Dict[str, Any] = None) -> FastAPI:
+    state = StubState(config or STUB_SERVER_CONFIG)
+    app = FastAPI(title="OpenAI / Custom Search stub")
+    app.state.stub = state
+
+    @app.get("/v1/models")
+    async def list_models():
+        error, headers = await state.admit('models')
+        if error:
+            return error
+        models = list(MODEL_DIMENSIONS) + ['gpt-4o', 'gpt-4', 'gpt-3.5-turbo', 'whisper-1', 'tts-1']
+        return JSONResponse({
+            'object': 'list',
+            'data': [{'id': model, 'object': 'model', 'created': 0, 'owned_by': 'stub'} for model in models],
+        }, headers=headers)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        model = body.get('model', 'text-embedding-ada-002')
+        inputs = body.get('input', [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [item if isinstance(item, str) else " ".join(map(str, item)) for item in inputs]
+        tokens = sum(estimate_tokens(text) for text in texts)
+
+        error, headers = await state.admit('embeddings', tokens)
+        if error:
+            return error
+
+        dimensions = body.get('dimensions') or MODEL_DIMENSIONS.get(model, 1536)
+        base64_encoded = body.get('encoding_format') == 'base64'
+        data = []
+        for index, text in enumerate(texts):
+            vector = stub_embedding(model, text, dimensions)
+            if base64_encoded:
+                vector = base64.b64encode(array('f', vector).tobytes()).decode('ascii')
+            data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+        return JSONResponse({
+            'object': 'list',
+            'data': data,
+            'model': model,
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        }, headers=headers)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get('model', 'gpt-4o')
+        messages = body.get('messages', [])
+        max_tokens = body.get('max_completion_tokens') or body.get('max_tokens')
+        json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+        prompt_tokens = estimate_tokens(_message_text(messages))
+
+        error, headers = await state.admit('chat', prompt_tokens + (max_tokens or 0))
+        if error:
+            return error
+
+        reply = stub_reply(messages, max_tokens, json_mode)
+        completion_tokens = estimate_tokens(reply)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get('stream'):
+            return JSONResponse({
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': reply},
+                    'finish_reason': 'stop',
+                }],
+                'usage': usage,
+            }, headers=headers)
+
+        include_usage = (body.get('stream_options') or {}).get('include_usage')
+        gap = state.latency['chat'].token_gap()
+
+        def chunk(delta: Dict[str, Any], finish_reason: str = None, **extra) -> str:
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}] if delta is not None else [],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({'role': 'assistant', 'content': ''})
+            for i, word in enumerate(reply.split(' ')):
+                await asyncio.sleep(gap)
+                yield chunk({'content': word if i == 0 else f" {word}"})
+            yield chunk({}, 'stop')
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type='text/event-stream', headers=headers)
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get('file')
+        content = await upload.read() if upload is not None else b''
+        response_format = form.get('response_format', 'json')
+
+        error, headers = await state.admit('transcriptions')
+        if error:
+            return error
+
+        # Roughly one word per 2 KB of compressed audio
+        digest = hashlib.sha256(content).hexdigest()
+        text = " ".join(stub_words(min(200, max(5, len(content) // 2048)), 'transcription', digest)).capitalize() + "."
+        if response_format == 'text':
+            return PlainTextResponse(text, headers=headers)
+        body = {'text': text}
+        if response_format == 'verbose_json':
+            body.update(language=form.get('language', 'en'), duration=round(len(content) / 16000, 2))
+        return JSONResponse(body, headers=headers)
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        text = body.get('input', '')
+
+        error, headers = await state.admit('speech', estimate_tokens(text))
+        if error:
+            return error
+
+        # ~0.3 s of silence per word
+        frames = max(1, int(len(text.split()) * 0.3 / 0.026))
+        return Response(SILENT_MP3_FRAME * frames, media_type='audio/mpeg', headers=headers)
+
+    @app.get("/customsearch/v1")
+    async def custom_search(q: str = '', num: int = 10, start: int = 1):
+        error, headers = await state.admit('search', google=True)
+        if error:
+            return error
+
+        # Google returns at most 100 results per query
+        items = []
+        for position in range(start, min(start + num, 101)):
+            words = stub_words(24, 'search', q, position)
+            slug = hashlib.sha256(f"{q}\x00{position}".encode('utf-8')).hexdigest()[:12]
+            items.append({
+                'title': " ".join(words[:6]).title(),
+                'link': f"https://stub.example.com/{slug}/{position}",
+                'snippet': f"{q} {' '.join(words[6:])}",
+            })
+        body = {'kind': 'customsearch#search', 'searchInformation': {'totalResults': '100'}}
+        if items:
+            body['items'] = items
+        return JSONResponse(body, headers=headers)
+
+    @app.get("/stub/stats")
+    async def stats():
+        return state.stats()
+
+    @app.post("/stub/reset")
+    async def reset():
+        state.reset()
+        return state.stats()
+
+    return app
@@ -2,7 +2,10 @@ from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from ..services.chat_service import ChatService
+from ..streaming import sse_response
+from starlette.concurrency import iterate_in_threadpool
 import logging
+import asyncio
 
 # Configure logging
 logging.basicConfig(
@@ -24,8 +27,8 @@ async def chat_query(request: Request, query: ChatQuery):
     try:
         logger.info(f"Received chat query: {query.query[:100]}...")
         
-        # Initialize chat service
-        chat_service = ChatService()
+        # Initialize chat service (it connects to the database, so off the event loop)
+        chat_service = await asyncio.to_thread(ChatService)
         
         # Get response (this will handle both chat and web search internally)
         response = await chat_service.get_response(query.query)
@@ -35,4 +38,15 @@ async def chat_query(request: Request, query: ChatQuery):
         
     except Exception as e:
         logger.error(f"Error processing chat query: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.post("/query/stream")
+async def chat_query_stream(request: Request, query: ChatQuery):
+    """Chat answer streamed as Server-Sent Events: the generated SQL, answer tokens, then done"""
+    logger.info(f"Received streamed chat query: {query.query[:100]}...")
+    try:
+        chat_service = await asyncio.to_thread(ChatService)
+    except Exception as e:
+        logger.error(f"Error initializing chat service: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return sse_response(iterate_in_threadpool(chat_service.stream_response(query.query)), "chat_query")
@@ -7,9 +7,11 @@ import os
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
-from openai import OpenAI
 import json
 import re
+import asyncio
+from ..services.openai_clients import get_async_openai_client
+from ..services.websearch_service import WebSearchService
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +25,8 @@ router = APIRouter()
 # Database connection
 DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://glinskiyvadim@localhost:5540/pred_genai')
 engine = create_engine(DATABASE_URL)
+# A forked worker opens its own connections rather than reusing the parent's
+os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
 
 @router.post("/upload-csv")
 async def upload_csv(file: UploadFile = File(...)):
@@ -140,6 +144,23 @@ async def get_csv_data(table_name: str, limit: int = 100):
         logger.error(f"Error retrieving CSV data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _dataset_sample(table_name: str):
+    """(columns, up to 100 rows) of an uploaded table; None if it isn't in csv_metadata"""
+    with engine.connect() as conn:
+        # First verify the table exists in metadata
+        result = conn.execute(text("""
+            SELECT column_names FROM csv_metadata WHERE table_name = :table_name
+        """), {'table_name': table_name})
+        metadata = result.fetchone()
+        if not metadata:
+            return None
+        
+        # Get a sample of the data
+        result = conn.execute(text(f"""
+            SELECT * FROM {table_name} LIMIT 100
+        """))
+        return metadata[0], [dict(row) for row in result]
+
 @router.post("/query-dataset")
 async def query_dataset(
     table_name: str,
@@ -148,77 +169,90 @@ async def query_dataset(
 ):
     try:
         # Get the data from the specified table
-        with engine.connect() as conn:
-            # First verify the table exists in metadata
-            result = conn.execute(text("""
-                SELECT column_names FROM csv_metadata WHERE table_name = :table_name
-            """), {'table_name': table_name})
-            metadata = result.fetchone()
-            if not metadata:
-                raise HTTPException(status_code=404, detail="Table not found")
-            
-            # Get a sample of the data
-            result = conn.execute(text(f"""
-                SELECT * FROM {table_name} LIMIT 100
-            """))
-            data = [dict(row) for row in result]
-            
-            # Get column descriptions
-            columns = metadata[0]
-            
-            # Prepare the context for the AI
-            context = {
+        sample = await asyncio.to_thread(_dataset_sample, table_name)
+        if sample is None:
+            raise HTTPException(status_code=404, detail="Table not found")
+        columns, data = sample
+        
+        # Prepare the context for the AI
+        context = {
+            "columns": columns,
+            "sample_data": data[:5],  # Send first 5 rows as sample
+            "total_rows": len(data)
+        }
+        
+        # Create a prompt for the AI
+        prompt = f"""
+        You are a data analyst assistant. You have access to a dataset with the following columns: {', '.join(columns)}.
+        
+        Here is a sample of the data:
+        {json.dumps(context['sample_data'], indent=2)}
+        
+        The dataset contains {context['total_rows']} rows.
+        
+        Please answer the following question about the dataset:
+        {question}
+        
+        If the question requires specific data analysis, please provide:
+        1. The analysis methodology
+        2. The results
+        3. Any relevant insights or patterns you notice
+        
+        If the question cannot be answered with the available data, please explain why.
+        """
+        
+        # Get the AI response
+        response = await get_async_openai_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful data analyst assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7
+        )
+        
+        return {
+            "answer": response.choices[0].message.content,
+            "context": {
+                "table_name": table_name,
                 "columns": columns,
-                "sample_data": data[:5],  # Send first 5 rows as sample
-                "total_rows": len(data)
-            }
-            
-            # Initialize OpenAI client
-            client = OpenAI()
-            
-            # Create a prompt for the AI
-            prompt = f"""
-            You are a data analyst assistant. You have access to a dataset with the following columns: {', '.join(columns)}.
-            
-            Here is a sample of the data:
-            {json.dumps(context['sample_data'], indent=2)}
-            
-            The dataset contains {context['total_rows']} rows.
-            
-            Please answer the following question about the dataset:
-            {question}
-            
-            If the question requires specific data analysis, please provide:
-            1. The analysis methodology
-            2. The results
-            3. Any relevant insights or patterns you notice
-            
-            If the question cannot be answered with the available data, please explain why.
-            """
-            
-            # Get the AI response
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful data analyst assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            
-            return {
-                "answer": response.choices[0].message.content,
-                "context": {
-                    "table_name": table_name,
-                    "columns": columns,
-                    "sample_size": len(data)
-                }
+                "sample_size": len(data)
             }
+        }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error querying dataset: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _load_datasets():
+    """Every uploaded table with all of its rows"""
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT table_name, column_names, row_count 
+            FROM csv_metadata 
+            ORDER BY upload_date DESC
+        """))
+        datasets = [dict(row) for row in result]
+        
+        # Prepare full dataset access
+        all_data = []
+        for dataset in datasets:
+            # Get the entire dataset
+            result = conn.execute(text(f"""
+                SELECT * FROM {dataset['table_name']}
+            """))
+            full_data = [dict(row) for row in result]
+            
+            all_data.append({
+                "table_name": dataset['table_name'],
+                "columns": dataset['column_names'],
+                "data": full_data,
+                "total_rows": dataset['row_count']
+            })
+        return all_data
+
 @router.post("/search")
 async def search(request: Request):
     try:
@@ -229,32 +263,7 @@ async def search(request: Request):
             raise HTTPException(status_code=400, detail="No search query provided")
         
         # Get all available datasets
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT table_name, column_names, row_count 
-                FROM csv_metadata 
-                ORDER BY upload_date DESC
-            """))
-            datasets = [dict(row) for row in result]
-            
-            # Prepare full dataset access
-            all_data = []
-            for dataset in datasets:
-                # Get the entire dataset
-                result = conn.execute(text(f"""
-                    SELECT * FROM {dataset['table_name']}
-                """))
-                full_data = [dict(row) for row in result]
-                
-                all_data.append({
-                    "table_name": dataset['table_name'],
-                    "columns": dataset['column_names'],
-                    "data": full_data,
-                    "total_rows": dataset['row_count']
-                })
-        
-        # Initialize OpenAI client
-        client = OpenAI()
+        all_data = await asyncio.to_thread(_load_datasets)
         
         # Create a flexible prompt that gives the AI freedom to analyze
         prompt = f"""
@@ -279,20 +288,19 @@ async def search(request: Request):
         - Highlights any interesting findings
         """
         
-        # Get the AI response
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an advanced data analyst with full access to multiple datasets. You can freely analyze and interpret the data to answer questions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
+        # Get the AI response and perform the web search in parallel
+        response, web_results = await asyncio.gather(
+            get_async_openai_client().chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "You are an advanced data analyst with full access to multiple datasets. You can freely analyze and interpret the data to answer questions."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7
+            ),
+            asyncio.to_thread(WebSearchService().search_and_process, query)
         )
         
-        # Perform web search in parallel
-        searcher = WebSearchService()
-        web_results = searcher.search_and_process(query)
-        
         return {
             "type": "combined",
             "answer": response.choices[0].message.content,
@@ -2,11 +2,11 @@ from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
 import logging
 import os
-from openai import OpenAI
 from typing import Optional, List
 import json
 import requests
 from dotenv import load_dotenv
+from ..services.openai_clients import get_async_openai_client
 
 # Load environment variables
 load_dotenv()
@@ -18,9 +18,6 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
 @router.get("/search")
 async def web_search(
     query: str = Query(..., description="Search query"),
@@ -33,7 +30,7 @@ async def web_search(
         logger.info(f"Performing web search for query: {query}")
         
         # Use OpenAI's search API
-        response = client.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that performs web searches."},
@@ -73,7 +70,7 @@ async def suggest_queries(
         logger.info(f"Generating search suggestions for: {query}")
         
         # Use OpenAI to generate suggestions
-        response = client.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that suggests search queries."},
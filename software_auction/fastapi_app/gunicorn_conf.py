@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for serving the FastAPI app with several worker processes:
+
+    gunicorn -c software_auction/fastapi_app/gunicorn_conf.py software_auction.fastapi_app.main:app
+
+or `FASTAPI_WORKERS=4 python run.py`. Everything comes from SERVING_CONFIG.
+
+With PRELOAD the parent imports main once (Django setup, models, routers)
+and forks workers that share those pages copy-on-write. Importing the app
+opens no connections and starts no threads. Modules that own connection
+pools, locks or threads reset them in the child (os.register_at_fork), and
+each worker's startup handlers warm its own database connection, OpenAI
+pools and HybridRAG (lifecycle.startup). On SIGTERM a worker stops
+accepting connections, gets GRACEFUL_TIMEOUT seconds to finish in-flight
+requests, then runs the app's shutdown handlers.
+"""
+import os
+
+from software_auction.fastapi_app.settings import HOST, PORT, OPENAI_GATEWAY_CONFIG, SERVING_CONFIG
+
+bind = os.getenv('FASTAPI_BIND', f"{HOST}:{PORT}")
+workers = SERVING_CONFIG['WORKERS']
+worker_class = SERVING_CONFIG['WORKER_CLASS']
+preload_app = SERVING_CONFIG['PRELOAD']
+timeout = SERVING_CONFIG['TIMEOUT']
+graceful_timeout = SERVING_CONFIG['GRACEFUL_TIMEOUT']
+keepalive = SERVING_CONFIG['KEEPALIVE']
+max_requests = SERVING_CONFIG['MAX_REQUESTS']
+max_requests_jitter = SERVING_CONFIG['MAX_REQUESTS_JITTER']
+loglevel = 'info'
+
+
+def when_ready(server):
+    server.log.info(f"Serving on {bind} with {workers} {worker_class} workers (preload={preload_app})")
+
+
+def pre_fork(server, worker):
+    # A database connection opened while loading the app must not be shared by the workers
+    from django.apps import apps
+    if apps.ready:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    # `gunicorn -w N` overrides SERVING_CONFIG; split the OpenAI budgets by the real worker count
+    if not os.getenv('OPENAI_GATEWAY_PROCESSES'):
+        OPENAI_GATEWAY_CONFIG['PROCESSES'] = server.cfg.workers
+    server.log.info(f"Worker {worker.pid} started")
+
+
+def worker_exit(server, worker):
+    server.log.info(f"Worker {worker.pid} exited")
@@ -0,0 +1,395 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Optional
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IngestionJob
+from .settings import JOB_CONFIG
+from .services.openai_gateway import openai_priority
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(context) -> result dict
+JOB_HANDLERS: Dict[str, Callable[['JobContext'], Dict[str, Any]]] = {}
+TERMINAL_STATUSES = (IngestionJob.SUCCEEDED, IngestionJob.FAILED, IngestionJob.CANCELLED)
+
+
+class JobInterrupted(Exception):
+    """The job was cancelled, reclaimed by another worker, or this worker is stopping"""
+
+
+def register_job_handler(kind: str):
+    """Register the function that runs jobs of this kind"""
+    def decorator(fn: Callable[['JobContext'], Dict[str, Any]]):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue(kind: str, params: Dict[str, Any] = None, max_attempts: int = None) -> IngestionJob:
+    """Create a queued job and return it; a worker picks it up asynchronously"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'. Choose from: {', '.join(sorted(JOB_HANDLERS))}")
+    return IngestionJob.objects.create(
+        kind=kind,
+        params=params or {},
+        max_attempts=max_attempts or JOB_CONFIG['MAX_ATTEMPTS'],
+    )
+
+
+def job_status(job: IngestionJob) -> Dict[str, Any]:
+    progress = job.progress or {}
+    total = progress.get('total')
+    done = len(progress.get('completed', [])) + len(progress.get('failed', {}))
+    return {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': {
+            'total': total,
+            'completed': len(progress.get('completed', [])),
+            'failed': len(progress.get('failed', {})),
+            'percent': round(100 * done / total, 1) if total else None,
+            'counts': progress.get('counts', {}),
+        },
+        'failed_items': progress.get('failed', {}),
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'worker_id': job.worker_id,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'heartbeat_at': job.heartbeat_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def get_job_status(job_id: int) -> Optional[Dict[str, Any]]:
+    job = IngestionJob.objects.filter(pk=job_id).first()
+    return job_status(job) if job else None
+
+
+def cancel_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """Cancel a queued or running job. A running job stops at its next checkpoint."""
+    IngestionJob.objects.filter(
+        pk=job_id, status__in=(IngestionJob.QUEUED, IngestionJob.RUNNING)
+    ).update(status=IngestionJob.CANCELLED, finished_at=timezone.now())
+    return get_job_status(job_id)
+
+
+def claim_job(worker_id: str, kinds: List[str] = None) -> Optional[IngestionJob]:
+    """
+    Atomically take the oldest runnable job. Rows locked by another worker's
+    claim are skipped rather than waited on, so any number of workers on any
+    number of nodes can poll the same table. Running jobs whose worker has not
+    checkpointed for STALE_AFTER seconds are reclaimed.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=JOB_CONFIG['STALE_AFTER'])
+    with transaction.atomic():
+        jobs = IngestionJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=IngestionJob.QUEUED, run_after__lte=now)
+            | Q(status=IngestionJob.RUNNING, heartbeat_at__lt=stale)
+        )
+        if kinds:
+            jobs = jobs.filter(kind__in=kinds)
+        job = jobs.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+
+        if job.status == IngestionJob.RUNNING:
+            logger.warning(f"Reclaiming job {job.id} from unresponsive worker {job.worker_id}")
+        job.status = IngestionJob.RUNNING
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.heartbeat_at = now
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'worker_id', 'attempts', 'heartbeat_at', 'started_at', 'updated_at'])
+    return job
+
+
+class JobContext:
+    """
+    Handed to a job handler. pending() filters out items finished by earlier
+    attempts, and checkpoint() records each item as it completes, so a job
+    that is interrupted resumes where it stopped.
+    """
+
+    def __init__(self, job: IngestionJob, stopping: threading.Event = None):
+        self.job = job
+        self.params = job.params or {}
+        self.progress = {'completed': [], 'failed': {}, 'counts': {}, 'state': {}, **(job.progress or {})}
+        self.stopping = stopping or threading.Event()
+        self._done = set(self.progress['completed']) | set(self.progress['failed'])
+
+    def pending(self, items: List[str]) -> List[str]:
+        """Items not yet checkpointed; also records the total for progress reporting"""
+        self.progress['total'] = len(items)
+        self._save()
+        remaining = [item for item in items if item not in self._done]
+        if len(remaining) < len(items):
+            logger.info(f"Job {self.job.id} resuming: {len(items) - len(remaining)} of {len(items)} items already done")
+        return remaining
+
+    def checkpoint(self, item: str, error: str = None, counts: Dict[str, int] = None,
+                   state: Dict[str, Any] = None):
+        """Record one finished item, add to the running counts and persist progress"""
+        self.record(item, error, counts, state)
+        self.raise_if_stopping()
+
+    def record(self, item: str, error: str = None, counts: Dict[str, int] = None,
+               state: Dict[str, Any] = None):
+        """
+        checkpoint() without the shutdown check, for use inside the
+        transaction that writes the item's results: both commit or neither.
+        """
+        if error:
+            self.progress['failed'][item] = error
+        else:
+            self.progress['completed'].append(item)
+        self._done.add(item)
+        for name, value in (counts or {}).items():
+            self.progress['counts'][name] = self.progress['counts'].get(name, 0) + value
+        self.progress['state'].update(state or {})
+        self._save()
+
+    def heartbeat(self):
+        """Tell claim_job this worker is alive during a long item; raises JobInterrupted if it lost the job"""
+        self._save()
+
+    def raise_if_stopping(self):
+        if self.stopping.is_set():
+            raise JobInterrupted("worker is shutting down")
+
+    def _save(self):
+        updated = IngestionJob.objects.filter(
+            pk=self.job.pk, worker_id=self.job.worker_id, status=IngestionJob.RUNNING
+        ).update(progress=self.progress, heartbeat_at=timezone.now(), updated_at=timezone.now())
+        if not updated:
+            # Cancelled, or reclaimed by another worker after we went quiet
+            raise JobInterrupted(f"job {self.job.id} is no longer owned by this worker")
+
+
+def run_job(job: IngestionJob, stopping: threading.Event = None) -> str:
+    """Run a claimed job to completion, failure or interruption; returns the resulting status"""
+    context = JobContext(job, stopping)
+    owned = IngestionJob.objects.filter(pk=job.pk, worker_id=job.worker_id, status=IngestionJob.RUNNING)
+    start = time.perf_counter()
+    try:
+        # Interactive and voice requests share the OpenAI budget and go first
+        with openai_priority('batch'):
+            result = JOB_HANDLERS[job.kind](context)
+        owned.update(status=IngestionJob.SUCCEEDED, result=result or {}, error='', finished_at=timezone.now())
+        logger.info(f"Job {job.id} ({job.kind}) succeeded in {time.perf_counter() - start:.1f}s")
+        return IngestionJob.SUCCEEDED
+
+    except JobInterrupted as e:
+        # Put it back for another worker unless it was cancelled or taken over
+        requeued = owned.update(status=IngestionJob.QUEUED, worker_id='', attempts=max(job.attempts - 1, 0))
+        logger.info(f"Job {job.id} interrupted: {str(e)}")
+        return IngestionJob.QUEUED if requeued else IngestionJob.objects.get(pk=job.pk).status
+
+    except Exception as e:
+        logger.error(f"Error running job {job.id} ({job.kind}): {str(e)}")
+        if job.attempts < job.max_attempts:
+            delay = JOB_CONFIG['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            owned.update(status=IngestionJob.QUEUED, worker_id='', error=str(e),
+                         run_after=timezone.now() + timedelta(seconds=delay))
+            return IngestionJob.QUEUED
+        owned.update(status=IngestionJob.FAILED, error=str(e), finished_at=timezone.now())
+        return IngestionJob.FAILED
+
+
+def run_worker(worker_id: str = None, kinds: List[str] = None, once: bool = False,
+               poll_interval: float = None, stopping: threading.Event = None) -> int:
+    """Claim and run jobs until stopped (or until the queue is empty with once=True). Returns jobs run."""
+    worker_id = worker_id or default_worker_id()
+    poll_interval = poll_interval or JOB_CONFIG['POLL_INTERVAL']
+    stopping = stopping or threading.Event()
+    processed = 0
+    logger.info(f"Job worker {worker_id} started (kinds: {', '.join(kinds or sorted(JOB_HANDLERS))})")
+
+    while not stopping.is_set():
+        try:
+            job = claim_job(worker_id, kinds)
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            connection.close()
+            job = None
+        if job is None:
+            if once:
+                break
+            stopping.wait(poll_interval)
+            continue
+
+        logger.info(f"Job worker {worker_id} running job {job.id} ({job.kind}, attempt {job.attempts})")
+        run_job(job, stopping)
+        processed += 1
+
+    logger.info(f"Job worker {worker_id} stopped after {processed} job(s)")
+    return processed
+
+
+def ingest_directory(directory: str = None) -> Path:
+    """
+    The directory an ingest job reads: the knowledge base directory, or a
+    directory inside it other than the enrichment inputs. Raises ValueError
+    for anything else, so clients can't load arbitrary files from the host
+    into the knowledge base.
+    """
+    from .rag.hybrid_rag import KNOWLEDGE_BASE_DIR, ENRICHMENT_DATA_DIR
+
+    root = KNOWLEDGE_BASE_DIR.resolve()
+    path = (root / directory).resolve() if directory else root
+    if path != root and root not in path.parents:
+        raise ValueError(f"Directory must be inside the knowledge base directory ({root})")
+    data = ENRICHMENT_DATA_DIR.resolve()
+    if path == data or data in path.parents:
+        raise ValueError(f"{data} holds enrichment inputs, not knowledge base documents")
+    return path
+
+
+def enqueue_ingest(directory: str = None, workers: int = None) -> IngestionJob:
+    """Queue an ingest job for a knowledge base (sub)directory; raises ValueError for other paths"""
+    ingest_directory(directory)
+    return enqueue('ingest', params={'directory': directory, 'workers': workers})
+
+
+@register_job_handler('ingest')
+def ingest_job(context: JobContext) -> Dict[str, Any]:
+    """
+    Ingest every supported file under params['directory'], a path inside
+    the knowledge base directory (default: the directory itself).
+
+    Files go through the knowledge base manifest like the startup sync
+    (rag.manifest): a file already loaded at its current size and mtime is
+    skipped, and a changed file replaces its rows instead of adding a
+    second copy. Chunks are embedded and written EMBED_BATCH_SIZE at a
+    time, reusing stored embeddings of identical chunks. While a file is
+    being written, state['partial'] holds the last Document id from before
+    it started; a retried or reclaimed job deletes that file's newer rows
+    and starts it over. The file's old rows, including unowned ones from
+    before the manifest, are only deleted once the new ones are complete.
+    """
+    from .lifecycle import get_rag
+    from .models import Document, KnowledgeBaseFile
+    from .rag.answer_cache import bump_knowledge_base_version
+    from .rag.extractors import iter_documents, supported_files
+    from .rag.ingestion import BulkIngestor, EMBED_BATCH_SIZE
+    from .rag.manifest import content_hash, file_hash
+
+    rag = get_rag()
+    directory = ingest_directory(context.params.get('directory'))
+    files = {str(path): path for path in supported_files(directory)}
+    partial = context.progress['state'].setdefault('partial', {})
+    writer = BulkIngestor(rag.embedder, defer_index=False)
+
+    manifest = {entry.path: entry for entry in KnowledgeBaseFile.objects.filter(path__in=list(files))}
+    to_load = []
+    for key in context.pending(list(files)):
+        entry, stat = manifest.get(key), files[key].stat()
+        if key not in partial and entry and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+            context.checkpoint(key, counts={'unchanged_files': 1})
+        else:
+            to_load.append(files[key])
+
+    for document in iter_documents(to_load, workers=context.params.get('workers')):
+        key = str(document.path)
+        if document.error:
+            context.checkpoint(key, error=document.error)
+            continue
+        stat = document.path.stat()
+        entry, _ = KnowledgeBaseFile.objects.get_or_create(path=key, defaults={'content_hash': ''})
+        if key in partial:
+            # Rows from an attempt that stopped halfway through this file
+            Document.objects.filter(source_file=entry, id__gt=partial[key]).delete()
+        else:
+            partial[key] = Document.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            context.heartbeat()
+        try:
+            written = 0
+            metadata = {'source': key, 'format': document.format, 'job_id': context.job.id}
+            iterator = document.chunks(rag.chunker)
+            while True:
+                batch = list(islice(iterator, EMBED_BATCH_SIZE))
+                if not batch:
+                    break
+                hashes = [content_hash(chunk) for chunk in batch]
+                stored = dict(Document.objects.filter(content_hash__in=hashes).values_list('content_hash', 'embedding'))
+                to_embed = [chunk for chunk, h in zip(batch, hashes) if h not in stored]
+                embedded = iter(writer.embed_batch(to_embed) if to_embed else [])
+                writer.write_batch(
+                    batch,
+                    [stored[h] if h in stored else next(embedded) for h in hashes],
+                    [{**metadata, 'timestamp': time.time(), 'chunk_size': len(chunk)} for chunk in batch],
+                    source_file=entry
+                )
+                written += len(batch)
+                # A large file can take longer than STALE_AFTER to embed
+                context.heartbeat()
+
+            with transaction.atomic():
+                # The file's previous rows, now replaced, including any it got before the manifest existed
+                Document.objects.filter(
+                    Q(source_file=entry) | Q(source_file__isnull=True, metadata__source=key), id__lte=partial[key]
+                ).delete()
+                bump_knowledge_base_version()
+                KnowledgeBaseFile.objects.filter(pk=entry.pk).update(
+                    content_hash=file_hash(document.path), size=stat.st_size, mtime=stat.st_mtime,
+                    chunk_count=written
+                )
+                partial.pop(key)
+                # Rolls the file back too if the job was cancelled or reclaimed meanwhile
+                context.record(key, counts={'files': 1, 'chunks': written})
+        except JobInterrupted:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing file {key}: {str(e)}")
+            Document.objects.filter(source_file=entry, id__gt=partial.pop(key)).delete()
+            context.checkpoint(key, error=str(e))
+            continue
+        context.raise_if_stopping()
+
+    return {'directory': str(directory), **context.progress['counts'], 'stats': writer.stats.as_dict()}
+
+
+@register_job_handler('enrich')
+def enrich_job(context: JobContext) -> Dict[str, Any]:
+    """Knowledge base enrichment from text.txt and questions.txt, one checkpoint per item"""
+    from .rag.rag_service import RAGService, ENRICHMENT_DATA_DIR
+
+    for item in context.pending(RAGService.enrichment_items()):
+        try:
+            outcome = RAGService.enrich_item(item)
+        except Exception as e:
+            logger.error(f"Error enriching knowledge base from {item}: {str(e)}")
+            context.checkpoint(item, error=str(e))
+            continue
+        state = {'text_summary': outcome['text_summary']} if 'text_summary' in outcome else None
+        context.checkpoint(item, counts={'processed': outcome.get('processed', 0)}, state=state)
+
+    text_path = ENRICHMENT_DATA_DIR / 'text.txt'
+    full_content = text_path.read_text(encoding='utf-8') if text_path.exists() else ''
+    processed = context.progress['counts'].get('processed', 0)
+    logger.info(f"Enrichment complete. Processed {processed} documents total.")
+    return {
+        'message': f'Knowledge base enriched successfully with {processed} documents',
+        'processed': processed,
+        'text_summary': context.progress['state'].get('text_summary') or "No text.txt summary available",
+        'full_content': full_content,
+    }
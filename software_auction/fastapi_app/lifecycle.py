@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Postgres advisory lock held while one worker of a multi-worker server syncs the knowledge base
+KNOWLEDGE_BASE_SYNC_LOCK = 0x6B6273796E63
+
+_lock = threading.RLock()
+_ready = threading.Event()
+_rag = None
+_analysis_service = None
+# Router services, created on first use rather than at import so a preloaded parent doesn't
+# hand its connection pools to every forked worker
+_services = {}
+_state = {
+    'status': 'stopped',  # stopped -> starting -> ready | error
+    'started_at': None,
+    'warmup_seconds': None,
+    'knowledge_base_sync': None,
+    'error': None,
+}
+
+
+def get_rag():
+    """Shared HybridRAG instance, created on first use if startup() hasn't run"""
+    global _rag
+    if _rag is None:
+        with _lock:
+            if _rag is None:
+                from .rag.hybrid_rag import HybridRAG
+                _rag = HybridRAG(load_knowledge_base=False)
+    return _rag
+
+
+def get_analysis_service():
+    """Shared AnalysisService bound to the shared HybridRAG"""
+    global _analysis_service
+    if _analysis_service is None:
+        with _lock:
+            if _analysis_service is None:
+                from .services.analysis_service import AnalysisService
+                _analysis_service = AnalysisService(rag=get_rag())
+    return _analysis_service
+
+
+def _service(name: str, factory):
+    if name not in _services:
+        with _lock:
+            if name not in _services:
+                _services[name] = factory()
+    return _services[name]
+
+
+def get_websearch_service():
+    """Shared WebSearchService for the websearch router"""
+    from .services.websearch_service import WebSearchService
+    return _service('websearch', WebSearchService)
+
+
+def _sync_knowledge_base(rag) -> Dict[str, Any]:
+    """Sync the knowledge base unless another process is already doing it"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [KNOWLEDGE_BASE_SYNC_LOCK])
+        if not cursor.fetchone()[0]:
+            logger.info("Knowledge base sync is running in another worker; skipping it here")
+            return {'skipped': 'sync running in another process'}
+    try:
+        return rag._load_knowledge_base()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [KNOWLEDGE_BASE_SYNC_LOCK])
+
+
+def _warm_up(sync_knowledge_base: bool):
+    start = time.perf_counter()
+    _state.update(status='starting', started_at=time.time(), error=None)
+    try:
+        rag = get_rag()
+        get_analysis_service()
+
+        # Open the database connection for this thread and check the table is reachable
+        connection.ensure_connection()
+        rag.is_enriched()
+
+        # Establish the HTTP connection pool to the OpenAI API without spending tokens
+        try:
+            rag.openai_client.models.list()
+        except Exception as e:
+            logger.warning(f"OpenAI warm-up request failed: {str(e)}")
+
+        if sync_knowledge_base:
+            _state['knowledge_base_sync'] = _sync_knowledge_base(rag)
+
+        _state.update(status='ready', warmup_seconds=round(time.perf_counter() - start, 3))
+        _ready.set()
+        logger.info(f"RAG services ready in {_state['warmup_seconds']}s")
+    except Exception as e:
+        _state.update(status='error', error=str(e))
+        logger.error(f"Error warming up RAG services: {str(e)}")
+    finally:
+        # Connections opened on a warm-up thread are not reused by request threads
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def startup(sync_knowledge_base: bool = True, background: bool = False) -> Dict[str, Any]:
+    """
+    Create and warm the shared services: database connection, OpenAI
+    connection pool and knowledge base sync. Safe to call more than once;
+    later calls are no-ops while the services are starting or ready.
+    """
+    with _lock:
+        if _state['status'] in ('starting', 'ready'):
+            return status()
+        _state['status'] = 'starting'
+
+    if background:
+        thread = threading.Thread(target=_warm_up, args=(sync_knowledge_base,), name='rag-warmup', daemon=True)
+        thread.start()
+    else:
+        _warm_up(sync_knowledge_base)
+    return status()
+
+
+def shutdown():
+    """
+    Drop the shared services and release their database connections. The
+    OpenAI connection pools belong to services.openai_clients and are
+    closed with close_openai_clients().
+    """
+    global _rag, _analysis_service
+    with _lock:
+        _ready.clear()
+        _rag = None
+        _analysis_service = None
+        _services.clear()
+        _state.update(status='stopped', warmup_seconds=None)
+        connections.close_all()
+        logger.info("RAG services shut down")
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    return _ready.wait(timeout)
+
+
+def status() -> Dict[str, Any]:
+    # pid tells the workers of a multi-worker server apart
+    return {**_state, 'ready': is_ready(), 'pid': os.getpid()}
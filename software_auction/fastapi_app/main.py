@@ -23,13 +23,22 @@ from fastapi.templating import Jinja2Templates
 from .routers import websearch_router
 from .routers.speech_router import router as speech_router
 from .services.websearch_service import WebSearchService
+from .services.embedding_cache import get_embedding_cache
+from .rag.pipeline import active_pipelines
+from .rag.answer_cache import get_answer_cache
+from .streaming import acompletion_events, sse_response, stream_metrics
+from .services.openai_clients import get_async_openai_client, close_openai_clients
+from .services.openai_gateway import get_openai_gateway
+from .services.single_flight import get_single_flight
+from starlette.concurrency import iterate_in_threadpool
 import logging
 from typing import Dict, Any
 import json
 import time
-from openai import OpenAI
 from .api import chat, files
-from .settings import ALLOWED_ORIGINS, HOST, PORT
+from .settings import ALLOWED_ORIGINS, HOST, PORT, SERVING_CONFIG
+from . import lifecycle, jobs
+import asyncio
 
 # Create a router for speech-related endpoints
 from fastapi import APIRouter
@@ -45,34 +54,58 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
-# Initialize OpenAI client
-openai_client = OpenAI()
-
 # Include routers
 app.include_router(websearch_router.router, prefix="/api/websearch", tags=["websearch"])
 app.include_router(speech_router, prefix="/api/speech", tags=["speech"])
-app.include_router(rag_router, prefix="/api/rag", tags=["rag"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(files.router, prefix="/api/files", tags=["files"])
 
 # RAG endpoints
 @rag_router.post("/enrich")
 async def enrich_knowledge_base(request: Request):
-    """Handle knowledge base enrichment request"""
+    """Queue a knowledge base enrichment job; poll /api/jobs/{job_id} for progress"""
     try:
         data = await request.json()
-        logger.info(f"Would have enriched knowledge base with: {data}")
+        job = await asyncio.to_thread(jobs.enqueue, 'enrich', data if isinstance(data, dict) else {})
+        return JSONResponse(status_code=202, content={"status": "queued", "job_id": job.id})
+    except Exception as e:
+        logger.error(f"Error in enrich_knowledge_base: {str(e)}")
         return {
-            "status": "success",
-            "message": "Knowledge base enrichment functionality removed"
+            "status": "error",
+            "message": str(e)
         }
+
+@rag_router.post("/ingest")
+async def ingest_documents(request: Request):
+    """Queue ingestion of a directory of documents; poll /api/jobs/{job_id} for progress"""
+    try:
+        data = await request.json()
+        job = await asyncio.to_thread(jobs.enqueue_ingest, data.get('directory'), data.get('workers'))
+        return JSONResponse(status_code=202, content={"status": "queued", "job_id": job.id})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in enrich_knowledge_base: {str(e)}")
+        logger.error(f"Error in ingest_documents: {str(e)}")
         return {
             "status": "error",
             "message": str(e)
         }
 
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: int):
+    """Status and progress of a background job"""
+    state = await asyncio.to_thread(jobs.get_job_status, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return state
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    state = await asyncio.to_thread(jobs.cancel_job, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return state
+
 @rag_router.options("/text_query")
 async def text_query_options():
     """Handle OPTIONS request for CORS preflight"""
@@ -98,7 +131,7 @@ async def text_query(request: Request):
             raise HTTPException(status_code=400, detail="Query must be a string")
         
         # Use OpenAI directly
-        response = openai_client.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[{"role": "user", "content": data['query']}],
             temperature=0.7,
@@ -135,6 +168,57 @@ async def text_query(request: Request):
             }
         )
 
+@rag_router.post("/text_query/stream")
+async def text_query_stream(request: Request):
+    """Text mode query streamed as Server-Sent Events: token events, then done"""
+    data = await request.json()
+    if not isinstance(data.get('query'), str):
+        raise HTTPException(status_code=400, detail="Query must be a string")
+
+    async def events():
+        async for event in acompletion_events(
+            get_async_openai_client(),
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": data['query']}],
+            temperature=0.7,
+            max_tokens=500
+        ):
+            yield event
+        yield {"type": "done", "status": "success"}
+
+    return sse_response(
+        events(),
+        "text_query",
+        headers={
+            "Access-Control-Allow-Origin": request.headers.get("origin"),
+            "Access-Control-Allow-Credentials": "true"
+        }
+    )
+
+def _query_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    question = data.get('question') or data.get('query')
+    if not isinstance(question, str) or not question.strip():
+        raise HTTPException(status_code=400, detail="Question must be a non-empty string")
+    return {
+        "question": question,
+        "style": data.get('style', 'conversation'),
+        "user_context": data.get('user_context'),
+        "mode": data.get('mode'),
+        "filters": data.get('filters'),
+    }
+
+@rag_router.post("/query")
+async def rag_query(request: Request):
+    """Answer a question from the knowledge base"""
+    params = _query_params(await request.json())
+    return await asyncio.to_thread(lifecycle.get_rag().query, **params)
+
+@rag_router.post("/query/stream")
+async def rag_query_stream(request: Request):
+    """Knowledge base answer streamed as Server-Sent Events; done carries confidence and sources"""
+    params = _query_params(await request.json())
+    return sse_response(iterate_in_threadpool(lifecycle.get_rag().query_stream(**params)), "rag_query")
+
 @rag_router.get("/text_instructions")
 async def get_text_instructions():
     """Get instructions from text.txt"""
@@ -322,6 +406,44 @@ async def startup_event():
     logger.info("Starting FastAPI server...")
     logger.info("Chat, Speech, RAG, and File upload endpoints are available")
 
+@app.on_event("startup")
+async def warm_up_services():
+    """
+    Build and warm the shared RAG services before serving traffic. Each
+    worker of a pre-fork server (gunicorn_conf.py) warms up in the
+    background instead, so a long knowledge base sync can't hold up its
+    heartbeat; /api/ready reports it until then.
+    """
+    await asyncio.to_thread(lifecycle.startup, background=SERVING_CONFIG['WORKERS'] > 1)
+    # Open the async client's connection pool on this event loop
+    try:
+        await get_async_openai_client().models.list()
+    except Exception as e:
+        logger.warning(f"OpenAI async warm-up request failed: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    await asyncio.to_thread(lifecycle.shutdown)
+    await close_openai_clients()
+
+@app.get("/api/ready")
+async def readiness():
+    """Readiness probe: 200 once the shared RAG services are warmed up"""
+    state = lifecycle.status()
+    return JSONResponse(status_code=200 if state['ready'] else 503, content=state)
+
+@app.get("/api/metrics")
+async def metrics():
+    """Process-local service counters"""
+    return {
+        "embedding_cache": get_embedding_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "streaming": stream_metrics.stats(),
+        "openai_gateway": get_openai_gateway().stats(),
+        "single_flight": get_single_flight().stats(),
+        "ingestion_pipelines": active_pipelines(),
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint for testing"""
@@ -377,4 +499,7 @@ async def health_check():
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting FastAPI server...")
-    logger.info("Chat, Speech, RAG, and File upload endpoints are available")
\ No newline at end of file
+    logger.info("Chat, Speech, RAG, and File upload endpoints are available")
+
+# Included last: include_router copies the routes registered on rag_router so far
+app.include_router(rag_router, prefix="/api/rag", tags=["rag"])
@@ -1,14 +1,133 @@
 from django.db import models
-from pgvector.django import VectorField
+from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from pgvector.django import VectorField, HnswIndex
+
+from .settings import TEXT_SEARCH_CONFIG
+
+class KnowledgeBaseFile(models.Model):
+    """Manifest entry for a file loaded from the knowledge base directory"""
+    path = models.CharField(max_length=1024, unique=True)
+    content_hash = models.CharField(max_length=64)  # sha256 of the file contents
+    size = models.BigIntegerField(default=0)
+    mtime = models.FloatField(default=0)
+    chunk_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'software_auction'
 
 class Document(models.Model):
     content = models.TextField()
     embedding = VectorField(dimensions=1536)  # OpenAI ada-002 embedding dimension
     metadata = models.JSONField(default=dict)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # sha256 of content
+    source_file = models.ForeignKey(
+        KnowledgeBaseFile,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    # Maintained by Postgres from content; queries must use the same text search config
+    search_vector = models.GeneratedField(
+        expression=SearchVector('content', config=TEXT_SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Lives outside software_auction/models.py, so pin the owning app explicitly
+        app_label = 'software_auction'
+        # The ANN index on embedding is not declared here: rag.vector_index builds it
+        # with the operator class of VECTOR_DISTANCE_METRIC (migration 0008, and
+        # `manage.py rebuild_vector_index` to switch to IVFFlat or retune).
+        indexes = [
+            GinIndex(name='document_search_vector_gin_idx', fields=['search_vector']),
+            # Serves the containment / jsonpath predicates built by rag.retrieval.compile_filters
+            GinIndex(name='document_metadata_gin_idx', fields=['metadata'], opclasses=['jsonb_path_ops']),
+        ]
+
+class IngestionJob(models.Model):
+    """
+    Background ingestion / enrichment job. Workers on any node claim rows
+    with SELECT ... FOR UPDATE SKIP LOCKED (see fastapi_app.jobs), and
+    progress holds the per-item checkpoint an interrupted job resumes from.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    kind = models.CharField(max_length=32)  # Key in fastapi_app.jobs.JOB_HANDLERS
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    params = models.JSONField(default=dict)
+    progress = models.JSONField(default=dict)  # {'total': n, 'completed': [item keys], 'failed': {key: error}}
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    worker_id = models.CharField(max_length=128, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Retry backoff
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        app_label = 'software_auction'
+        indexes = [
+            # Claim scan: queued jobs in FIFO order, and running jobs whose worker went quiet
+            models.Index(fields=['status', 'run_after'], name='ingestionjob_claim_idx'),
+        ]
+
+class KnowledgeBaseVersion(models.Model):
+    """
+    Single row counting changes to the Document table. Anything derived from
+    the knowledge base (the answer cache) is tagged with the version it was
+    computed at and ignored once the version moves on.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'software_auction'
+
+class AnswerCacheEntry(models.Model):
+    """A HybridRAG.query answer, found again by the similarity of later questions"""
+    question = models.TextField()
+    embedding = VectorField(dimensions=1536)  # Same provider and dimensions as Document.embedding
+    embedding_model = models.CharField(max_length=128)
+    params_hash = models.CharField(max_length=64)  # sha256 of style, retrieval options and user context
+    kb_version = models.BigIntegerField()
+    response = models.JSONField(default=dict)
+    latency_ms = models.FloatField(default=0)  # Time the uncached answer took
+    hits = models.IntegerField(default=0)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'software_auction'
         indexes = [
-            models.Index(fields=['embedding']),
-        ] 
\ No newline at end of file
+            HnswIndex(
+                name='answercache_embedding_hnsw_idx',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+            models.Index(fields=['kb_version', 'params_hash'], name='answercache_version_idx'),
+        ]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from pgvector.django import CosineDistance
+
+from ..models import AnswerCacheEntry, KnowledgeBaseVersion
+from ..settings import ANSWER_CACHE_CONFIG
+from .vector_index import ann_search_params
+
+logger = logging.getLogger(__name__)
+
+
+def knowledge_base_version() -> int:
+    """Current knowledge base version (0 before the first change)"""
+    version = KnowledgeBaseVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version or 0
+
+
+def _bump():
+    table = KnowledgeBaseVersion._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (id, version, updated_at) VALUES (1, 1, now())
+                ON CONFLICT (id) DO UPDATE SET version = {table}.version + 1, updated_at = now()
+                RETURNING version
+            """)
+            version = cursor.fetchone()[0]
+        deleted, _ = AnswerCacheEntry.objects.filter(kb_version__lt=version).delete()
+        get_answer_cache().count('invalidated', deleted)
+    except Exception as e:
+        # The documents are already committed; cached answers stay stale until the next bump
+        logger.error(f"Error bumping knowledge base version: {str(e)}")
+
+
+def bump_knowledge_base_version():
+    """
+    Record that Document rows changed. Runs once the surrounding transaction
+    commits, so a concurrent query can't cache an answer built from the old
+    rows under the new version, and the version row is never held locked
+    for the length of a bulk load.
+    """
+    transaction.on_commit(_bump)
+
+
+def params_hash(**params) -> str:
+    """Key for everything besides the question that shapes an answer"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of HybridRAG.query answers in Postgres.
+
+    A question reuses a stored answer when its embedding is within
+    SIMILARITY_THRESHOLD (cosine) of an earlier question asked with the same
+    parameters against the same knowledge base version. Failures are logged
+    and treated as misses, so the cache can never break a query.
+    """
+
+    def __init__(self, threshold: float = None, ttl_seconds: int = None, enabled: bool = None):
+        self.threshold = ANSWER_CACHE_CONFIG['SIMILARITY_THRESHOLD'] if threshold is None else threshold
+        self.ttl_seconds = ANSWER_CACHE_CONFIG['TTL_SECONDS'] if ttl_seconds is None else ttl_seconds
+        self.enabled = ANSWER_CACHE_CONFIG['ENABLED'] if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'errors': 0,
+            'invalidated': 0,  # Entries dropped because the knowledge base changed
+            'lookup_seconds': 0.0,
+            'saved_seconds': 0.0,  # Uncached answer time minus lookup time, summed over hits
+        }
+
+    def count(self, counter: str, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def lookup(self, embedding: List[float], embedding_model: str,
+               key: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """
+        (response, version): the cached response or None, and the knowledge
+        base version a freshly computed answer should be stored under.
+        """
+        if not self.enabled:
+            return None, None
+        start = time.perf_counter()
+        try:
+            version = knowledge_base_version()
+            entries = AnswerCacheEntry.objects.filter(
+                kb_version=version,
+                embedding_model=embedding_model,
+                params_hash=key,
+                created_at__gte=timezone.now() - timedelta(seconds=self.ttl_seconds),
+            ).annotate(distance=CosineDistance('embedding', embedding))
+            with ann_search_params(ef_search=ANSWER_CACHE_CONFIG['EF_SEARCH']):
+                entry = entries.filter(distance__lte=1 - self.threshold).order_by('distance').first()
+            if entry is not None:
+                AnswerCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_hit_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Error looking up answer cache: {str(e)}")
+            self.count('errors')
+            return None, None
+
+        elapsed = time.perf_counter() - start
+        if entry is None:
+            with self._lock:
+                self._counters['misses'] += 1
+                self._counters['lookup_seconds'] += elapsed
+            return None, version
+
+        with self._lock:
+            self._counters['hits'] += 1
+            self._counters['lookup_seconds'] += elapsed
+            self._counters['saved_seconds'] += max(entry.latency_ms / 1000 - elapsed, 0.0)
+        return {
+            **entry.response,
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'cache': {
+                'hit': True,
+                'similarity': round(1 - entry.distance, 4),
+                'question': entry.question,
+                'cached_at': entry.created_at.isoformat(),
+            },
+        }, version
+
+    def store(self, question: str, embedding: List[float], embedding_model: str, key: str,
+              version: Optional[int], response: Dict[str, Any], latency_seconds: float):
+        if not self.enabled or version is None:
+            return
+        try:
+            AnswerCacheEntry.objects.create(
+                question=question,
+                embedding=embedding,
+                embedding_model=embedding_model,
+                params_hash=key,
+                kb_version=version,
+                response=response,
+                latency_ms=round(latency_seconds * 1000, 3),
+            )
+            self.count('stores')
+        except Exception as e:
+            logger.error(f"Error storing answer in cache: {str(e)}")
+            self.count('errors')
+
+    def clear(self) -> int:
+        deleted, _ = AnswerCacheEntry.objects.all().delete()
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        lookup_seconds = counters.pop('lookup_seconds')
+        counters['mean_lookup_ms'] = round(lookup_seconds / lookups * 1000, 3) if lookups else 0.0
+        counters['saved_seconds'] = round(counters['saved_seconds'], 3)
+        counters['enabled'] = self.enabled
+        counters['similarity_threshold'] = self.threshold
+        return counters
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache; its counters back the metrics endpoints"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
@@ -0,0 +1,181 @@
+import io
+import logging
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Iterator, Iterable, TextIO, Union
+
+from ..settings import CHUNKING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! or ? followed by whitespace; a blank line ends a paragraph
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+READ_SIZE = 64 * 1024
+
+
+# Roughly one BPE token: up to four word characters, or one punctuation mark
+APPROXIMATE_TOKEN = re.compile(r'\w{1,4}|[^\w\s]')
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(name: str = None):
+    """
+    Load a `tokenizers` tokenizer from a tokenizer.json path or a Hugging Face
+    repo id. The default is the local copy of the embedding model's
+    vocabulary, else CHUNKING_CONFIG['TOKENIZER_REPO'] from the hub.
+    """
+    from tokenizers import Tokenizer
+
+    name = name or CHUNKING_CONFIG['TOKENIZER']
+    if os.path.exists(name):
+        return Tokenizer.from_file(name)
+    if name.endswith('.json'):
+        repo = CHUNKING_CONFIG['TOKENIZER_REPO']
+        if not repo:
+            raise FileNotFoundError(f"Tokenizer file not found: {name}")
+        logger.info(f"{name} not found; downloading tokenizer {repo}")
+        name = repo
+    return Tokenizer.from_pretrained(name)
+
+
+class _ApproximateEncoding:
+    __slots__ = ('ids', 'offsets')
+
+    def __init__(self, offsets: List[tuple]):
+        self.offsets = offsets
+        self.ids = list(range(len(offsets)))
+
+
+class ApproximateTokenizer:
+    """
+    Stand-in for a `tokenizers` tokenizer when none can be loaded (e.g. an
+    offline host without a local tokenizer.json). Counts APPROXIMATE_TOKEN
+    pieces, which tracks cl100k_base closely enough to size chunks; only
+    encode().ids / .offsets and encode_batch() are provided.
+    """
+
+    def encode(self, text: str, add_special_tokens: bool = False) -> _ApproximateEncoding:
+        return _ApproximateEncoding([match.span() for match in APPROXIMATE_TOKEN.finditer(text)])
+
+    def encode_batch(self, texts: List[str], add_special_tokens: bool = False) -> List[_ApproximateEncoding]:
+        return [self.encode(text) for text in texts]
+
+
+class TokenChunker:
+    """
+    Split text into chunks of at most max_tokens tokens, cutting at sentence
+    boundaries and carrying overlap_tokens worth of trailing sentences into
+    the next chunk.
+
+    Input is consumed as a stream of READ_SIZE blocks and chunks are yielded
+    as soon as they are complete, so memory stays bounded by a few chunks
+    regardless of file size. Sentences longer than max_tokens are split on
+    token boundaries.
+    """
+
+    def __init__(self, max_tokens: int = None, overlap_tokens: int = None, tokenizer=None):
+        self.max_tokens = max_tokens or CHUNKING_CONFIG['MAX_TOKENS']
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else CHUNKING_CONFIG['OVERLAP_TOKENS']
+        if self.overlap_tokens >= self.max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            try:
+                self._tokenizer = load_tokenizer()
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable, sizing chunks by approximate token counts: {str(e)}")
+                self._tokenizer = ApproximateTokenizer()
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def chunk_text(self, text: str) -> Iterator[str]:
+        return self.chunk_stream(io.StringIO(text))
+
+    def chunk_file(self, path: Union[str, Path], encoding: str = 'utf-8') -> Iterator[str]:
+        with open(path, 'r', encoding=encoding) as f:
+            yield from self.chunk_stream(f)
+
+    def chunk_stream(self, stream: TextIO) -> Iterator[str]:
+        chunk = []  # (sentence, token_count) pairs
+        chunk_tokens = 0
+
+        for sentence, tokens in self._sentences(stream):
+            if tokens > self.max_tokens:
+                if chunk:
+                    yield self._join(chunk)
+                chunk, chunk_tokens = [], 0
+                yield from self._split_long(sentence)
+                continue
+
+            if chunk_tokens + tokens > self.max_tokens:
+                yield self._join(chunk)
+                chunk = self._overlap(chunk, room=self.max_tokens - tokens)
+                chunk_tokens = sum(count for _, count in chunk)
+
+            chunk.append((sentence, tokens))
+            chunk_tokens += tokens
+
+        if chunk:
+            yield self._join(chunk)
+
+    def _sentences(self, stream: TextIO) -> Iterator[tuple]:
+        """Complete sentences with their token counts, read block by block"""
+        carry = ''
+        while True:
+            block = stream.read(READ_SIZE)
+            text = carry + block
+            if not block:
+                yield from self._count(SENTENCE_BOUNDARY.split(text))
+                return
+
+            parts = SENTENCE_BOUNDARY.split(text)
+            # The last part may continue in the next block
+            carry = parts.pop()
+            if len(carry) > 4 * READ_SIZE:
+                # No boundary in sight: cut at the last whitespace to keep memory bounded
+                cut = carry.rfind(' ', 0, 2 * READ_SIZE)
+                cut = cut if cut > 0 else 2 * READ_SIZE
+                parts.append(carry[:cut])
+                carry = carry[cut:]
+            yield from self._count(parts)
+
+    def _count(self, sentences: Iterable[str]) -> Iterator[tuple]:
+        sentences = [' '.join(sentence.split()) for sentence in sentences]
+        sentences = [sentence for sentence in sentences if sentence]
+        if not sentences:
+            return
+        encodings = self.tokenizer.encode_batch(sentences, add_special_tokens=False)
+        for sentence, encoding in zip(sentences, encodings):
+            yield sentence, len(encoding.ids)
+
+    def _overlap(self, chunk: List[tuple], room: int) -> List[tuple]:
+        """Trailing sentences of the previous chunk that fit in the overlap budget"""
+        budget = min(self.overlap_tokens, room)
+        carried = []
+        for sentence, tokens in reversed(chunk):
+            if tokens > budget:
+                break
+            carried.insert(0, (sentence, tokens))
+            budget -= tokens
+        return carried
+
+    def _split_long(self, sentence: str) -> Iterator[str]:
+        """Cut a single oversized sentence into max_tokens windows on token offsets"""
+        offsets = self.tokenizer.encode(sentence, add_special_tokens=False).offsets
+        step = self.max_tokens - self.overlap_tokens
+        for start in range(0, len(offsets), step):
+            window = offsets[start:start + self.max_tokens]
+            yield sentence[window[0][0]:window[-1][1]].strip()
+            if start + self.max_tokens >= len(offsets):
+                break
+
+    @staticmethod
+    def _join(chunk: List[tuple]) -> str:
+        return ' '.join(sentence for sentence, _ in chunk)
@@ -0,0 +1,138 @@
+"""
+Post-retrieval selection of the chunks that go into a prompt.
+
+retrieve() over-fetches candidates, then:
+
+    adaptive k   ordered by cosine distance to the query, the candidates are
+                 cut where the distance jumps by more than DISTANCE_GAP
+                 (relative) from one to the next, i.e. where relevance drops
+                 off; applies to vector and hybrid retrieval, not to the
+                 lexical fast path, which has no query embedding
+    MMR          maximal marginal relevance orders the rest so each pick is
+                 relevant to the query but unlike the chunks already chosen;
+                 near-duplicates of a pick (DUPLICATE_SIMILARITY) are dropped
+    packing      chunks are taken greedily in MMR order while they fit in
+                 TOKEN_BUDGET, up to the requested k
+
+Similarities are computed with NumPy on the stored embeddings, which the
+retrieval query returns with the hits.
+"""
+import logging
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..settings import CONTEXT_PACKING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def adaptive_cutoff(distances: Sequence[float], min_k: int = 1, gap: float = None) -> int:
+    """
+    Number of leading candidates to keep from an ascending list of distances:
+    everything before the first relative jump larger than `gap`.
+    """
+    gap = CONTEXT_PACKING_CONFIG['DISTANCE_GAP'] if gap is None else gap
+    distances = np.asarray(distances, dtype=np.float64)
+    if len(distances) <= min_k:
+        return len(distances)
+    jumps = (distances[1:] - distances[:-1]) / np.clip(distances[:-1], 1e-6, None)
+    # jumps[i] is the step from candidate i to i + 1; never cut before min_k
+    over = np.nonzero(jumps[max(min_k, 1) - 1:] > gap)[0]
+    return int(over[0]) + max(min_k, 1) if len(over) else len(distances)
+
+
+def mmr_order(relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_: float = None,
+              duplicate_similarity: float = None) -> List[int]:
+    """
+    Indices of up to k candidates in maximal-marginal-relevance order.
+
+    relevance is each candidate's similarity to the query, embeddings the
+    L2-normalised candidate vectors. Each step picks the candidate with the
+    best lambda * relevance - (1 - lambda) * (max similarity to the picks so
+    far), updating the running maximum with one matrix-vector product.
+    Candidates at least duplicate_similarity to a pick are dropped outright.
+    """
+    lambda_ = CONTEXT_PACKING_CONFIG['MMR_LAMBDA'] if lambda_ is None else lambda_
+    if duplicate_similarity is None:
+        duplicate_similarity = CONTEXT_PACKING_CONFIG['DUPLICATE_SIMILARITY']
+    count = len(relevance)
+    if count == 0:
+        return []
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    order = []
+    while len(order) < k and available.any():
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * penalty, -np.inf)
+        chosen = int(np.argmax(scores))
+        order.append(chosen)
+        available[chosen] = False
+        redundancy = np.maximum(redundancy, embeddings @ embeddings[chosen])
+        available &= redundancy < duplicate_similarity
+    return order
+
+
+def pack(texts: List[str], order: List[int], count_tokens: Callable[[str], int], budget: int,
+         k: int) -> Tuple[List[int], int]:
+    """
+    Greedily take texts in `order` while they fit in `budget` tokens, up to k.
+    Texts that don't fit are skipped so a later, shorter one can still be
+    used. The first text is always taken, even when it alone is over budget.
+    """
+    selected, used = [], 0
+    for index in order:
+        if len(selected) >= k:
+            break
+        tokens = count_tokens(texts[index])
+        if selected and used + tokens > budget:
+            continue
+        selected.append(index)
+        used += tokens
+    return selected, used
+
+
+def select_context(hits: List[Dict[str, Any]], embeddings: Dict[int, Any], query_embedding: Optional[List[float]],
+                   k: int, count_tokens: Callable[[str], int],
+                   budget: int = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reduce over-fetched hits to the chunks worth sending to the model.
+
+    embeddings maps hit id to its stored vector. With a query embedding the
+    hits are ranked by their cosine distance to it for the adaptive cutoff,
+    whatever order the retriever (vector or fused hybrid) returned them in.
+    Without one (the lexical fast path) relevance follows the retriever's
+    rank and nothing is cut.
+    """
+    budget = budget or CONTEXT_PACKING_CONFIG['TOKEN_BUDGET']
+    stats = {'candidates': len(hits)}
+    hits = [hit for hit in hits if hit['id'] in embeddings]
+    if not hits:
+        return [], {**stats, 'selected': 0, 'tokens': 0, 'budget': budget}
+
+    matrix = normalize_rows([embeddings[hit['id']] for hit in hits])
+    if query_embedding is not None:
+        relevance = matrix @ normalize_rows(query_embedding)[0]
+    else:
+        relevance = np.linspace(1.0, 0.5, num=len(hits), dtype=np.float32)
+
+    if query_embedding is not None:
+        by_distance = np.argsort(1 - relevance, kind='stable')
+        keep = adaptive_cutoff((1 - relevance)[by_distance], min_k=CONTEXT_PACKING_CONFIG['MIN_K'])
+        kept = np.sort(by_distance[:keep])
+        hits = [hits[i] for i in kept]
+        matrix, relevance = matrix[kept], relevance[kept]
+    stats['after_cutoff'] = len(hits)
+
+    order = mmr_order(relevance, matrix, len(hits))
+    selected, tokens = pack([hit['content'] for hit in hits], order, count_tokens, budget, k)
+    stats.update({'selected': len(selected), 'tokens': tokens, 'budget': budget})
+    return [hits[i] for i in selected], stats
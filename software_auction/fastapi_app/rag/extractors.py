@@ -0,0 +1,209 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional
+
+from ..settings import EXTRACTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# extension -> extractor(path) -> text. Parsers are imported inside the
+# extractors so a missing library only disables its own format.
+EXTRACTORS: Dict[str, Callable[[str], str]] = {}
+# Formats read directly by the chunker as a stream instead of in the pool
+STREAMED_FORMATS = {'.txt', '.md'}
+
+
+def register_extractor(*extensions: str):
+    """Register a text extractor for one or more file extensions"""
+    def decorator(fn: Callable[[str], str]):
+        for extension in extensions:
+            EXTRACTORS[extension.lower()] = fn
+        return fn
+    return decorator
+
+
+@register_extractor('.pdf')
+def extract_pdf(path: str) -> str:
+    try:
+        from pdfminer.high_level import extract_text
+        return extract_text(path)
+    except Exception as e:
+        # pdfminer chokes on some malformed files that PyPDF2 still reads
+        logger.warning(f"pdfminer failed on {path}, falling back to PyPDF2: {str(e)}")
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        return "\n\n".join(page.extract_text() or '' for page in reader.pages)
+
+
+@register_extractor('.docx')
+def extract_docx(path: str) -> str:
+    try:
+        import docx
+        document = docx.Document(path)
+        parts = [paragraph.text for paragraph in document.paragraphs]
+        for table in document.tables:
+            for row in table.rows:
+                parts.append(" | ".join(cell.text for cell in row.cells))
+        return "\n\n".join(part for part in parts if part.strip())
+    except Exception as e:
+        logger.warning(f"python-docx failed on {path}, falling back to mammoth: {str(e)}")
+        import mammoth
+        with open(path, 'rb') as f:
+            return mammoth.extract_raw_text(f).value
+
+
+@register_extractor('.pptx')
+def extract_pptx(path: str) -> str:
+    from pptx import Presentation
+    presentation = Presentation(path)
+    slides = []
+    for slide in presentation.slides:
+        texts = [
+            shape.text_frame.text
+            for shape in slide.shapes
+            if getattr(shape, 'has_text_frame', False) and shape.text_frame.text.strip()
+        ]
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            texts.append(slide.notes_slide.notes_text_frame.text)
+        slides.append("\n".join(texts))
+    return "\n\n".join(slide for slide in slides if slide.strip())
+
+
+@register_extractor('.msg')
+def extract_msg(path: str) -> str:
+    import extract_msg as outlook
+    message = outlook.Message(path)
+    try:
+        header = "\n".join(
+            f"{label}: {value}"
+            for label, value in (('Subject', message.subject), ('From', message.sender),
+                                 ('To', message.to), ('Date', message.date))
+            if value
+        )
+        return f"{header}\n\n{message.body or ''}"
+    finally:
+        message.close()
+
+
+def supported_extensions() -> List[str]:
+    return sorted(STREAMED_FORMATS | set(EXTRACTORS))
+
+
+def supported_files(directory: Path) -> List[Path]:
+    """Files in directory that have a registered extractor or are streamed as text"""
+    extensions = set(supported_extensions())
+    return sorted(
+        path for path in Path(directory).iterdir()
+        if path.is_file() and path.suffix.lower() in extensions
+    )
+
+
+class ExtractedDocument:
+    """Text extracted from one file, or a handle to stream it when it is plain text"""
+
+    def __init__(self, path: Path, text: Optional[str] = None, error: str = None, seconds: float = 0.0):
+        self.path = path
+        self.format = path.suffix.lower()
+        self.text = text
+        self.error = error
+        self.seconds = seconds
+
+    def chunks(self, chunker) -> Iterator[str]:
+        if self.format in STREAMED_FORMATS:
+            return chunker.chunk_file(self.path)
+        return chunker.chunk_text(self.text or '')
+
+
+def _extract_worker(path: str):
+    """Runs in a pool process: (text, error, seconds)"""
+    start = time.perf_counter()
+    try:
+        text = EXTRACTORS[Path(path).suffix.lower()](path)
+        return text, None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+class ExtractionStats:
+    """Per-format file counts, input bytes, extracted characters and extraction time"""
+
+    def __init__(self):
+        self.formats = {}
+        self.started_at = time.perf_counter()
+
+    def record(self, document: ExtractedDocument):
+        entry = self.formats.setdefault(document.format, {
+            'files': 0, 'failed': 0, 'bytes': 0, 'chars': 0, 'extract_seconds': 0.0,
+        })
+        entry['files'] += 1
+        entry['failed'] += 1 if document.error else 0
+        entry['bytes'] += document.path.stat().st_size
+        entry['chars'] += len(document.text or '')
+        entry['extract_seconds'] += document.seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        formats = {}
+        for name, entry in self.formats.items():
+            seconds = entry['extract_seconds']
+            formats[name] = {
+                **entry,
+                'extract_seconds': round(seconds, 3),
+                # Throughput per worker; wall-clock throughput is files / elapsed_seconds
+                'files_per_second': round(entry['files'] / seconds, 2) if seconds else None,
+                'mb_per_second': round(entry['bytes'] / (1024 * 1024) / seconds, 2) if seconds else None,
+            }
+        return {'elapsed_seconds': round(elapsed, 3), 'formats': formats}
+
+
+def iter_documents(paths: Iterable[Path], workers: int = None,
+                   stats: ExtractionStats = None) -> Iterator[ExtractedDocument]:
+    """
+    Yield extracted documents as soon as they are ready.
+
+    Plain-text formats are yielded immediately for streaming. Everything
+    else is parsed in a process pool; at most MAX_PENDING_PER_WORKER files
+    per worker are in flight, so extracted text is consumed downstream
+    (chunked and embedded) while the pool keeps parsing. Results come back
+    in completion order, not input order.
+    """
+    workers = workers or EXTRACTION_CONFIG['WORKERS'] or os.cpu_count() or 1
+    max_pending = workers * EXTRACTION_CONFIG['MAX_PENDING_PER_WORKER']
+    pending = {}
+
+    def finish(future):
+        path = pending.pop(future)
+        text, error, seconds = future.result()
+        if error:
+            logger.error(f"Error extracting text from {path}: {error}")
+        document = ExtractedDocument(path, text=text, error=error, seconds=seconds)
+        if stats is not None:
+            stats.record(document)
+        return document
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in paths:
+            path = Path(path)
+            extension = path.suffix.lower()
+            if extension in STREAMED_FORMATS:
+                document = ExtractedDocument(path)
+                if stats is not None:
+                    stats.record(document)
+                yield document
+                continue
+            if extension not in EXTRACTORS:
+                continue
+
+            pending[pool.submit(_extract_worker, str(path))] = path
+            while len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield finish(future)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finish(future)
@@ -1,23 +1,46 @@
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 import logging
-from openai import OpenAI
 import json
 import time
 import uuid
-import glob
+from itertools import islice
+from contextvars import ContextVar
 from django.conf import settings
 from pathlib import Path
-from ..models import Document
+from ..models import Document, KnowledgeBaseFile
+from django.db import transaction
 from django.db.models import F
-from pgvector.django import L2Distance
+from .vector_index import ann_search_params, distance_expression, configured_quantization
+from .ingestion import BulkIngestor, EMBED_BATCH_SIZE
+from .pipeline import run_pipeline
+from .manifest import KnowledgeBaseSync, content_hash, register_file
+from .answer_cache import bump_knowledge_base_version, get_answer_cache, params_hash
+from .chunking import TokenChunker
+from .extractors import ExtractionStats, iter_documents, supported_files
+from .retrieval import (
+    search_many, lexical_search, hybrid_search, vector_search, is_keyword_query, filter_expression, search_params,
+    document_embeddings
+)
+from .context_packing import select_context
+from .summarization import MapReduceSummarizer
+from ..settings import CONTEXT_PACKING_CONFIG, RETRIEVAL_CONFIG, SUMMARIZATION_CONFIG
+from ..services.embedding_providers import document_embedding_provider
+from ..services.openai_clients import get_openai_client
+from ..services.single_flight import get_single_flight, request_key
 
 logger = logging.getLogger(__name__)
 MODEL_CHOICE = "openai"
 KNOWLEDGE_BASE_DIR = Path(__file__).resolve().parent.parent.parent / 'knowledge_base'
+# text.txt and questions.txt consumed by knowledge base enrichment; inputs, not knowledge base content
+ENRICHMENT_DATA_DIR = KNOWLEDGE_BASE_DIR / 'data'
+
+# Per-request (thread / task) retrieval metadata, so a shared HybridRAG
+# instance can serve concurrent requests
+_last_query_metadata: ContextVar[Dict[str, Any]] = ContextVar('last_query_metadata', default={})
 
 class HybridRAG:
-    def __init__(self):
+    def __init__(self, load_knowledge_base: bool = True):
         """Initialize the RAG system"""
         self.model_name = settings.AI_MODEL_CONFIG.get('OPENAI_MODEL', 'gpt-4')
         self.temperature = settings.AI_MODEL_CONFIG.get('TEMPERATURE', 0.7)
@@ -26,14 +49,37 @@ class HybridRAG:
         KNOWLEDGE_BASE_DIR.mkdir(parents=True, exist_ok=True)
         logger.info(f"Knowledge base directory: {KNOWLEDGE_BASE_DIR}")
         
-        # Initialize OpenAI client
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Shared OpenAI client and connection pool
+        self.openai_client = get_openai_client()
+
+        # Embeds documents and queries; raises if its dimensions don't match Document.embedding
+        self.embedder = document_embedding_provider()
         
-        # Store last query metadata
-        self.last_query_metadata = {}
+        # Token-aware chunker; the tokenizer is loaded on first use
+        self.chunker = TokenChunker()
+        self._tokenizer_failed = False
+
+        # Answers to earlier, similar questions (see rag.answer_cache)
+        self.answer_cache = get_answer_cache()
+
+        # Coalesces identical analysis calls already in flight
+        self.single_flight = get_single_flight()
+
+        # Condenses transcripts too long for one prompt (see rag.summarization)
+        self.summarizer = MapReduceSummarizer(self.openai_client, self.model_name)
         
         # Load initial knowledge base
-        self._load_knowledge_base()
+        if load_knowledge_base:
+            self._load_knowledge_base()
+
+    @property
+    def last_query_metadata(self) -> Dict[str, Any]:
+        """Metadata of the last retrieval made in the current thread / task"""
+        return _last_query_metadata.get()
+
+    @last_query_metadata.setter
+    def last_query_metadata(self, value: Dict[str, Any]):
+        _last_query_metadata.set(value)
 
     def generate_response(self, prompt: str, context: str = None) -> str:
         """Generate response using configured model"""
@@ -74,78 +120,205 @@ class HybridRAG:
             logger.error(f"Error checking enrichment status: {str(e)}")
             return False
 
-    def get_factual_context(self, query: str, k: int = 3) -> str:
-        """Get relevant context from knowledge base"""
-        try:
-            # Generate embedding for query using OpenAI
-            query_embedding = self.openai_client.embeddings.create(
-                input=query,
-                model="text-embedding-ada-002"
-            ).data[0].embedding
-            
-            # Query pgvector
-            results = Document.objects.annotate(
-                distance=L2Distance('embedding', query_embedding)
-            ).order_by('distance')[:k]
-            
+    def get_factual_context(self, query: str, k: int = 3, ef_search: int = None, probes: int = None,
+                            mode: str = None, filters: Dict[str, Any] = None) -> str:
+        """
+        Get relevant context from knowledge base
+
+        ef_search (HNSW) and probes (IVFFlat) trade recall for latency per call;
+        unset values use VECTOR_INDEX_CONFIG. filters restrict the search to
+        documents whose metadata matches (see retrieval.compile_filters).
+        """
+        retrieval = self.retrieve(query, k=k, ef_search=ef_search, probes=probes, mode=mode, filters=filters)
+        if 'documents' in retrieval:
             # Store metadata for later use
             self.last_query_metadata = {
-                "documents": [doc.content for doc in results],
-                "metadata": [doc.metadata for doc in results],
-                "distances": [float(doc.distance) for doc in results]
+                "documents": retrieval['documents'],
+                "metadata": retrieval['metadata'],
+                "distances": retrieval['distances']
             }
-            
-            # Combine relevant documents into context
-            context = "\n\n".join(doc.content for doc in results)
-            
-            return context
+        return retrieval['context']
+
+    def retrieve(self, query: str, k: int = 3, ef_search: int = None, probes: int = None,
+                 mode: str = None, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Retrieve context plus per-document metadata without touching instance state.
+        On failure only 'context' (empty) is returned.
+
+        mode is "vector", "lexical", "hybrid" (both fused by reciprocal rank) or
+        "auto", which answers identifier and code lookups from the full-text index
+        without an embedding call and falls back to hybrid when that finds nothing.
+        """
+        try:
+            mode = mode or RETRIEVAL_CONFIG['MODE']
+            # Over-fetch; _retrieval_result narrows the candidates back down to k
+            fetch = k * CONTEXT_PACKING_CONFIG['OVERFETCH'] if CONTEXT_PACKING_CONFIG['ENABLED'] else k
+            # Context packing needs the candidates' vectors; fetch them with the hits
+            with_embeddings = CONTEXT_PACKING_CONFIG['ENABLED']
+            if self._lexical_first(query, mode):
+                hits = lexical_search(query, k=fetch, filters=filters, with_embeddings=with_embeddings)
+                if hits or mode == 'lexical':
+                    return self._retrieval_result(hits, 'lexical', k)
+
+            # Generate embedding for query with the document embedding provider
+            query_embedding = self.embedder.embed_one(query)
+            
+            if mode == 'vector' and configured_quantization():
+                # Coarse search on the compressed index, exact rerank
+                hits = vector_search(query_embedding, k=fetch, ef_search=ef_search, probes=probes, filters=filters,
+                                     with_embeddings=with_embeddings)
+                return self._retrieval_result(hits, 'vector', k, query_embedding)
+
+            if mode == 'vector':
+                # Query pgvector through the ANN index
+                documents = Document.objects.all()
+                if filters:
+                    documents = documents.filter(filter_expression(filters))
+                with ann_search_params(**search_params(fetch, ef_search, probes, filters)):
+                    results = list(documents.annotate(
+                        distance=distance_expression(query_embedding)
+                    ).order_by('distance')[:fetch])
+                # Iterative scans may return rows slightly out of order
+                hits = sorted((
+                    {'id': doc.id, 'content': doc.content, 'metadata': doc.metadata, 'distance': float(doc.distance),
+                     'embedding': doc.embedding}
+                    for doc in results
+                ), key=lambda hit: hit['distance'])
+                return self._retrieval_result(hits, 'vector', k, query_embedding)
+
+            hits = hybrid_search(query, query_embedding, k=fetch, candidates=max(RETRIEVAL_CONFIG['CANDIDATES'], fetch),
+                                 ef_search=ef_search, probes=probes, filters=filters, with_embeddings=with_embeddings)
+            return self._retrieval_result(hits, 'hybrid', k, query_embedding)
             
         except Exception as e:
             logger.error(f"Error getting context: {str(e)}")
-            return ""
+            return {"context": ""}
+
+    def _lexical_first(self, query: str, mode: str = None) -> bool:
+        """Whether retrieve() tries the full-text index first, without embedding the query"""
+        mode = mode or RETRIEVAL_CONFIG['MODE']
+        return mode == 'lexical' or (mode == 'auto' and is_keyword_query(query))
+
+    def _retrieval_result(self, hits: List[Dict[str, Any]], mode: str, k: int,
+                          query_embedding: List[float] = None) -> Dict[str, Any]:
+        hits, packing = self._pack_context(hits, k, query_embedding)
+        result = {
+            # Combine relevant documents into context
+            "context": "\n\n".join(hit['content'] for hit in hits),
+            "documents": [hit['content'] for hit in hits],
+            "metadata": [hit['metadata'] for hit in hits],
+            "distances": [hit['distance'] for hit in hits],
+            "mode": mode
+        }
+        if packing:
+            result["packing"] = packing
+        return result
+
+    def _pack_context(self, hits: List[Dict[str, Any]], k: int, query_embedding: List[float] = None):
+        """Diverse, token-budgeted top-k of the over-fetched hits (see rag.context_packing)"""
+        if not CONTEXT_PACKING_CONFIG['ENABLED'] or len(hits) <= 1:
+            return hits[:k], None
+        try:
+            embeddings = {hit['id']: hit['embedding'] for hit in hits if hit.get('embedding') is not None}
+            if len(embeddings) < len(hits):
+                embeddings.update(document_embeddings([hit['id'] for hit in hits if hit['id'] not in embeddings]))
+            return select_context(hits, embeddings, query_embedding, k, self._count_tokens)
+        except Exception as e:
+            logger.error(f"Error packing context: {str(e)}")
+            return hits[:k], None
+
+    def _count_tokens(self, text: str) -> int:
+        """Tokens in text, estimated from its length if the tokenizer can't be loaded"""
+        if not self._tokenizer_failed:
+            try:
+                return self.chunker.count_tokens(text)
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable, estimating context tokens: {str(e)}")
+                self._tokenizer_failed = True
+        return len(text) // 4 + 1
+
+    def get_factual_context_many(self, queries: List[str], k: int = 3, ef_search: int = None,
+                                 probes: int = None, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Batched get_factual_context: one embedding request and one SQL statement
+        for all queries. Returns one entry per query with 'query', 'context' and
+        'hits' (content, metadata, distance). Does not touch last_query_metadata.
+        """
+        try:
+            if not queries:
+                return []
+            query_embeddings = self._embed_texts(queries)
+            results = search_many(query_embeddings, k=k, ef_search=ef_search, probes=probes, filters=filters)
+            return [
+                {
+                    'query': query,
+                    'context': "\n\n".join(hit['content'] for hit in hits),
+                    'hits': hits
+                }
+                for query, hits in zip(queries, results)
+            ]
 
-    def ingest_documents(self, directory_path: str) -> Dict[str, Any]:
+        except Exception as e:
+            logger.error(f"Error getting context for {len(queries)} queries: {str(e)}")
+            return [{'query': query, 'context': '', 'hits': []} for query in queries]
+
+    def ingest_documents(self, directory_path: str, mode: str = "serial",
+                         batch_size: int = EMBED_BATCH_SIZE, defer_index: bool = True,
+                         workers: int = None) -> Dict[str, Any]:
         """
-        Ingest text documents from a directory for RAG training
+        Ingest documents (text, PDF, DOCX, PPTX, Outlook .msg) from a directory for RAG training
+
+        Non-text formats are parsed in a pool of `workers` processes (default:
+        all cores) while already extracted documents are chunked and embedded.
+        mode="bulk" embeds chunks in multi-input batches, writes them with
+        bulk_create and defers ANN index maintenance until the load finishes.
+        mode="pipeline" does the same with extraction, chunking, embedding and
+        writing running concurrently (see rag.pipeline.IngestionPipeline).
         """
+        if mode == "bulk":
+            return self._ingest_documents_bulk(directory_path, batch_size, defer_index, workers)
+        if mode == "pipeline":
+            return self._ingest_documents_pipeline(directory_path, batch_size, defer_index, workers)
+
         try:
             directory = Path(directory_path)
             processed_files = 0
             failed_files = 0
+            extraction = ExtractionStats()
             
             print(f"Processing documents from {directory_path}...")
             
-            for file_path in directory.glob('*.txt'):
+            for document in iter_documents(supported_files(directory), workers=workers, stats=extraction):
+                file_path = document.path
+                if document.error:
+                    failed_files += 1
+                    continue
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        content = file.read()
-                        
-                        # Split content into chunks (simple splitting - could be more sophisticated)
-                        chunks = self._chunk_text(content, chunk_size=500)
+                    # Stream token-sized chunks instead of holding the whole file
+                    chunks = document.chunks(self.chunker)
+                    while True:
+                        batch = list(islice(chunks, EMBED_BATCH_SIZE))
+                        if not batch:
+                            break
                         
                         # Generate embeddings for each chunk
-                        for chunk in chunks:
-                            embedding = self.openai_client.embeddings.create(
-                                input=chunk,
-                                model="text-embedding-ada-002"
-                            ).data[0].embedding
-                            
-                            # Create unique ID for chunk
-                            chunk_id = str(uuid.uuid4())
-                            
+                        for chunk, embedding in zip(batch, self._embed_texts(batch)):
                             # Store in pgvector
                             Document.objects.create(
                                 content=chunk,
                                 embedding=embedding,
+                                content_hash=content_hash(chunk),
                                 metadata={
                                     'source': str(file_path),
+                                    'format': document.format,
                                     'timestamp': time.time(),
                                     'chunk_size': len(chunk)
                                 }
                             )
-                        
-                        processed_files += 1
-                        print(f"Processed {file_path.name}")
+                    
+                    processed_files += 1
+                    bump_knowledge_base_version()
+                    print(f"Processed {file_path.name}")
                         
                 except Exception as e:
                     logger.error(f"Error processing file {file_path}: {str(e)}")
@@ -153,18 +326,129 @@ class HybridRAG:
             
             return {
                 'processed_files': processed_files,
-                'failed_files': failed_files
+                'failed_files': failed_files,
+                'extraction': extraction.as_dict()
             }
             
         except Exception as e:
             logger.error(f"Error ingesting documents: {str(e)}")
             return {'error': str(e)}
 
-    def generate_insights(self, transcription: str) -> Dict[str, Any]:
-        """Generate insights using RAG-enhanced prompting"""
+    def _ingest_documents_bulk(self, directory_path: str, batch_size: int, defer_index: bool,
+                               workers: int = None) -> Dict[str, Any]:
+        """Batched embedding + bulk_create ingestion path"""
+        try:
+            directory = Path(directory_path)
+            counts = {'processed_files': 0, 'failed_files': 0}
+            extraction = ExtractionStats()
+
+            def iter_chunks():
+                for document in iter_documents(supported_files(directory), workers=workers, stats=extraction):
+                    file_path = document.path
+                    if document.error:
+                        counts['failed_files'] += 1
+                        continue
+                    try:
+                        for chunk in document.chunks(self.chunker):
+                            yield chunk, {
+                                'source': str(file_path),
+                                'format': document.format,
+                                'timestamp': time.time(),
+                                'chunk_size': len(chunk)
+                            }
+                    except Exception as e:
+                        logger.error(f"Error processing file {file_path}: {str(e)}")
+                        counts['failed_files'] += 1
+                        continue
+                    counts['processed_files'] += 1
+
+            ingestor = BulkIngestor(self.embedder, batch_size=batch_size, defer_index=defer_index)
+            stats = ingestor.ingest(iter_chunks())
+
+            return {**counts, 'stats': stats, 'extraction': extraction.as_dict()}
+
+        except Exception as e:
+            logger.error(f"Error ingesting documents: {str(e)}")
+            return {'error': str(e)}
+
+    def _ingest_documents_pipeline(self, directory_path: str, batch_size: int, defer_index: bool,
+                                   workers: int = None) -> Dict[str, Any]:
+        """Concurrent extract/chunk/embed/write ingestion path"""
         try:
+            result = run_pipeline(
+                supported_files(Path(directory_path)),
+                self.embedder,
+                self.chunker,
+                defer_index=defer_index,
+                batch_size=batch_size,
+                workers=workers,
+            )
+            counters = result['counters']
+            return {
+                'processed_files': counters['files'],
+                'failed_files': counters['failed_files'],
+                'stats': result['totals'],
+                'pipeline': result,
+            }
+
+        except Exception as e:
+            logger.error(f"Error ingesting documents: {str(e)}")
+            return {'error': str(e)}
+
+    def _condense_transcript(self, transcription: str, long_input: bool = None):
+        """
+        The transcript as is, or - when long_input is set, or left as None and
+        the transcript exceeds SUMMARIZATION_CONFIG['LONG_INPUT_TOKENS'] -
+        map-reduce notes of it plus the condensing stats.
+        """
+        if long_input is False:
+            return transcription, None
+        if long_input is None and self._count_tokens(transcription) <= SUMMARIZATION_CONFIG['LONG_INPUT_TOKENS']:
+            return transcription, None
+        condensed = self.summarizer.condense(transcription)
+        notes = condensed.pop('notes')
+        return f"(Notes condensed from {condensed['segments']} transcript segments)\n{notes}", condensed
+
+    def prepare_analysis(self, transcription: str, long_input: bool = None) -> Dict[str, Any]:
+        """
+        The transcript as the prompts will see it plus its knowledge base
+        retrieval, so several analysis stages can share one embedding and
+        one vector search. Identical preparations already in flight are
+        shared (see services.single_flight).
+        """
+        key = request_key('prepare_analysis', model=self.embedder.name, transcription=transcription,
+                          long_input=long_input)
+        return self.single_flight.do(key, lambda: self._prepare_analysis(transcription, long_input),
+                                     namespace='prepare_analysis')
+
+    def _prepare_analysis(self, transcription: str, long_input: bool = None) -> Dict[str, Any]:
+        transcription, condensed = self._condense_transcript(transcription, long_input)
+        return {'transcription': transcription, 'condensed': condensed, 'retrieval': self.retrieve(transcription)}
+
+    def generate_insights(self, transcription: str, long_input: bool = None,
+                          prepared: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Generate insights using RAG-enhanced prompting
+
+        Long transcripts are summarized segment by segment first (see
+        _condense_transcript). prepared comes from prepare_analysis().
+        Attendees asking for the same transcript's insights at once share
+        one generation (see services.single_flight).
+        """
+        key = request_key('generate_insights', model=self.model_name, temperature=self.temperature,
+                          transcription=transcription, long_input=long_input)
+        return self.single_flight.do(key, lambda: self._generate_insights(transcription, long_input, prepared),
+                                     namespace='generate_insights')
+
+    def _generate_insights(self, transcription: str, long_input: bool = None,
+                           prepared: Dict[str, Any] = None) -> Dict[str, Any]:
+        try:
+            prepared = prepared or self.prepare_analysis(transcription, long_input)
+            transcription, condensed = prepared['transcription'], prepared['condensed']
+
             # Get relevant context
-            context = self.get_factual_context(transcription)
+            retrieval = prepared['retrieval']
+            context = retrieval['context']
             
             prompt = f"""
             Based on our knowledge base context and analyzing this conversation, generate insights in exactly this format:
@@ -198,9 +482,9 @@ class HybridRAG:
             insights = response.choices[0].message.content
             
             # Calculate confidence based on context relevance
-            confidence = 1 - min(self.last_query_metadata.get("distances", [0]))
+            confidence = 1 - min(retrieval.get("distances", [0]))
             
-            return {
+            result = {
                 'insights': insights,
                 'confidence': confidence,
                 'sources': [
@@ -210,21 +494,47 @@ class HybridRAG:
                         'timestamp': meta.get('timestamp', '')
                     }
                     for meta, dist in zip(
-                        self.last_query_metadata.get("metadata", [])[:2],
-                        self.last_query_metadata.get("distances", [])[:2]
+                        retrieval.get("metadata", [])[:2],
+                        retrieval.get("distances", [])[:2]
                     )
                 ]
             }
+            if condensed:
+                result['long_input'] = condensed
+            return result
             
         except Exception as e:
             logger.error(f"Error generating insights: {str(e)}")
             return {'error': str(e)}
     
-    def generate_summary(self, transcription: str) -> Dict[str, Any]:
-        """Generate summary using RAG-enhanced prompting"""
+    def generate_summary(self, transcription: str, long_input: bool = None, prepared: Dict[str, Any] = None,
+                         identify_gaps: bool = True) -> Dict[str, Any]:
+        """
+        Generate summary using RAG-enhanced prompting
+
+        Long transcripts are summarized segment by segment first and this
+        prompt merges the segment notes (see _condense_transcript). prepared
+        comes from prepare_analysis(); with identify_gaps=False the caller
+        runs _identify_knowledge_gaps itself and 'suggested_updates' is omitted.
+        Identical summaries already in flight are shared (see
+        services.single_flight).
+        """
+        key = request_key('generate_summary', model=self.model_name, temperature=self.temperature,
+                          transcription=transcription, long_input=long_input, identify_gaps=identify_gaps)
+        return self.single_flight.do(
+            key, lambda: self._generate_summary(transcription, long_input, prepared, identify_gaps),
+            namespace='generate_summary'
+        )
+
+    def _generate_summary(self, transcription: str, long_input: bool = None, prepared: Dict[str, Any] = None,
+                          identify_gaps: bool = True) -> Dict[str, Any]:
         try:
+            prepared = prepared or self.prepare_analysis(transcription, long_input)
+            transcription, condensed = prepared['transcription'], prepared['condensed']
+
             # Get context with temporal awareness
-            context = self.get_factual_context(transcription)
+            retrieval = prepared['retrieval']
+            context = retrieval['context']
             
             # Enhanced prompt with RAG integration
             prompt = f"""
@@ -274,7 +584,7 @@ class HybridRAG:
             )
             
             # Enhanced metadata handling
-            confidence = 1 - min(self.last_query_metadata.get("distances", [0]))
+            confidence = 1 - min(retrieval.get("distances", [0]))
             sources = [
                 {
                     'source': meta.get('source', ''),
@@ -283,19 +593,23 @@ class HybridRAG:
                     'context_snippet': doc[:100] + "..." if len(doc) > 100 else doc
                 }
                 for meta, dist, doc in zip(
-                    self.last_query_metadata.get("metadata", []),
-                    self.last_query_metadata.get("distances", []),
-                    self.last_query_metadata.get("documents", [])
+                    retrieval.get("metadata", []),
+                    retrieval.get("distances", []),
+                    retrieval.get("documents", [])
                 )
             ]
             
-            return {
+            result = {
                 'summary': response.choices[0].message.content,
                 'confidence': confidence,
                 'sources': sources,
                 'context_used': context[:200] + "..." if len(context) > 200 else context,
-                'suggested_updates': self._identify_knowledge_gaps(transcription, context)
             }
+            if identify_gaps:
+                result['suggested_updates'] = self._identify_knowledge_gaps(transcription, context)
+            if condensed:
+                result['long_input'] = condensed
+            return result
             
         except Exception as e:
             return {'error': str(e)}
@@ -329,7 +643,9 @@ class HybridRAG:
             print(f"Error identifying knowledge gaps: {str(e)}")
             return []
 
-    def query(self, question: str, style: str = "conversation", user_context: Dict = None) -> Dict[str, Any]:
+    def query(self, question: str, style: str = "conversation", user_context: Dict = None,
+              ef_search: int = None, probes: int = None, mode: str = None,
+              filters: Dict[str, Any] = None) -> Dict[str, Any]:
         """Query method for real-time conversation"""
         if not self.is_enriched:
             return {
@@ -341,11 +657,57 @@ class HybridRAG:
             }
             
         try:
+            start = time.perf_counter()
+            cache_key = params_hash(
+                model=self.model_name, style=style, user_context=user_context,
+                ef_search=ef_search, probes=probes, mode=mode, filters=filters
+            )
+            question_embedding, cached, kb_version = self._cached_answer(question, cache_key, mode)
+            if cached is not None:
+                return cached
+
             # Get context from knowledge base only
-            context = self.get_factual_context(question)
+            retrieval = self.retrieve(question, ef_search=ef_search, probes=probes, mode=mode, filters=filters)
+            context = retrieval['context']
             
-            # Enhanced prompt using only RAG context
-            prompt = f"""
+            response = self.openai_client.chat.completions.create(
+                model=self.model_name,
+                messages=self._query_messages(question, context, style, user_context),
+                temperature=self.temperature,
+                max_tokens=500
+            )
+            
+            result = self._query_result(response.choices[0].message.content, retrieval, style)
+            if question_embedding is not None:
+                self.answer_cache.store(question, question_embedding, self.embedder.name, cache_key,
+                                        kb_version, result, time.perf_counter() - start)
+            return result
+            
+        except Exception as e:
+            return {
+                'error': str(e),
+                'answer': "Error processing query",
+                'confidence': 0.0
+            }
+
+    def _cached_answer(self, question: str, cache_key: str, mode: str = None):
+        """
+        (question embedding, cached answer, version to store under) for the
+        semantic answer cache. Paraphrases of an answered question reuse the
+        stored answer; the embedding is cached, so retrieval doesn't request
+        it again. Questions retrieve() answers from the full-text index skip
+        the cache, which would cost the embedding call that path avoids.
+        """
+        if self._lexical_first(question, mode):
+            return None, None, None
+        question_embedding = self.embedder.embed_one(question)
+        cached, kb_version = self.answer_cache.lookup(question_embedding, self.embedder.name, cache_key)
+        return question_embedding, cached, kb_version
+
+    def _query_messages(self, question: str, context: str, style: str, user_context: Dict = None) -> List[Dict[str, str]]:
+        """Chat messages for query() / query_stream()"""
+        # Enhanced prompt using only RAG context
+        prompt = f"""
             Using our knowledge base context:
             
             {context}
@@ -360,34 +722,77 @@ class HybridRAG:
             User Context: {json.dumps(user_context) if user_context else 'None'}
             Style: {style}
             """
-            
-            response = self.openai_client.chat.completions.create(
+        return [
+            {"role": "system", "content": """
+                You are an expert at providing information from our knowledge base.
+                Be clear about what you know and what might need additional research.
+            """},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _query_result(self, answer: str, retrieval: Dict[str, Any], style: str) -> Dict[str, Any]:
+        return {
+            'answer': answer,
+            'confidence': 1 - min(retrieval.get("distances") or [1.0]),
+            'style_used': style,
+            'sources': [s.get('source') for s in retrieval.get("metadata", [])],
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def query_stream(self, question: str, style: str = "conversation", user_context: Dict = None,
+                     ef_search: int = None, probes: int = None, mode: str = None,
+                     filters: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming query(): yields {'type': 'token', 'content'} as the answer is
+        generated, then one {'type': 'done'} event with everything query()
+        returns except the answer (confidence, sources, cache). A cached
+        answer arrives as a single token event. Blocking generator.
+        """
+        if not self.is_enriched:
+            result = self.query(question, style=style)
+            yield {'type': 'token', 'content': result['answer']}
+            yield {'type': 'done', **{key: value for key, value in result.items() if key != 'answer'}}
+            return
+
+        try:
+            start = time.perf_counter()
+            cache_key = params_hash(
+                model=self.model_name, style=style, user_context=user_context,
+                ef_search=ef_search, probes=probes, mode=mode, filters=filters
+            )
+            question_embedding, cached, kb_version = self._cached_answer(question, cache_key, mode)
+            if cached is not None:
+                yield {'type': 'token', 'content': cached['answer']}
+                yield {'type': 'done', **{key: value for key, value in cached.items() if key != 'answer'}}
+                return
+
+            retrieval = self.retrieve(question, ef_search=ef_search, probes=probes, mode=mode, filters=filters)
+            stream = self.openai_client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": """
-                        You are an expert at providing information from our knowledge base.
-                        Be clear about what you know and what might need additional research.
-                    """},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._query_messages(question, retrieval['context'], style, user_context),
                 temperature=self.temperature,
-                max_tokens=500
+                max_tokens=500,
+                stream=True
             )
-            
-            return {
-                'answer': response.choices[0].message.content,
-                'confidence': 1 - min(self.last_query_metadata.get("distances", [1.0])),
-                'style_used': style,
-                'sources': [s['source'] for s in self.last_query_metadata.get("metadata", [])],
-                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
+            parts = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    parts.append(content)
+                    yield {'type': 'token', 'content': content}
+
+            # Same cache entry as query(), so either path can answer the next paraphrase
+            result = self._query_result(''.join(parts), retrieval, style)
+            if question_embedding is not None:
+                self.answer_cache.store(question, question_embedding, self.embedder.name, cache_key,
+                                        kb_version, result, time.perf_counter() - start)
+            yield {'type': 'done', **{key: value for key, value in result.items() if key != 'answer'}}
+
         except Exception as e:
-            return {
-                'error': str(e),
-                'answer': "Error processing query",
-                'confidence': 0.0
-            }
+            logger.error(f"Error streaming query: {str(e)}")
+            yield {'type': 'error', 'error': str(e)}
 
     def inspect_collection(self) -> Dict[str, Any]:
         """Inspect the current state of the knowledge base"""
@@ -404,16 +809,8 @@ class HybridRAG:
     def _is_duplicate(self, content: str) -> bool:
         """Check if content is already in knowledge base"""
         try:
-            results = Document.objects.annotate(
-                distance=L2Distance('embedding', self.openai_client.embeddings.create(
-                    input=content,
-                    model="text-embedding-ada-002"
-                ).data[0].embedding)
-            ).order_by('distance')[:1]
-            if results and results[0].distance:
-                return results[0].distance < 0.1  # Similarity threshold
-            return False
-        except:
+            return Document.objects.filter(content_hash=content_hash(content)).exists()
+        except Exception:
             return False
 
     def add_to_knowledge_base(self, document: Dict[str, Any], save_to_file: bool = True) -> bool:
@@ -423,27 +820,33 @@ class HybridRAG:
                 logger.warning("Empty content in document")
                 return False
             
+            # Generate embedding
+            embedding = self.embedder.embed_one(document['content'])
+
             # Save to file if requested
+            file_path = None
             if save_to_file:
                 file_path = KNOWLEDGE_BASE_DIR / f"learned_{int(time.time())}.txt"
                 with open(file_path, 'w', encoding='utf-8') as f:
                     f.write(document['content'])
-            
-            # Generate embedding
-            embedding = self.openai_client.embeddings.create(
-                input=document['content'],
-                model="text-embedding-ada-002"
-            ).data[0].embedding
-            
-            # Add to pgvector
-            Document.objects.create(
-                content=document['content'],
-                embedding=embedding,
-                metadata={
-                    **document['metadata'],
-                    'file_path': str(file_path) if save_to_file else None
-                }
-            )
+
+            with transaction.atomic():
+                # Recorded in the manifest together with its row, so the next sync neither
+                # embeds it again nor skips it if the row wasn't written
+                source_file = register_file(file_path) if file_path else None
+
+                # Add to pgvector
+                Document.objects.create(
+                    content=document['content'],
+                    embedding=embedding,
+                    content_hash=content_hash(document['content']),
+                    source_file=source_file,
+                    metadata={
+                        **document['metadata'],
+                        'file_path': str(file_path) if file_path else None
+                    }
+                )
+                bump_knowledge_base_version()
             
             return True
             
@@ -455,64 +858,32 @@ class HybridRAG:
         """Clear all content from knowledge base"""
         try:
             Document.objects.all().delete()
+            KnowledgeBaseFile.objects.all().delete()
+            bump_knowledge_base_version()
             return True
         except Exception as e:
             logger.error(f"Error clearing knowledge base: {str(e)}")
             return False
 
-    async def _load_knowledge_base(self):
-        """Load documents from knowledge base directory"""
+    def _load_knowledge_base(self) -> Dict[str, Any]:
+        """Sync documents from knowledge base directory, embedding only new or changed chunks"""
         try:
-            # Get all text files from knowledge base directory
-            knowledge_files = glob.glob(str(KNOWLEDGE_BASE_DIR / "**/*.txt"), recursive=True)
-            logger.info(f"Found {len(knowledge_files)} knowledge base files")
-
-            for file_path in knowledge_files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        content = file.read().strip()
-                        if content:  # Only process non-empty files
-                            # Generate embedding
-                            embedding = self.openai_client.embeddings.create(
-                                input=content,
-                                model="text-embedding-ada-002"
-                            ).data[0].embedding
-
-                            # Add to pgvector with metadata
-                            Document.objects.create(
-                                content=content,
-                                embedding=embedding,
-                                metadata={
-                                    'source': str(file_path),
-                                    'timestamp': time.time(),
-                                    'type': 'knowledge_base'
-                                }
-                            )
-                            logger.info(f"Loaded knowledge base file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Error processing knowledge base file {file_path}: {str(e)}")
+            sync = KnowledgeBaseSync(
+                embed_fn=self._embed_texts,
+                chunk_fn=self._chunk_text,
+                exclude=[ENRICHMENT_DATA_DIR]
+            )
+            return sync.sync(KNOWLEDGE_BASE_DIR)
 
         except Exception as e:
             logger.error(f"Error loading knowledge base: {str(e)}")
+            return {'error': str(e)}
 
-    def _chunk_text(self, text: str, chunk_size: int = 500) -> List[str]:
-        """Split text into chunks of approximately equal size"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for word in words:
-            current_chunk.append(word)
-            current_size += len(word) + 1  # +1 for space
-            
-            if current_size >= chunk_size:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = []
-                current_size = 0
-        
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-        
-        return chunks
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches through the shared cache, preserving input order"""
+        return self.embedder.embed(texts)
+
+    def _chunk_text(self, text: str) -> List[str]:
+        """Split text into token-sized chunks cut at sentence boundaries"""
+        return list(self.chunker.chunk_text(text))
     
@@ -0,0 +1,164 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterable, Tuple
+
+from django.db import transaction
+
+from ..models import Document
+from .vector_index import vector_index_definitions, drop_vector_indexes, restore_vector_indexes, vector_index_lock
+from .manifest import content_hash
+from .answer_cache import bump_knowledge_base_version
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts up to 2048 inputs per embeddings request
+EMBED_BATCH_SIZE = 256
+WRITE_BATCH_SIZE = 500
+
+
+class IngestionStats:
+    """Counters and per-stage timings for a bulk load"""
+
+    def __init__(self):
+        self.chunks = 0
+        self.tokens = 0
+        self.embedding_requests = 0
+        self.write_transactions = 0
+        self.stage_seconds = {'read': 0.0, 'embed': 0.0, 'write': 0.0, 'index': 0.0}
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def add_time(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            'chunks': self.chunks,
+            'tokens': self.tokens,
+            'embedding_requests': self.embedding_requests,
+            'write_transactions': self.write_transactions,
+            'elapsed_seconds': round(elapsed, 3),
+            'chunks_per_second': round(self.chunks / elapsed, 2) if elapsed else 0.0,
+            'tokens_per_second': round(self.tokens / elapsed, 2) if elapsed else 0.0,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+        }
+
+
+@contextmanager
+def deferred_vector_indexes(stats: IngestionStats, enabled: bool = True):
+    """
+    Drop the ANN indexes for the duration of a load and rebuild them afterwards.
+
+    The whole window holds vector_index_lock. A load that starts while
+    another one has the indexes dropped doesn't defer: it writes with
+    whatever indexes exist and the first load's rebuild covers its rows.
+    """
+    if not enabled:
+        yield
+        return
+
+    with vector_index_lock(wait=False) as acquired:
+        if not acquired:
+            logger.info("Vector indexes are already deferred by another load; loading without deferring")
+            yield
+            return
+
+        start = time.perf_counter()
+        deferred = vector_index_definitions()
+        drop_vector_indexes()
+        stats.add_time('index', time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            if deferred:
+                start = time.perf_counter()
+                restore_vector_indexes(deferred)
+                stats.add_time('index', time.perf_counter() - start)
+
+
+class BulkIngestor:
+    """
+    Embed chunks in multi-input batches and write them with bulk_create,
+    one transaction per batch.
+
+    With defer_index=True the ANN indexes on Document.embedding are dropped
+    for the duration of the load and rebuilt once at the end, which is much
+    cheaper than maintaining the graph row by row. Retrieval falls back to
+    a sequential scan while the load is running.
+    """
+
+    def __init__(self, provider, batch_size: int = EMBED_BATCH_SIZE, defer_index: bool = True):
+        self.provider = provider
+        self.batch_size = batch_size
+        self.defer_index = defer_index
+        self.stats = IngestionStats()
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts with a single provider call"""
+        start = time.perf_counter()
+        tokens_before = self.provider.tokens_used
+        embeddings = self.provider.embed(texts)
+        self.stats.add_time('embed', time.perf_counter() - start)
+        self.stats.embedding_requests += 1
+        self.stats.tokens += self.provider.tokens_used - tokens_before
+        return embeddings
+
+    def write_batch(self, chunks: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]],
+                    source_file=None):
+        """Insert a batch of rows in one transaction, optionally owned by a manifest entry"""
+        start = time.perf_counter()
+        with transaction.atomic():
+            Document.objects.bulk_create(
+                [
+                    Document(content=chunk, embedding=embedding, content_hash=content_hash(chunk),
+                             source_file=source_file, metadata=metadata)
+                    for chunk, embedding, metadata in zip(chunks, embeddings, metadatas)
+                ],
+                batch_size=WRITE_BATCH_SIZE
+            )
+            bump_knowledge_base_version()
+        self.stats.add_time('write', time.perf_counter() - start)
+        self.stats.write_transactions += 1
+        self.stats.chunks += len(chunks)
+
+    def _flush(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        chunks = [chunk for chunk, _ in batch]
+        metadatas = [metadata for _, metadata in batch]
+        self.write_batch(chunks, self.embed_batch(chunks), metadatas)
+
+    def ingest(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Load (chunk, metadata) pairs. Items are consumed lazily, so time spent
+        producing them is reported as the 'read' stage.
+        """
+        with deferred_vector_indexes(self.stats, self.defer_index):
+            batch = []
+            iterator = iter(items)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, None)
+                self.stats.add_time('read', time.perf_counter() - start)
+                if item is None:
+                    break
+
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+
+            if batch:
+                self._flush(batch)
+
+        self.stats.finish()
+        result = self.stats.as_dict()
+        logger.info(
+            f"Bulk ingestion finished: {result['chunks']} chunks in {result['elapsed_seconds']}s "
+            f"({result['chunks_per_second']} chunks/s, {result['tokens_per_second']} tokens/s), "
+            f"stages: {result['stage_seconds']}"
+        )
+        return result
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterable, Sequence
+
+from django.db import transaction
+
+from ..models import Document, KnowledgeBaseFile
+from .answer_cache import bump_knowledge_base_version
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Content address of a chunk or document"""
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    """sha256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def register_file(path: Path, chunk_count: int = 1) -> KnowledgeBaseFile:
+    """Record a file that was written and stored outside of sync (e.g. add_to_knowledge_base)"""
+    stat = path.stat()
+    entry, _ = KnowledgeBaseFile.objects.update_or_create(
+        path=str(path),
+        defaults={
+            'content_hash': file_hash(path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'chunk_count': chunk_count,
+        }
+    )
+    return entry
+
+
+def backfill_content_hashes(batch_size: int = 1000) -> int:
+    """Hash Document rows stored before content hashes existed; returns how many were updated"""
+    updated, batch = 0, []
+    for document in Document.objects.filter(content_hash='').only('id', 'content').iterator(chunk_size=batch_size):
+        document.content_hash = content_hash(document.content)
+        batch.append(document)
+        if len(batch) >= batch_size:
+            updated += Document.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        updated += Document.objects.bulk_update(batch, ['content_hash'])
+    if updated:
+        logger.info(f"Backfilled content hashes for {updated} documents")
+    return updated
+
+
+class KnowledgeBaseSync:
+    """
+    Incrementally reconcile Document rows with the files under a directory.
+
+    Files whose size and mtime match the manifest are skipped without being
+    read; files whose contents hash the same are skipped without being
+    chunked. For changed files only chunks whose hash is not already stored
+    are embedded, stale chunks are deleted, and files that disappeared from
+    disk have their rows removed. Rows loaded before the manifest existed
+    are hashed and adopted by their file (matched on metadata 'source')
+    instead of being inserted again.
+
+    Files under an `exclude` directory are not knowledge base content; any
+    rows they were given are removed. Manifest entries for files the
+    pattern doesn't match (e.g. PDFs registered by an ingest job) are left
+    alone while the file exists.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 chunk_fn: Callable[[str], Iterable[str]], pattern: str = "**/*.txt",
+                 exclude: Sequence[Path] = ()):
+        self.embed_fn = embed_fn
+        self.chunk_fn = chunk_fn
+        self.pattern = pattern
+        self.exclude = [Path(path).resolve() for path in exclude]
+
+    def is_excluded(self, path: Path) -> bool:
+        path = Path(path).resolve()
+        return any(path == excluded or excluded in path.parents for excluded in self.exclude)
+
+    def sync(self, directory: Path) -> Dict[str, Any]:
+        start = time.perf_counter()
+        stats = {
+            'unchanged_files': 0,
+            'updated_files': 0,
+            'removed_files': 0,
+            'failed_files': 0,
+            'embedded_chunks': 0,
+            'reused_chunks': 0,
+            'deleted_chunks': 0,
+            'backfilled_hashes': backfill_content_hashes(),
+        }
+
+        manifest = {entry.path: entry for entry in KnowledgeBaseFile.objects.all()}
+        seen = set()
+
+        for file_path in sorted(directory.glob(self.pattern)):
+            if not file_path.is_file() or self.is_excluded(file_path):
+                continue
+            path = str(file_path)
+            seen.add(path)
+            try:
+                if self._sync_file(file_path, manifest.get(path), stats):
+                    stats['updated_files'] += 1
+                else:
+                    stats['unchanged_files'] += 1
+            except Exception as e:
+                logger.error(f"Error processing knowledge base file {file_path}: {str(e)}")
+                stats['failed_files'] += 1
+
+        for path, entry in manifest.items():
+            if path not in seen and (not os.path.exists(path) or self.is_excluded(path)):
+                deleted, _ = entry.chunks.all().delete()
+                entry.delete()
+                bump_knowledge_base_version()
+                stats['deleted_chunks'] += deleted
+                stats['removed_files'] += 1
+                logger.info(f"Removed knowledge base file from index: {path}")
+
+        stats['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(f"Knowledge base sync: {stats}")
+        return stats
+
+    def _sync_file(self, file_path: Path, entry: KnowledgeBaseFile, stats: Dict[str, Any]) -> bool:
+        """Bring one file up to date. Returns False when nothing changed."""
+        stat = file_path.stat()
+        if entry and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+            return False
+
+        digest = file_hash(file_path)
+        if entry and entry.content_hash == digest:
+            # Touched but not modified
+            KnowledgeBaseFile.objects.filter(pk=entry.pk).update(mtime=stat.st_mtime, size=stat.st_size)
+            return False
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+
+        # Ordered, de-duplicated chunks keyed by content hash
+        chunks = {}
+        for chunk in self.chunk_fn(content) if content else []:
+            chunks.setdefault(content_hash(chunk), chunk)
+
+        if entry:
+            rows = entry.chunks.values_list('content_hash', 'id')
+        else:
+            # Rows this file got before the manifest existed
+            rows = Document.objects.filter(
+                source_file__isnull=True, metadata__source=str(file_path)
+            ).values_list('content_hash', 'id')
+        existing, duplicate_ids = {}, []
+        for h, doc_id in rows:
+            if h in existing:
+                duplicate_ids.append(doc_id)
+            else:
+                existing[h] = doc_id
+
+        missing = [h for h in chunks if h not in existing]
+        stale_ids = [doc_id for h, doc_id in existing.items() if h not in chunks] + duplicate_ids
+        adopted_ids = [existing[h] for h in chunks if h in existing] if not entry else []
+
+        # Reuse embeddings already stored for identical chunks in other files
+        embeddings = {}
+        if missing:
+            for h, embedding in Document.objects.filter(
+                content_hash__in=missing
+            ).values_list('content_hash', 'embedding'):
+                embeddings.setdefault(h, embedding)
+            stats['reused_chunks'] += len(embeddings)
+
+            to_embed = [h for h in missing if h not in embeddings]
+            if to_embed:
+                for h, embedding in zip(to_embed, self.embed_fn([chunks[h] for h in to_embed])):
+                    embeddings[h] = embedding
+                stats['embedded_chunks'] += len(to_embed)
+
+        with transaction.atomic():
+            entry, _ = KnowledgeBaseFile.objects.update_or_create(
+                path=str(file_path),
+                defaults={
+                    'content_hash': digest,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'chunk_count': len(chunks),
+                }
+            )
+            if adopted_ids:
+                Document.objects.filter(id__in=adopted_ids).update(source_file=entry)
+            if stale_ids:
+                deleted, _ = Document.objects.filter(id__in=stale_ids).delete()
+                stats['deleted_chunks'] += deleted
+            Document.objects.bulk_create([
+                Document(
+                    content=chunks[h],
+                    embedding=embeddings[h],
+                    content_hash=h,
+                    source_file=entry,
+                    metadata={
+                        'source': str(file_path),
+                        'timestamp': time.time(),
+                        'type': 'knowledge_base',
+                        'file_name': os.path.basename(file_path),
+                    }
+                )
+                for h in missing
+            ])
+            if missing or stale_ids:
+                bump_knowledge_base_version()
+
+        logger.info(f"Loaded knowledge base file: {file_path} ({len(missing)} new, {len(stale_ids)} stale chunks)")
+        return True
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Any, Iterable
+
+from django.db import connection
+
+from ..models import Document
+from ..settings import PIPELINE_CONFIG
+from .answer_cache import bump_knowledge_base_version
+from .ingestion import BulkIngestor, IngestionStats, EMBED_BATCH_SIZE, WRITE_BATCH_SIZE, deferred_vector_indexes
+from .extractors import ExtractionStats, iter_documents
+
+logger = logging.getLogger(__name__)
+
+# Pipelines currently running in this process, for the metrics endpoints
+_active = set()
+_active_lock = threading.Lock()
+
+
+def active_pipelines() -> List[Dict[str, Any]]:
+    with _active_lock:
+        return [pipeline.metrics() for pipeline in _active]
+
+
+class StageMetrics:
+    """Latency of one pipeline stage over its recent items"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=1000)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        p95 = recent[int(0.95 * (len(recent) - 1))] if recent else 0.0
+        return {
+            'count': self.count,
+            'total_seconds': round(self.total_seconds, 3),
+            'mean_ms': round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            'p95_ms': round(p95 * 1000, 2),
+            'max_ms': round(self.max_seconds * 1000, 2),
+        }
+
+
+class IngestionPipeline:
+    """
+    extract -> chunk -> embed -> write, as asyncio tasks joined by bounded queues.
+
+    Extraction (process pool) and chunking (tokenizer) run in threads so
+    they don't block the loop. embed_concurrency embedding workers share
+    the batch queue, so at most that many embedding requests are in flight;
+    429s and transient errors are retried by the OpenAI gateway.
+    A single writer flushes WRITE_BATCH_SIZE rows per transaction on its own
+    database thread. Documents are chunked lazily a batch at a time and full
+    queues make upstream stages wait, so memory stays bounded however large
+    a file is or however fast extraction runs.
+
+    Rows are written as they are embedded, so a file can be partly written
+    when it fails (a chunking error partway through, or a batch that can't
+    be embedded). Each file's progress is tracked in file_state; once the
+    pipeline drains, the rows of failed files are deleted again (they are
+    found by their 'source' and this run's 'ingest_run' metadata).
+    """
+
+    def __init__(self, provider, chunker, batch_size: int = EMBED_BATCH_SIZE,
+                 embed_concurrency: int = None, queue_size: int = None, workers: int = None):
+        self.provider = provider
+        self.chunker = chunker
+        self.batch_size = batch_size
+        self.embed_concurrency = embed_concurrency or PIPELINE_CONFIG['EMBED_CONCURRENCY']
+        self.queue_size = queue_size or PIPELINE_CONFIG['QUEUE_SIZE']
+        self.workers = workers
+
+        self.stats = IngestionStats()
+        self.extraction = ExtractionStats()
+        self.writer = BulkIngestor(provider, batch_size=batch_size, defer_index=False)
+        self.writer.stats = self.stats
+        self.stages = {name: StageMetrics() for name in ('extract', 'chunk', 'embed', 'write')}
+        self.counters = {'files': 0, 'failed_files': 0, 'failed_chunks': 0, 'in_flight': 0}
+        # source -> {'chunks', 'written', 'chunked', 'failed', 'done'}
+        self.file_state: Dict[str, Dict[str, Any]] = {}
+        self.run_id = uuid.uuid4().hex
+        self.queues = {}
+        self._db_executor = None
+        self._tokens_start = provider.tokens_used
+
+    def metrics(self) -> Dict[str, Any]:
+        """Live snapshot: queue depths, in-flight requests, per-stage latency and totals"""
+        return {
+            'queues': {name: {'depth': queue.qsize(), 'capacity': queue.maxsize} for name, queue in self.queues.items()},
+            'embed_concurrency': self.embed_concurrency,
+            'counters': dict(self.counters),
+            'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+            'totals': self.stats.as_dict(),
+        }
+
+    async def run(self, paths: Iterable[Path]) -> Dict[str, Any]:
+        self.queues = {
+            'documents': asyncio.Queue(maxsize=self.queue_size),
+            'batches': asyncio.Queue(maxsize=self.queue_size),
+            'embedded': asyncio.Queue(maxsize=self.queue_size),
+        }
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-writer')
+        with _active_lock:
+            _active.add(self)
+
+        tasks = [
+            asyncio.create_task(self._extract(paths)),
+            asyncio.create_task(self._chunk()),
+            *[asyncio.create_task(self._embed()) for _ in range(self.embed_concurrency)],
+            asyncio.create_task(self._write()),
+        ]
+        reporter = asyncio.create_task(self._report())
+        try:
+            await asyncio.gather(*tasks)
+            await asyncio.get_running_loop().run_in_executor(self._db_executor, self._remove_failed_files)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            reporter.cancel()
+            with _active_lock:
+                _active.discard(self)
+            # asyncio.run() closes this loop next; its embedding client goes with it
+            await self.provider.aclose()
+            await asyncio.get_running_loop().run_in_executor(self._db_executor, connection.close)
+            self._db_executor.shutdown()
+
+        self.stats.finish()
+        result = self.metrics()
+        result['extraction'] = self.extraction.as_dict()
+        logger.info(
+            f"Pipeline ingestion finished: {result['totals']['chunks']} chunks in "
+            f"{result['totals']['elapsed_seconds']}s ({result['totals']['chunks_per_second']} chunks/s)"
+        )
+        return result
+
+    async def _extract(self, paths: Iterable[Path]):
+        documents = self.queues['documents']
+        iterator = iter_documents(paths, workers=self.workers, stats=self.extraction)
+        while True:
+            start = time.perf_counter()
+            document = await asyncio.to_thread(next, iterator, None)
+            if document is None:
+                break
+            self.stages['extract'].observe(time.perf_counter() - start)
+            if document.error:
+                self.counters['failed_files'] += 1
+                continue
+            await documents.put(document)
+        await documents.put(None)
+
+    async def _chunk(self):
+        documents, batches = self.queues['documents'], self.queues['batches']
+        batch = []
+        while True:
+            document = await documents.get()
+            if document is None:
+                break
+            source = str(document.path)
+            state = self.file_state[source] = {
+                'chunks': 0, 'written': 0, 'chunked': False, 'failed': False, 'done': False
+            }
+            metadata = {'source': source, 'format': document.format, 'ingest_run': self.run_id}
+            iterator = document.chunks(self.chunker)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    pieces = await asyncio.to_thread(list, islice(iterator, self.batch_size - len(batch)))
+                    if not pieces:
+                        break
+                    self.stages['chunk'].observe(time.perf_counter() - start)
+                    state['chunks'] += len(pieces)
+                    batch.extend(
+                        (chunk, {**metadata, 'timestamp': time.time(), 'chunk_size': len(chunk)})
+                        for chunk in pieces
+                    )
+                    if len(batch) >= self.batch_size:
+                        await batches.put(batch)
+                        batch = []
+            except Exception as e:
+                logger.error(f"Error chunking {document.path}: {str(e)}")
+                self._fail_file(source)
+                continue
+            state['chunked'] = True
+            self._file_progress(source)
+
+        if batch:
+            await batches.put(batch)
+        for _ in range(self.embed_concurrency):
+            await batches.put(None)
+
+    def _fail_file(self, source: str):
+        state = self.file_state[source]
+        if not state['failed'] and not state['done']:
+            state['failed'] = True
+            self.counters['failed_files'] += 1
+
+    def _file_progress(self, source: str):
+        """Count a file once it is fully chunked and every one of its chunks is written"""
+        state = self.file_state[source]
+        if state['chunked'] and not state['failed'] and not state['done'] and state['written'] == state['chunks']:
+            state['done'] = True
+            self.counters['files'] += 1
+
+    def _remove_failed_files(self):
+        """Delete the rows this run wrote for files that failed partway through"""
+        removed = 0
+        for source, state in self.file_state.items():
+            if state['failed'] and state['written']:
+                deleted, _ = Document.objects.filter(
+                    metadata__contains={'source': source, 'ingest_run': self.run_id}
+                ).delete()
+                removed += deleted
+        if removed:
+            bump_knowledge_base_version()
+            logger.info(f"Removed {removed} rows of partially ingested files")
+
+    async def _embed(self):
+        batches, embedded = self.queues['batches'], self.queues['embedded']
+        while True:
+            batch = await batches.get()
+            if batch is None:
+                await embedded.put(None)
+                return
+
+            texts = [chunk for chunk, _ in batch]
+            start = time.perf_counter()
+            self.counters['in_flight'] += 1
+            try:
+                embeddings = await self.provider.aembed(texts)
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)} chunks: {str(e)}")
+                self.counters['failed_chunks'] += len(texts)
+                for source in {metadata['source'] for _, metadata in batch}:
+                    self._fail_file(source)
+                continue
+            finally:
+                self.counters['in_flight'] -= 1
+            seconds = time.perf_counter() - start
+            self.stages['embed'].observe(seconds)
+            self.stats.add_time('embed', seconds)
+            self.stats.embedding_requests += 1
+            # Running total rather than a per-request delta, which concurrent workers would overlap
+            self.stats.tokens = self.provider.tokens_used - self._tokens_start
+            await embedded.put((batch, embeddings))
+
+    async def _write(self):
+        embedded = self.queues['embedded']
+        loop = asyncio.get_running_loop()
+        pending, finished = [], 0
+
+        async def flush():
+            chunks = [chunk for (chunk, _), _ in pending]
+            metadatas = [metadata for (_, metadata), _ in pending]
+            embeddings = [embedding for _, embedding in pending]
+            start = time.perf_counter()
+            await loop.run_in_executor(self._db_executor, self.writer.write_batch, chunks, embeddings, metadatas)
+            self.stages['write'].observe(time.perf_counter() - start)
+            for metadata in metadatas:
+                self.file_state[metadata['source']]['written'] += 1
+            for source in {metadata['source'] for metadata in metadatas}:
+                self._file_progress(source)
+            pending.clear()
+
+        while finished < self.embed_concurrency:
+            item = await embedded.get()
+            if item is None:
+                finished += 1
+                continue
+            batch, embeddings = item
+            pending.extend(zip(batch, embeddings))
+            if len(pending) >= WRITE_BATCH_SIZE:
+                await flush()
+
+        if pending:
+            await flush()
+
+    async def _report(self):
+        interval = PIPELINE_CONFIG['METRICS_INTERVAL']
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.metrics()
+            logger.info(
+                f"Ingestion pipeline: queues {snapshot['queues']}, in flight {snapshot['counters']['in_flight']}, "
+                f"{snapshot['totals']['chunks']} chunks written ({snapshot['totals']['chunks_per_second']} chunks/s)"
+            )
+
+
+def run_pipeline(paths: Iterable[Path], provider, chunker, defer_index: bool = True,
+                 **options) -> Dict[str, Any]:
+    """Run an IngestionPipeline to completion from synchronous code"""
+    pipeline = IngestionPipeline(provider, chunker, **options)
+    with deferred_vector_indexes(pipeline.stats, defer_index):
+        return asyncio.run(pipeline.run(paths))
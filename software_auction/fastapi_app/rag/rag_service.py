@@ -1,22 +1,21 @@
 import logging
-from .hybrid_rag import HybridRAG, KNOWLEDGE_BASE_DIR
+from .hybrid_rag import HybridRAG, KNOWLEDGE_BASE_DIR, ENRICHMENT_DATA_DIR
+from ..lifecycle import get_rag
+from ..jobs import enqueue
 from django.http import JsonResponse
 from ..services.context_service import ContextService
 import time
-import uuid
 import os
 import json
 from django.conf import settings
 from pathlib import Path
 from typing import Dict, Any, List
-from openai import OpenAI
+from ..services.openai_clients import get_openai_client
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+# Shared OpenAI client
+client = get_openai_client()
 
 class RAGService:
     """Service class for RAG operations"""
@@ -66,233 +65,219 @@ class RAGService:
 
     @staticmethod
     def handle_enrich_knowledge_base(data: dict) -> dict:
-        """Handle knowledge base enrichment request"""
+        """Queue a knowledge base enrichment job; progress is reported by jobs.job_status"""
         try:
-            rag = HybridRAG()
-            
-            # Get the knowledge base data directory
-            base_dir = KNOWLEDGE_BASE_DIR / 'data'
-            base_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Initialize services at the start
-            knowledge_service = KnowledgeService()
-            
-            # Path to text.txt and questions.txt
-            text_path = base_dir / 'text.txt'
-            questions_path = base_dir / 'questions.txt'
-            
-            logger.info(f"Looking for text.txt at: {text_path}")
-            logger.info(f"Looking for questions.txt at: {questions_path}")
-            
-            processed_count = 0
-            text_summary = ""
-            full_content = []
-            
-            # Process text.txt first
-            if os.path.exists(text_path):
-                logger.info("Found text.txt file")
-                with open(text_path, 'r', encoding='utf-8') as f:
-                    text_content = f.read()
-                    full_content.append(text_content)
-                    logger.info(f"Read {len(text_content)} characters from text.txt")
-                    
-                # Generate summary and content type analysis
-                analysis_prompt = f"""
-                Analyze the following text and provide:
-                1. A comprehensive summary of up to 500 words that captures the main points, key findings, and important details.
-                2. A description of the content type (e.g., scientific paper, newspaper article, technical documentation, etc.) 
-                    with explanation of why you classified it as such based on its structure, style, and content.
-
-                Text:
-                {text_content}
-
-                Format your response as:
-                SUMMARY:
-                [Your summary here]
-
-                CONTENT TYPE:
-                [Content type and explanation here]
-                """
-                
-                try:
-                    analysis_response = rag.openai_client.chat.completions.create(
-                        model=settings.GPT_MODEL_NAME,
-                        messages=[
-                            {"role": "system", "content": "You are a precise analyzer that provides clear summaries and identifies document types based on content analysis."},
-                            {"role": "user", "content": analysis_prompt}
-                        ],
-                        temperature=settings.DEFAULT_TEMPERATURE,
-                        max_tokens=1000
-                    )
-                    
-                    analysis_result = analysis_response.choices[0].message.content
-                    
-                    # Split the response into summary and content type
-                    summary_section = analysis_result.split("CONTENT TYPE:")[0].replace("SUMMARY:", "").strip()
-                    text_summary = summary_section  # Store summary for response
-                    content_type_section = analysis_result.split("CONTENT TYPE:")[1].strip()
-                    
-                    # Add text content to knowledge base with enhanced metadata
-                    document = {
-                        'content': text_content,
-                        'metadata': {
-                            'source': 'text.txt',
-                            'type': 'base_knowledge',
-                            'content_type': content_type_section.split('\n')[0],
-                            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                            'has_summary': True,
-                            'summary': summary_section
-                        }
-                    }
-                    
-                    # Add to knowledge base
-                    rag.add_to_knowledge_base(document)
-                    processed_count += 1
-                    logger.info("Successfully added text.txt to knowledge base with summary and content type analysis")
-                    
-                except Exception as e:
-                    logger.error(f"Error analyzing text content: {str(e)}")
-                    return {
-                        'status': 'error',
-                        'message': f'Error analyzing text content: {str(e)}'
-                    }
-            
-            # Process questions.txt and their answers
-            if os.path.exists(questions_path):
-                logger.info("Found questions.txt file")
-                with open(questions_path, 'r', encoding='utf-8') as f:
-                    questions = f.readlines()
-                    logger.info(f"Read {len(questions)} questions from questions.txt")
-                
-                for question in questions:
-                    question = question.strip()
-                    if question:
-                        logger.info(f"Processing question: {question}")
-                        
-                        # Get search results
-                        search_results = knowledge_service.search_and_process(question, filter_context=True)
-                        logger.info(f"Found {len(search_results)} results for question: {question}")
-                        
-                        # Process and add search results to knowledge base
-                        if search_results:
-                            enriched_results = knowledge_service.enrich_from_search_results(search_results, question)
-                            processed_count += len([r for r in enriched_results if r.get('added_to_kb')])
-                            logger.info(f"Added {len(enriched_results)} answers for question: {question}")
-                        
-                        # Generate a comprehensive answer using the search results
-                        answer_prompt = f"""
-                        Based on the search results, provide a comprehensive answer to this question:
-                        Question: {question}
-                        
-                        Search Results:
-                        {json.dumps(search_results, indent=2)}
-                        
-                        Provide a detailed, factual answer that synthesizes the information.
-                        """
-                        
-                        answer_response = rag.openai_client.chat.completions.create(
-                            model=settings.GPT_MODEL_NAME,
-                            messages=[
-                                {"role": "system", "content": "Generate a comprehensive answer based on search results."},
-                                {"role": "user", "content": answer_prompt}
-                            ],
-                            temperature=settings.DEFAULT_TEMPERATURE,
-                            max_tokens=settings.DEFAULT_MAX_TOKENS
-                        )
-                        
-                        answer = answer_response.choices[0].message.content
-                        
-                        # After generating the answer, add analysis
-                        answer_analysis_prompt = f"""
-                        Analyze the following answer and provide:
-                        1. A comprehensive summary of up to 500 words that captures the main points and key findings.
-                        2. A description of the content type and nature of this answer (e.g., technical explanation, factual description, analysis, etc.)
-                            with explanation of why you classified it as such based on its structure and content.
-
-                        Answer Text:
-                        {answer}
-
-                        Format your response as:
-                        SUMMARY:
-                        [Your summary here]
-
-                        CONTENT TYPE:
-                        [Content type and explanation here]
-                        """
-
-                        answer_analysis_response = rag.openai_client.chat.completions.create(
-                            model=settings.GPT_MODEL_NAME,
-                            messages=[
-                                {"role": "system", "content": "You are a precise analyzer that provides clear summaries and identifies content types."},
-                                {"role": "user", "content": answer_analysis_prompt}
-                            ],
-                            temperature=settings.DEFAULT_TEMPERATURE,
-                            max_tokens=1000
-                        )
-
-                        analysis_result = answer_analysis_response.choices[0].message.content
-                        summary_section = analysis_result.split("CONTENT TYPE:")[0].replace("SUMMARY:", "").strip()
-                        content_type_section = analysis_result.split("CONTENT TYPE:")[1].strip()
-
-                        # Create the answer document with analysis
-                        answer_document = {
-                            'content': f"""
-                            Question: {question}
-                            
-                            ANSWER SUMMARY:
-                            {summary_section}
-                            
-                            CONTENT TYPE ANALYSIS:
-                            {content_type_section}
-                            """.strip(),
-                            'metadata': {
-                                'source': 'questions.txt',
-                                'type': 'synthesized_answer',
-                                'question': question,
-                                'content_type': content_type_section.split('\n')[0],
-                                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                                'has_summary': True,
-                                'summary_length': len(summary_section.split())
-                            }
-                        }
-                        
-                        # Generate embedding for answer
-                        answer_embedding = rag.openai_client.embeddings.create(
-                            input=answer_document['content'],
-                            model=settings.EMBEDDING_MODEL_NAME
-                        ).data[0].embedding
-                        
-                        # Add answer to ChromaDB
-                        answer_id = str(uuid.uuid4())
-                        rag.collection.add(
-                            documents=[answer_document['content']],
-                            embeddings=[answer_embedding],
-                            metadatas=[answer_document['metadata']],
-                            ids=[answer_id]
-                        )
-                        processed_count += 1
-                        logger.info(f"Added synthesized answer for question: {question}")
-            
-            logger.info(f"Enrichment complete. Processed {processed_count} documents total.")
+            job = enqueue('enrich', params=data if isinstance(data, dict) else {})
             return {
-                'status': 'success',
-                'message': f'Knowledge base enriched successfully with {processed_count} documents',
-                'text_summary': text_summary if text_summary else "No text.txt summary available",
-                'full_content': '\n\n'.join(full_content)
+                'status': 'queued',
+                'job_id': job.id,
+                'message': f'Knowledge base enrichment queued as job {job.id}'
             }
-            
+
         except Exception as e:
-            logger.error(f"Error enriching knowledge base: {str(e)}")
+            logger.error(f"Error queueing knowledge base enrichment: {str(e)}")
             return {
                 'status': 'error',
                 'message': str(e)
             }
 
+    @staticmethod
+    def enrichment_items() -> List[str]:
+        """Work items of an enrichment job: text.txt first, then one per line of questions.txt"""
+        base_dir = ENRICHMENT_DATA_DIR
+        base_dir.mkdir(parents=True, exist_ok=True)
+        text_path = base_dir / 'text.txt'
+        questions_path = base_dir / 'questions.txt'
+
+        logger.info(f"Looking for text.txt at: {text_path}")
+        logger.info(f"Looking for questions.txt at: {questions_path}")
+
+        items = []
+        if os.path.exists(text_path):
+            items.append('text.txt')
+        if os.path.exists(questions_path):
+            with open(questions_path, 'r', encoding='utf-8') as f:
+                questions = [question.strip() for question in f.readlines()]
+            logger.info(f"Read {len(questions)} questions from questions.txt")
+            items.extend(f"question:{question}" for question in questions if question)
+        return items
+
+    @staticmethod
+    def enrich_item(item: str) -> Dict[str, Any]:
+        """Process one enrichment item. Returns the number of documents added and, for text.txt, its summary."""
+        rag = get_rag()
+        if item == 'text.txt':
+            return RAGService._enrich_from_text(rag, ENRICHMENT_DATA_DIR / 'text.txt')
+        if item.startswith('question:'):
+            return RAGService._enrich_from_question(rag, item[len('question:'):])
+        raise ValueError(f"Unknown enrichment item: {item}")
+
+    @staticmethod
+    def _enrich_from_text(rag: HybridRAG, text_path: Path) -> Dict[str, Any]:
+        """Summarize and classify text.txt and add it to the knowledge base"""
+        logger.info("Found text.txt file")
+        with open(text_path, 'r', encoding='utf-8') as f:
+            text_content = f.read()
+            logger.info(f"Read {len(text_content)} characters from text.txt")
+
+        # Generate summary and content type analysis
+        analysis_prompt = f"""
+        Analyze the following text and provide:
+        1. A comprehensive summary of up to 500 words that captures the main points, key findings, and important details.
+        2. A description of the content type (e.g., scientific paper, newspaper article, technical documentation, etc.) 
+            with explanation of why you classified it as such based on its structure, style, and content.
+
+        Text:
+        {text_content}
+
+        Format your response as:
+        SUMMARY:
+        [Your summary here]
+
+        CONTENT TYPE:
+        [Content type and explanation here]
+        """
+
+        analysis_response = rag.openai_client.chat.completions.create(
+            model=settings.GPT_MODEL_NAME,
+            messages=[
+                {"role": "system", "content": "You are a precise analyzer that provides clear summaries and identifies document types based on content analysis."},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            temperature=settings.DEFAULT_TEMPERATURE,
+            max_tokens=1000
+        )
+
+        analysis_result = analysis_response.choices[0].message.content
+
+        # Split the response into summary and content type
+        summary_section = analysis_result.split("CONTENT TYPE:")[0].replace("SUMMARY:", "").strip()
+        content_type_section = analysis_result.split("CONTENT TYPE:")[1].strip()
+
+        # Add text content to knowledge base with enhanced metadata
+        document = {
+            'content': text_content,
+            'metadata': {
+                'source': 'text.txt',
+                'type': 'base_knowledge',
+                'content_type': content_type_section.split('\n')[0],
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'has_summary': True,
+                'summary': summary_section
+            }
+        }
+
+        # Add to knowledge base
+        rag.add_to_knowledge_base(document)
+        logger.info("Successfully added text.txt to knowledge base with summary and content type analysis")
+        return {'processed': 1, 'text_summary': summary_section}
+
+    @staticmethod
+    def _enrich_from_question(rag: HybridRAG, question: str) -> Dict[str, Any]:
+        """Search the web for one question, add the results and a synthesized answer"""
+        logger.info(f"Processing question: {question}")
+        knowledge_service = KnowledgeService()
+        processed_count = 0
+
+        # Get search results
+        search_results = knowledge_service.search_and_process(question, filter_context=True)
+        logger.info(f"Found {len(search_results)} results for question: {question}")
+
+        # Process and add search results to knowledge base
+        if search_results:
+            enriched_results = knowledge_service.enrich_from_search_results(search_results, question)
+            processed_count += len([r for r in enriched_results if r.get('added_to_kb')])
+            logger.info(f"Added {len(enriched_results)} answers for question: {question}")
+
+        # Generate a comprehensive answer using the search results
+        answer_prompt = f"""
+        Based on the search results, provide a comprehensive answer to this question:
+        Question: {question}
+        
+        Search Results:
+        {json.dumps(search_results, indent=2)}
+        
+        Provide a detailed, factual answer that synthesizes the information.
+        """
+
+        answer_response = rag.openai_client.chat.completions.create(
+            model=settings.GPT_MODEL_NAME,
+            messages=[
+                {"role": "system", "content": "Generate a comprehensive answer based on search results."},
+                {"role": "user", "content": answer_prompt}
+            ],
+            temperature=settings.DEFAULT_TEMPERATURE,
+            max_tokens=settings.DEFAULT_MAX_TOKENS
+        )
+
+        answer = answer_response.choices[0].message.content
+
+        # After generating the answer, add analysis
+        answer_analysis_prompt = f"""
+        Analyze the following answer and provide:
+        1. A comprehensive summary of up to 500 words that captures the main points and key findings.
+        2. A description of the content type and nature of this answer (e.g., technical explanation, factual description, analysis, etc.)
+            with explanation of why you classified it as such based on its structure and content.
+
+        Answer Text:
+        {answer}
+
+        Format your response as:
+        SUMMARY:
+        [Your summary here]
+
+        CONTENT TYPE:
+        [Content type and explanation here]
+        """
+
+        answer_analysis_response = rag.openai_client.chat.completions.create(
+            model=settings.GPT_MODEL_NAME,
+            messages=[
+                {"role": "system", "content": "You are a precise analyzer that provides clear summaries and identifies content types."},
+                {"role": "user", "content": answer_analysis_prompt}
+            ],
+            temperature=settings.DEFAULT_TEMPERATURE,
+            max_tokens=1000
+        )
+
+        analysis_result = answer_analysis_response.choices[0].message.content
+        summary_section = analysis_result.split("CONTENT TYPE:")[0].replace("SUMMARY:", "").strip()
+        content_type_section = analysis_result.split("CONTENT TYPE:")[1].strip()
+
+        # Create the answer document with analysis
+        answer_document = {
+            'content': f"""
+            Question: {question}
+            
+            ANSWER SUMMARY:
+            {summary_section}
+            
+            CONTENT TYPE ANALYSIS:
+            {content_type_section}
+            """.strip(),
+            'metadata': {
+                'source': 'questions.txt',
+                'type': 'synthesized_answer',
+                'question': question,
+                'content_type': content_type_section.split('\n')[0],
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'has_summary': True,
+                'summary_length': len(summary_section.split())
+            }
+        }
+
+        # Embed and store the answer (bumps the knowledge base version)
+        if not rag.add_to_knowledge_base(answer_document, save_to_file=False):
+            raise Exception(f"Error adding synthesized answer for question: {question}")
+        processed_count += 1
+        logger.info(f"Added synthesized answer for question: {question}")
+        return {'processed': processed_count}
+
     @staticmethod
     def handle_inspect_knowledge_base(request) -> JsonResponse:
         """Handle knowledge base inspection request"""
         try:
-            rag = HybridRAG()
+            rag = get_rag()
             result = rag.inspect_collection()
             
             logger.info(f"Inspection result: {result}")
@@ -316,7 +301,7 @@ class RAGService:
     def handle_clear_knowledge_base(request) -> JsonResponse:
         """Handle knowledge base clearing request"""
         try:
-            rag = HybridRAG()
+            rag = get_rag()
             success = rag.clear_knowledge_base()
             
             return JsonResponse({
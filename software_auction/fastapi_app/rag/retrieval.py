@@ -0,0 +1,380 @@
+import json
+import logging
+import re
+from typing import Dict, List, Any, Sequence, Optional
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from ..models import Document
+from ..settings import TEXT_SEARCH_CONFIG, RETRIEVAL_CONFIG, VECTOR_INDEX_CONFIG
+from .vector_index import ann_search_params, distance_operator, configured_quantization, coarse_order_expression
+
+logger = logging.getLogger(__name__)
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    """pgvector text representation, cast with ::vector in SQL"""
+    return "[" + ",".join(repr(float(value)) for value in embedding) + "]"
+
+
+# Codes and identifiers: INV-2041, v2.3, snake_case, module.path, camelCase, SLA
+IDENTIFIER_PATTERN = re.compile(r"""
+    ^(?:
+        [A-Z]{2,}s?                   # acronym
+      | \S*\d\S*                      # anything with a digit
+      | \w+(?:[_./:#]\w+)+            # joined by _ . / : #
+      | [a-z]+(?:[A-Z][a-z0-9]*)+     # camelCase
+    )$
+""", re.VERBOSE)
+
+
+def is_keyword_query(query: str) -> bool:
+    """
+    Heuristic for queries better served by exact-term matching than by
+    semantic similarity: quoted phrases, or a few terms that all look like
+    identifiers or codes. Short natural-language queries ("pricing strategy
+    for vendors") are not keyword queries; they need semantic recall.
+    """
+    query = query.strip()
+    if not query:
+        return False
+    if len(query) > 1 and query.startswith('"') and query.endswith('"'):
+        return True
+
+    terms = query.split()
+    if len(terms) > RETRIEVAL_CONFIG['KEYWORD_MAX_TERMS']:
+        return False
+    return all(IDENTIFIER_PATTERN.match(term.strip(',;()')) for term in terms)
+
+
+FILTER_OPERATORS = {'eq': '==', 'ne': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def compile_filters(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Compile metadata predicates into a jsonpath predicate for `metadata @@`,
+    which the jsonb_path_ops GIN index on Document.metadata can serve.
+
+        {'type': 'knowledge_base'}                       equality
+        {'type': ['knowledge_base', 'base_knowledge']}   any of
+        {'timestamp': {'gte': 1700000000, 'lt': ...}}    eq, ne, gt, gte, lt, lte, in
+
+    All predicates must hold. Rows where a key is missing or holds a value
+    of a different type simply don't match.
+    """
+    if not filters:
+        return None
+
+    clauses = []
+    for key, condition in filters.items():
+        path = f"$.{json.dumps(str(key))}"
+        if not isinstance(condition, dict):
+            condition = {'in': condition} if isinstance(condition, (list, tuple, set)) else {'eq': condition}
+        for op, value in condition.items():
+            if op == 'in':
+                values = list(value)
+                if not values:
+                    clauses.append("false")
+                else:
+                    clauses.append("(" + " || ".join(f"{path} == {json.dumps(v)}" for v in values) + ")")
+            elif op in FILTER_OPERATORS:
+                clauses.append(f"{path} {FILTER_OPERATORS[op]} {json.dumps(value)}")
+            else:
+                raise ValueError(f"Unsupported metadata filter operator: {op}")
+    return " && ".join(clauses)
+
+
+def filter_expression(filters: Optional[Dict[str, Any]]) -> Optional[RawSQL]:
+    """ORM form of compile_filters, for use in QuerySet.filter()"""
+    predicate = compile_filters(filters)
+    if predicate is None:
+        return None
+    return RawSQL("metadata @@ %s::jsonpath", [predicate], output_field=BooleanField())
+
+
+def search_params(k: int, ef_search: int = None, probes: int = None,
+                  filters: Optional[Dict[str, Any]] = None, strategy: str = None) -> Dict[str, Any]:
+    """
+    ann_search_params arguments for a top-k query.
+
+    An ANN index scan returns at most ef_search (HNSW) candidates before the
+    WHERE clause is applied, so a selective filter can leave fewer than k
+    rows. With filters the scan is either widened ("overfetch"), allowed to
+    continue until k rows pass ("iterative", pgvector >= 0.8) or left as is
+    ("plain"). ef_search is also raised to k when k exceeds it.
+    """
+    base_ef_search = ef_search or VECTOR_INDEX_CONFIG.get('HNSW_EF_SEARCH') or 40
+    if k > base_ef_search:
+        ef_search = min(k, RETRIEVAL_CONFIG['MAX_EF_SEARCH'])
+    params = {'ef_search': ef_search, 'probes': probes}
+    if not filters:
+        return params
+
+    strategy = strategy or RETRIEVAL_CONFIG['FILTER_STRATEGY']
+    if strategy == 'iterative':
+        params['iterative_scan'] = 'relaxed_order'
+    elif strategy == 'overfetch':
+        factor = RETRIEVAL_CONFIG['FILTER_OVERFETCH']
+        params['ef_search'] = min(max(base_ef_search, k * factor), RETRIEVAL_CONFIG['MAX_EF_SEARCH'])
+        params['probes'] = (probes or VECTOR_INDEX_CONFIG.get('IVFFLAT_PROBES') or 1) * factor
+    return params
+
+
+def coarse_candidates(k: int, quantization: Optional[str], rerank_factor: int = None) -> int:
+    """Rows to take from a compressed index before the full-precision rerank"""
+    if not quantization:
+        return k
+    return k * (rerank_factor or VECTOR_INDEX_CONFIG.get('RERANK_FACTOR', 4))
+
+
+def embedding_column(with_embeddings: bool, alias: str = '') -> str:
+    """Extra select-list entry returning the stored vector as a float array, or nothing"""
+    return f", {alias}embedding::real[] AS embedding" if with_embeddings else ""
+
+
+def _with_embedding(row, with_embeddings: bool):
+    """Split a row selected with embedding_column() into (columns, extra hit fields)"""
+    if not with_embeddings:
+        return row, {}
+    return row[:-1], {'embedding': row[-1]}
+
+
+def _row_to_hit(doc_id, content, metadata, distance, **extra) -> Dict[str, Any]:
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    return {
+        'id': doc_id,
+        'content': content,
+        'metadata': metadata,
+        'distance': float(distance),
+        **extra,
+    }
+
+
+def document_embeddings(ids: Sequence[int]) -> Dict[int, Any]:
+    """Stored embeddings of the given documents, by id (for hits fetched without with_embeddings)"""
+    return dict(Document.objects.filter(id__in=list(ids)).values_list('id', 'embedding'))
+
+
+def lexical_search(query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None,
+                   with_embeddings: bool = False) -> List[Dict[str, Any]]:
+    """
+    Full-text search over the GIN-indexed Document.search_vector.
+
+    No embedding is needed. The hit 'distance' is 1 - ts_rank_cd normalized
+    to [0, 1), so callers deriving confidence from distances keep working.
+    with_embeddings adds each hit's stored vector as 'embedding'.
+    """
+    predicate = compile_filters(filters)
+    filter_sql = "metadata @@ %s::jsonpath" if predicate else "TRUE"
+    sql = f"""
+        SELECT id, content, metadata, ts_rank_cd(search_vector, query, 32) AS score{embedding_column(with_embeddings)}
+        FROM {Document._meta.db_table}, websearch_to_tsquery(%s::regconfig, %s) AS query
+        WHERE search_vector @@ query AND {filter_sql}
+        ORDER BY score DESC
+        LIMIT %s
+    """
+    params = [TEXT_SEARCH_CONFIG, query]
+    if predicate:
+        params.append(predicate)
+    params.append(k)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    hits = []
+    for row in rows:
+        (doc_id, content, metadata, score), extra = _with_embedding(row, with_embeddings)
+        hits.append(_row_to_hit(doc_id, content, metadata, 1 - float(score), lexical_score=float(score), **extra))
+    return hits
+
+
+def vector_search(query_embedding: Sequence[float], k: int = 3, ef_search: int = None,
+                  probes: int = None, filters: Optional[Dict[str, Any]] = None,
+                  quantization: str = None, rerank_factor: int = None,
+                  with_embeddings: bool = False) -> List[Dict[str, Any]]:
+    """
+    Nearest neighbours by vector distance.
+
+    With a quantized index (VECTOR_INDEX_CONFIG['QUANTIZATION'] or the
+    quantization argument) the compressed index supplies k * RERANK_FACTOR
+    candidates, which are then reranked by exact distance on the stored
+    full-precision vectors. with_embeddings adds each hit's stored vector
+    as 'embedding'.
+    """
+    quantization = configured_quantization(quantization)
+    limit = coarse_candidates(k, quantization, rerank_factor)
+    predicate = compile_filters(filters)
+    filter_sql = "metadata @@ %s::jsonpath" if predicate else "TRUE"
+    sql = f"""
+        SELECT id, content, metadata, distance{', embedding' if with_embeddings else ''}
+        FROM (
+            SELECT id, content, metadata, embedding {distance_operator()} %s::vector AS distance
+                   {embedding_column(with_embeddings)}
+            FROM {Document._meta.db_table}
+            WHERE {filter_sql}
+            ORDER BY {coarse_order_expression('%s', quantization)}
+            LIMIT %s
+        ) AS candidates
+        ORDER BY distance
+        LIMIT %s
+    """
+    embedding = vector_literal(query_embedding)
+    params = [embedding]
+    if predicate:
+        params.append(predicate)
+    params.extend([embedding, limit, k])
+
+    with ann_search_params(**search_params(limit, ef_search, probes, filters)):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    hits = []
+    for row in rows:
+        (doc_id, content, metadata, distance), extra = _with_embedding(row, with_embeddings)
+        hits.append(_row_to_hit(doc_id, content, metadata, distance, **extra))
+    return hits
+
+
+def hybrid_search(query: str, query_embedding: Sequence[float], k: int = 3,
+                  candidates: int = None, rrf_k: int = None, ef_search: int = None,
+                  probes: int = None, filters: Optional[Dict[str, Any]] = None,
+                  with_embeddings: bool = False) -> List[Dict[str, Any]]:
+    """
+    Vector and lexical retrieval fused by reciprocal-rank fusion in one statement.
+
+    Each retriever contributes its top `candidates` rows through its own
+    index (ANN on embedding, GIN on search_vector); a row scores
+    sum(1 / (rrf_k + rank)) over the retrievers that returned it. The
+    returned distance is always the real vector distance. Metadata filters
+    apply to both retrievers. With a quantized index the vector candidates
+    are reranked on full-precision distance before they are ranked.
+    with_embeddings adds each hit's stored vector as 'embedding'.
+    """
+    candidates = candidates or RETRIEVAL_CONFIG['CANDIDATES']
+    quantization = configured_quantization()
+    predicate = compile_filters(filters)
+    filter_sql = "metadata @@ %(filters)s::jsonpath" if predicate else "TRUE"
+    rrf_k = rrf_k if rrf_k is not None else RETRIEVAL_CONFIG['RRF_K']
+    operator = distance_operator()
+    table = Document._meta.db_table
+    sql = f"""
+        WITH vector AS (
+            SELECT id, rank
+            FROM (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT id, embedding {operator} %(embedding)s::vector AS distance
+                    FROM {table}
+                    WHERE {filter_sql}
+                    ORDER BY {coarse_order_expression('%(embedding)s', quantization)}
+                    LIMIT %(coarse_candidates)s
+                ) AS v
+            ) AS ranked
+            WHERE rank <= %(candidates)s
+        ),
+        lexical AS (
+            SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+            FROM (
+                SELECT id, ts_rank_cd(search_vector, query, 32) AS score
+                FROM {table}, websearch_to_tsquery(%(config)s::regconfig, %(query)s) AS query
+                WHERE search_vector @@ query AND {filter_sql}
+                ORDER BY score DESC
+                LIMIT %(candidates)s
+            ) AS l
+        ),
+        fused AS (
+            SELECT COALESCE(vector.id, lexical.id) AS id,
+                   COALESCE(1.0 / (%(rrf_k)s + vector.rank), 0)
+                   + COALESCE(1.0 / (%(rrf_k)s + lexical.rank), 0) AS score,
+                   vector.rank AS vector_rank,
+                   lexical.rank AS lexical_rank
+            FROM vector FULL OUTER JOIN lexical ON vector.id = lexical.id
+            ORDER BY score DESC
+            LIMIT %(k)s
+        )
+        SELECT d.id, d.content, d.metadata, d.embedding {operator} %(embedding)s::vector AS distance,
+               fused.score, fused.vector_rank, fused.lexical_rank{embedding_column(with_embeddings, 'd.')}
+        FROM fused JOIN {table} AS d ON d.id = fused.id
+        ORDER BY fused.score DESC
+    """
+    params = {
+        'embedding': vector_literal(query_embedding),
+        'candidates': candidates,
+        'coarse_candidates': coarse_candidates(candidates, quantization),
+        'config': TEXT_SEARCH_CONFIG,
+        'query': query,
+        'rrf_k': rrf_k,
+        'k': k,
+        'filters': predicate,
+    }
+    with ann_search_params(**search_params(params['coarse_candidates'], ef_search, probes, filters)):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    hits = []
+    for row in rows:
+        (doc_id, content, metadata, distance, score, vector_rank, lexical_rank), extra = _with_embedding(
+            row, with_embeddings
+        )
+        hits.append(_row_to_hit(
+            doc_id, content, metadata, distance,
+            rrf_score=float(score), vector_rank=vector_rank, lexical_rank=lexical_rank, **extra
+        ))
+    return hits
+
+
+def search_many(query_embeddings: List[Sequence[float]], k: int = 3, ef_search: int = None,
+                probes: int = None, filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Nearest neighbours for several query vectors in one statement.
+
+    The query vectors are joined as a VALUES list and each one drives a
+    LATERAL top-k subquery, so every query still gets its own index scan
+    but the whole batch costs a single round-trip. Returns one list of
+    hits per query, in input order, each hit ordered by distance. Quantized
+    indexes are reranked per query as in vector_search().
+    """
+    if not query_embeddings:
+        return []
+
+    operator = distance_operator()
+    quantization = configured_quantization()
+    limit = coarse_candidates(k, quantization)
+    predicate = compile_filters(filters)
+    filter_sql = "metadata @@ %s::jsonpath" if predicate else "TRUE"
+    values = ", ".join("(%s, %s::vector)" for _ in query_embeddings)
+    sql = f"""
+        SELECT q.ord, d.id, d.content, d.metadata, d.distance
+        FROM (VALUES {values}) AS q(ord, embedding)
+        CROSS JOIN LATERAL (
+            SELECT id, content, metadata, distance
+            FROM (
+                SELECT id, content, metadata, embedding {operator} q.embedding AS distance
+                FROM {Document._meta.db_table}
+                WHERE {filter_sql}
+                ORDER BY {coarse_order_expression('q.embedding', quantization)}
+                LIMIT %s
+            ) AS candidates
+            ORDER BY distance
+            LIMIT %s
+        ) AS d
+        ORDER BY q.ord, d.distance
+    """
+    params = []
+    for position, embedding in enumerate(query_embeddings):
+        params.extend([position, vector_literal(embedding)])
+    if predicate:
+        params.append(predicate)
+    params.extend([limit, k])
+
+    hits = [[] for _ in query_embeddings]
+    with ann_search_params(**search_params(limit, ef_search, probes, filters)):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+    for position, doc_id, content, metadata, distance in rows:
+        hits[position].append(_row_to_hit(doc_id, content, metadata, distance))
+    return hits
@@ -0,0 +1,228 @@
+"""
+Map-reduce condensing of transcripts too long for a single prompt.
+
+The transcript is cut into SEGMENT_TOKENS segments at sentence boundaries
+(TokenChunker), each segment is summarized by its own completion with up
+to MAP_CONCURRENCY requests in flight, and the partial summaries are handed
+to the caller's prompt as the reduce pass. When the partials are still
+longer than REDUCE_INPUT_TOKENS they are merged in groups first.
+
+Segment boundaries only depend on the text before them, so a transcript
+that keeps growing produces the same leading segments every time; their
+summaries come from the segment cache and only new segments are sent.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..settings import SUMMARIZATION_CONFIG
+from .chunking import TokenChunker
+
+logger = logging.getLogger(__name__)
+
+MAP_PROMPT = """Summarize this segment of a meeting transcript as concise notes.
+Keep topics, decisions, action items with owners, dates, numbers and open questions.
+Do not add anything that is not in the segment.
+
+Segment:
+{text}"""
+
+COMBINE_PROMPT = """Merge these consecutive notes from one meeting into a single set of notes, in order.
+Keep every decision, action item, owner, date and open question; drop repetition.
+
+Notes:
+{text}"""
+
+
+def segment_key(model: str, prompt: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{prompt}\x00{text}".encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """
+    Summaries of transcript segments by content address: an in-process LRU
+    in front of a sqlite database in WAL mode, shared by worker processes.
+    """
+
+    def __init__(self, max_entries: int = 10_000, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {'hits': 0, 'misses': 0}
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One sqlite connection per thread"""
+        if not self.disk_path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS segments (key TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, summary: str):
+        with self._lock:
+            self._memory[key] = summary
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._memory.get(key)
+            if summary is not None:
+                self._memory.move_to_end(key)
+                self._counters['hits'] += 1
+                return summary
+
+        conn = self._connection()
+        if conn is not None:
+            try:
+                row = conn.execute("SELECT summary FROM segments WHERE key = ?", [key]).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Segment cache read failed: {str(e)}")
+                row = None
+            if row:
+                self._remember(key, row[0])
+                with self._lock:
+                    self._counters['hits'] += 1
+                return row[0]
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def put(self, key: str, summary: str):
+        self._remember(key, summary)
+        conn = self._connection()
+        if conn is not None:
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO segments (key, summary) VALUES (?, ?)", [key, summary])
+            except sqlite3.Error as e:
+                logger.warning(f"Segment cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_entries'] = len(self._memory)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        counters['disk_path'] = self.disk_path
+        return counters
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache() -> SegmentCache:
+    """Process-wide segment summary cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SegmentCache(
+                    max_entries=SUMMARIZATION_CONFIG['MEMORY_MAX_ENTRIES'],
+                    disk_path=SUMMARIZATION_CONFIG['CACHE_PATH'] if SUMMARIZATION_CONFIG['CACHE_ENABLED'] else None
+                )
+    return _cache
+
+
+class MapReduceSummarizer:
+    """Condense a long transcript into ordered segment notes with concurrent completions"""
+
+    def __init__(self, openai_client, model: str, temperature: float = 0.3, concurrency: int = None,
+                 segment_tokens: int = None, cache: SegmentCache = None):
+        self.openai_client = openai_client
+        self.model = model
+        self.temperature = temperature
+        self.concurrency = concurrency or SUMMARIZATION_CONFIG['MAP_CONCURRENCY']
+        self.chunker = TokenChunker(
+            max_tokens=segment_tokens or SUMMARIZATION_CONFIG['SEGMENT_TOKENS'],
+            overlap_tokens=SUMMARIZATION_CONFIG['SEGMENT_OVERLAP_TOKENS'],
+        )
+        self.cache = cache or get_segment_cache()
+
+    def is_long(self, text: str) -> bool:
+        return self.chunker.count_tokens(text) > SUMMARIZATION_CONFIG['LONG_INPUT_TOKENS']
+
+    def _complete(self, prompt: str, text: str) -> Tuple[str, bool]:
+        """(summary, whether it came from the cache)"""
+        key = segment_key(self.model, prompt, text)
+        summary = self.cache.get(key)
+        if summary is not None:
+            return summary, True
+        response = self.openai_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You write faithful, compact meeting notes."},
+                {"role": "user", "content": prompt.format(text=text)}
+            ],
+            temperature=self.temperature,
+            max_tokens=SUMMARIZATION_CONFIG['MAP_MAX_TOKENS']
+        )
+        summary = response.choices[0].message.content.strip()
+        self.cache.put(key, summary)
+        return summary, False
+
+    def _map(self, prompt: str, texts: List[str]) -> List[Tuple[str, bool]]:
+        """One completion per text, concurrently, in input order"""
+        if len(texts) <= 1:
+            return [self._complete(prompt, text) for text in texts]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(texts)),
+                                thread_name_prefix='summarize') as executor:
+            return list(executor.map(lambda text: self._complete(prompt, text), texts))
+
+    def _groups(self, partials: List[str], budget: int) -> List[str]:
+        """Consecutive partials joined into groups of at most budget tokens (at least two each)"""
+        groups, current, used = [], [], 0
+        for partial in partials:
+            tokens = self.chunker.count_tokens(partial)
+            if len(current) >= 2 and used + tokens > budget:
+                groups.append("\n\n".join(current))
+                current, used = [], 0
+            current.append(partial)
+            used += tokens
+        if current:
+            groups.append("\n\n".join(current))
+        return groups
+
+    def condense(self, text: str) -> Dict[str, Any]:
+        """
+        Notes covering the whole transcript, short enough for one prompt.
+        Returns 'notes' plus segment / cache counts and timings.
+        """
+        start = time.perf_counter()
+        segments = list(self.chunker.chunk_text(text))
+        results = self._map(MAP_PROMPT, segments)
+        partials = [summary for summary, _ in results]
+        map_seconds = time.perf_counter() - start
+
+        budget = SUMMARIZATION_CONFIG['REDUCE_INPUT_TOKENS']
+        rounds = 0
+        while len(partials) > 1 and sum(self.chunker.count_tokens(partial) for partial in partials) > budget:
+            partials = [summary for summary, _ in self._map(COMBINE_PROMPT, self._groups(partials, budget))]
+            rounds += 1
+
+        return {
+            'notes': "\n\n".join(partials),
+            'segments': len(segments),
+            'cached_segments': sum(1 for _, cached in results if cached),
+            'combine_rounds': rounds,
+            'map_seconds': round(map_seconds, 3),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
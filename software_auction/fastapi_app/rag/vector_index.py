@@ -0,0 +1,281 @@
+import logging
+import math
+import re
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+from django.db import connection, transaction
+from pgvector.django import L2Distance, CosineDistance, MaxInnerProduct
+
+from ..models import Document
+from ..settings import VECTOR_DISTANCE_METRIC, VECTOR_INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Distance function, operator class and SQL operator for each supported metric.
+# The index is only used by the planner when its operator class matches the
+# operator in the ORDER BY clause.
+DISTANCE_FUNCTIONS = {
+    'l2': L2Distance,
+    'cosine': CosineDistance,
+    'inner_product': MaxInnerProduct,
+}
+OPERATOR_CLASSES = {
+    'l2': 'vector_l2_ops',
+    'cosine': 'vector_cosine_ops',
+    'inner_product': 'vector_ip_ops',
+}
+DISTANCE_OPERATORS = {
+    'l2': '<->',
+    'cosine': '<=>',
+    'inner_product': '<#>',
+}
+
+HALFVEC_OPERATOR_CLASSES = {
+    'l2': 'halfvec_l2_ops',
+    'cosine': 'halfvec_cosine_ops',
+    'inner_product': 'halfvec_ip_ops',
+}
+
+INDEX_TYPES = ('hnsw', 'ivfflat')
+# Compressed index representations (pgvector >= 0.7). The table keeps the
+# full-precision vectors, which are used to rerank the coarse candidates.
+QUANTIZATIONS = ('halfvec', 'binary')
+EMBEDDING_DIMENSIONS = Document._meta.get_field('embedding').dimensions
+
+# Postgres advisory lock held while the ANN indexes are dropped and rebuilt
+VECTOR_INDEX_LOCK = 0x766563696478
+
+
+def index_name(index_type: str, quantization: Optional[str] = None) -> str:
+    """Name of the ANN index of the given type on Document.embedding"""
+    suffix = {'halfvec': '_half', 'binary': '_bit'}.get(quantization, '')
+    return f"document_embedding_{index_type}{suffix}_idx"
+
+
+def configured_quantization(quantization: Optional[str] = None) -> Optional[str]:
+    """Explicit quantization, else VECTOR_INDEX_CONFIG['QUANTIZATION']; 'none' means full precision"""
+    if quantization is None:
+        quantization = VECTOR_INDEX_CONFIG.get('QUANTIZATION')
+    if quantization in (None, '', 'none'):
+        return None
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported vector quantization: {quantization}")
+    return quantization
+
+
+def index_expression(quantization: Optional[str] = None) -> Tuple[str, str]:
+    """(indexed expression, operator class) for the given representation"""
+    if quantization == 'halfvec':
+        return f"(embedding::halfvec({EMBEDDING_DIMENSIONS}))", HALFVEC_OPERATOR_CLASSES[VECTOR_DISTANCE_METRIC]
+    if quantization == 'binary':
+        return f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS}))", 'bit_hamming_ops'
+    return "embedding", OPERATOR_CLASSES[VECTOR_DISTANCE_METRIC]
+
+
+def coarse_order_expression(query_sql: str, quantization: Optional[str] = None) -> str:
+    """
+    ORDER BY expression served by the ANN index of the given representation.
+
+    query_sql is a SQL expression for the query vector, e.g. a placeholder.
+    Must match index_expression() exactly for the planner to use the index.
+    """
+    if quantization == 'halfvec':
+        return (f"(embedding::halfvec({EMBEDDING_DIMENSIONS})) {distance_operator()} "
+                f"({query_sql})::vector::halfvec({EMBEDDING_DIMENSIONS})")
+    if quantization == 'binary':
+        return (f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})) <~> "
+                f"binary_quantize(({query_sql})::vector)")
+    return f"embedding {distance_operator()} ({query_sql})::vector"
+
+
+def distance_expression(query_embedding, field: str = 'embedding'):
+    """Distance expression for the configured metric, matching the index operator class"""
+    return DISTANCE_FUNCTIONS[VECTOR_DISTANCE_METRIC](field, query_embedding)
+
+
+def distance_operator() -> str:
+    """SQL operator for the configured metric"""
+    return DISTANCE_OPERATORS[VECTOR_DISTANCE_METRIC]
+
+
+@contextmanager
+def ann_search_params(ef_search: Optional[int] = None, probes: Optional[int] = None,
+                      iterative_scan: Optional[str] = None):
+    """
+    Scope hnsw.ef_search / ivfflat.probes to a single transaction.
+
+    Queries must be evaluated inside the block for the settings to apply.
+    Higher values improve recall at the cost of latency; unset values fall
+    back to VECTOR_INDEX_CONFIG.
+
+    iterative_scan ("strict_order" or "relaxed_order", pgvector >= 0.8) keeps
+    scanning the index until enough rows pass the WHERE clause, so filtered
+    queries return a full top-k. IVFFlat only supports relaxed ordering.
+    """
+    if ef_search is None:
+        ef_search = VECTOR_INDEX_CONFIG.get('HNSW_EF_SEARCH')
+    if probes is None:
+        probes = VECTOR_INDEX_CONFIG.get('IVFFLAT_PROBES')
+
+    params = {}
+    if ef_search is not None:
+        params['hnsw.ef_search'] = str(int(ef_search))
+    if probes is not None:
+        params['ivfflat.probes'] = str(int(probes))
+    if iterative_scan:
+        params['hnsw.iterative_scan'] = iterative_scan
+        params['ivfflat.iterative_scan'] = 'off' if iterative_scan == 'off' else 'relaxed_order'
+
+    with transaction.atomic():
+        if params:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT " + ", ".join("set_config(%s, %s, true)" for _ in params),
+                    [value for item in params.items() for value in item]
+                )
+        yield
+
+
+@contextmanager
+def vector_index_lock(wait: bool = True):
+    """
+    Hold VECTOR_INDEX_LOCK on this thread's connection; yields whether it was
+    taken (always True with wait=True). Serializes the drop / load / rebuild
+    windows of concurrent loaders and index rebuilds.
+    """
+    with connection.cursor() as cursor:
+        if wait:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [VECTOR_INDEX_LOCK])
+            acquired = True
+        else:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [VECTOR_INDEX_LOCK])
+            acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [VECTOR_INDEX_LOCK])
+
+
+def existing_vector_indexes() -> Dict[str, str]:
+    """Return {index_name: access_method} for ANN indexes on Document"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.relname, am.amname
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_am am ON am.oid = i.relam
+            WHERE t.relname = %s AND am.amname IN ('hnsw', 'ivfflat')
+        """, [Document._meta.db_table])
+        return {name: method for name, method in cursor.fetchall()}
+
+
+def vector_index_definitions() -> Dict[str, str]:
+    """Return {index_name: CREATE INDEX statement} for ANN indexes on Document"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_am am ON am.oid = i.relam
+            WHERE t.relname = %s AND am.amname IN ('hnsw', 'ivfflat')
+        """, [Document._meta.db_table])
+        return {name: definition for name, definition in cursor.fetchall()}
+
+
+def restore_vector_indexes(definitions: Dict[str, str]):
+    """
+    Recreate indexes captured by vector_index_definitions(), e.g. after a bulk
+    load. Indexes that exist again by now are left as they are.
+    """
+    with connection.cursor() as cursor:
+        _set_maintenance_work_mem(cursor)
+        for name, definition in definitions.items():
+            # pg_get_indexdef() output has no IF NOT EXISTS
+            cursor.execute(re.sub(r'^CREATE (UNIQUE )?INDEX (?!IF NOT EXISTS )', r'CREATE \1INDEX IF NOT EXISTS ',
+                                  definition))
+            logger.info(f"Recreated vector index {name}")
+
+
+def _set_maintenance_work_mem(cursor):
+    maintenance_work_mem = VECTOR_INDEX_CONFIG.get('MAINTENANCE_WORK_MEM')
+    if maintenance_work_mem:
+        cursor.execute("SELECT set_config('maintenance_work_mem', %s, false)", [maintenance_work_mem])
+
+
+def drop_vector_indexes(concurrently: bool = False) -> int:
+    """Drop every ANN index on Document, e.g. before a bulk load"""
+    indexes = existing_vector_indexes()
+    keyword = "CONCURRENTLY " if concurrently else ""
+    with connection.cursor() as cursor:
+        for name in indexes:
+            cursor.execute(f'DROP INDEX {keyword}IF EXISTS "{name}"')
+            logger.info(f"Dropped vector index {name}")
+    return len(indexes)
+
+
+def _default_ivfflat_lists(row_count: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above"""
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def create_vector_index(index_type: Optional[str] = None, concurrently: bool = False,
+                        quantization: Optional[str] = None, **params) -> Dict[str, Any]:
+    """
+    Build an ANN index on Document.embedding using the configured metric.
+
+    HNSW accepts m / ef_construction, IVFFlat accepts lists. IVFFlat should be
+    built after the table is loaded since its centroids are trained on
+    existing rows. With quantization ('halfvec' or 'binary') the index is
+    built on a compressed expression of the column instead; binary
+    quantization always uses Hamming distance.
+    """
+    index_type = (index_type or VECTOR_INDEX_CONFIG['TYPE']).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index type: {index_type}")
+    quantization = configured_quantization(quantization)
+
+    table = Document._meta.db_table
+    expression, opclass = index_expression(quantization)
+    name = index_name(index_type, quantization)
+
+    if index_type == 'hnsw':
+        options = {
+            'm': int(params.get('m') or VECTOR_INDEX_CONFIG['HNSW_M']),
+            'ef_construction': int(params.get('ef_construction') or VECTOR_INDEX_CONFIG['HNSW_EF_CONSTRUCTION']),
+        }
+    else:
+        lists = params.get('lists') or VECTOR_INDEX_CONFIG['IVFFLAT_LISTS']
+        if not lists:
+            lists = _default_ivfflat_lists(Document.objects.count())
+        options = {'lists': int(lists)}
+
+    with_clause = ", ".join(f"{key} = {value}" for key, value in options.items())
+    keyword = "CONCURRENTLY " if concurrently else ""
+
+    with connection.cursor() as cursor:
+        _set_maintenance_work_mem(cursor)
+        cursor.execute(
+            f'CREATE INDEX {keyword}IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING {index_type} ({expression} {opclass}) WITH ({with_clause})'
+        )
+
+    logger.info(f"Created {index_type} index {name} with {options}")
+    return {'name': name, 'type': index_type, 'opclass': opclass, 'quantization': quantization, 'options': options}
+
+
+def rebuild_vector_index(index_type: Optional[str] = None, concurrently: bool = False,
+                         quantization: Optional[str] = None, **params) -> Dict[str, Any]:
+    """Replace any existing ANN index on Document.embedding with a freshly built one"""
+    # Waits for a bulk load that has the indexes dropped to rebuild them first
+    with vector_index_lock():
+        dropped = drop_vector_indexes(concurrently=concurrently)
+        result = create_vector_index(index_type, concurrently=concurrently, quantization=quantization, **params)
+    result['dropped'] = dropped
+    return result
@@ -3,15 +3,13 @@ import logging
 from pydantic import BaseModel
 from typing import Optional, List
 import re
-from openai import OpenAI
 import os
+from ..services.openai_clients import get_async_openai_client
+from ..streaming import acompletion_events, sse_response
 
 rag_router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-openai_client = OpenAI()
-
 class QueryRequest(BaseModel):
     query: str
 
@@ -32,7 +30,7 @@ async def text_query(request: Request):
 
         try:
             # Use OpenAI directly for text queries
-            response = openai_client.chat.completions.create(
+            response = await get_async_openai_client().chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": data['query']}],
                 temperature=0.7,
@@ -59,6 +57,26 @@ async def text_query(request: Request):
             "message": str(e)
         }
 
+@rag_router.post("/text_query/stream")
+async def text_query_stream(request: Request):
+    """Text mode query streamed as Server-Sent Events: token events, then done"""
+    data = await request.json()
+    if not data.get('query'):
+        raise HTTPException(status_code=400, detail="No query provided")
+
+    async def events():
+        async for event in acompletion_events(
+            get_async_openai_client(),
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": data['query']}],
+            temperature=0.7,
+            max_tokens=500
+        ):
+            yield event
+        yield {"type": "done", "status": "success"}
+
+    return sse_response(events(), "text_query")
+
 @rag_router.post("/add-to-kb")
 async def add_to_kb(request: Request):
     """Add content to knowledge base"""
@@ -1,21 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
-from ..services.transcription_service import TranscriptionService
-from ..services.tts_service import TTSService
+from ..services.openai_clients import get_async_openai_client
+from ..services.openai_gateway import openai_priority
 import logging
-import os
-from openai import OpenAI
 
 router = APIRouter()
 
-# Initialize services
-transcription_service = TranscriptionService()
-tts_service = TTSService()
-
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-openai_client = OpenAI()
-
 @router.post("/transcribe-speech/")
 async def transcribe_speech(audio: UploadFile = File(...)):
     """Transcribe speech using Whisper API"""
@@ -23,30 +14,18 @@ async def transcribe_speech(audio: UploadFile = File(...)):
         # Read the audio file
         audio_content = await audio.read()
         
-        # Create a temporary file
-        temp_path = f"temp_{audio.filename}"
-        try:
-            # Save audio to temporary file
-            with open(temp_path, "wb") as temp_file:
-                temp_file.write(audio_content)
-            
-            # Transcribe using Whisper
-            with open(temp_path, "rb") as audio_file:
-                transcript = openai_client.audio.transcriptions.create(
-                    file=audio_file,
-                    model="whisper-1",
-                    response_format="text"
-                )
-            
-            return {
-                "status": "success",
-                "text": transcript
-            }
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        # Transcribe using Whisper; the upload is sent from memory. Voice goes ahead of queued batch work.
+        with openai_priority('realtime'):
+            transcript = await get_async_openai_client().audio.transcriptions.create(
+                file=(audio.filename, audio_content),
+                model="whisper-1",
+                response_format="text"
+            )
+        
+        return {
+            "status": "success",
+            "text": transcript
+        }
                 
     except Exception as e:
         logger.error(f"Error transcribing speech: {str(e)}")
@@ -62,7 +41,7 @@ async def generate_insights(data: dict):
     """Endpoint to generate insights."""
     try:
         # Use OpenAI directly for insights generation
-        response = openai_client.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[{"role": "user", "content": f"Analyze and provide insights for: {data}"}],
             temperature=0.7,
@@ -84,7 +63,7 @@ async def update_knowledge(data: dict):
     """Endpoint to update the knowledge base."""
     try:
         # Use OpenAI directly for knowledge base updates
-        response = openai_client.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[{"role": "user", "content": f"Update knowledge base with: {data}"}],
             temperature=0.7,
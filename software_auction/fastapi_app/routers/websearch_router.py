@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Request
-from ..services.websearch_service import WebSearchService
+from .. import lifecycle
 from ..services import settings
 import logging
+import asyncio
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -19,9 +20,6 @@ async def health_check():
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=503, detail="Service unavailable")
 
-# Initialize service with settings
-websearch_service = WebSearchService()
-
 @router.post("/search")
 async def web_search(request: Request):
     """Handle web search requests"""
@@ -38,7 +36,9 @@ async def web_search(request: Request):
             }
 
         logger.info("Performing web search...")
-        results = websearch_service.search_and_process(
+        # Blocking HTTP scraping and completions; run off the event loop
+        results = await asyncio.to_thread(
+            lifecycle.get_websearch_service().search_and_process,
             data['query'],
             filter_context=True,
             num_results=settings.MAX_SEARCH_RESULTS
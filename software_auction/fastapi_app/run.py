@@ -45,6 +45,15 @@ if __name__ == "__main__":
     
     logger.info("Starting FastAPI server...")
     logger.info(f"Project root: {project_root}")
+
+    from software_auction.fastapi_app.settings import SERVING_CONFIG
+    if SERVING_CONFIG['WORKERS'] > 1:
+        # Pre-fork serving: gunicorn preloads the app and supervises the uvicorn workers
+        logger.info(f"Starting {SERVING_CONFIG['WORKERS']} workers under gunicorn")
+        config = str(Path(__file__).resolve().parent / 'gunicorn_conf.py')
+        os.chdir(project_root)
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', config,
+                                   'software_auction.fastapi_app.main:app'])
     
     try:
         uvicorn.run(
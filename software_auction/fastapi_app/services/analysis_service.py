@@ -1,17 +1,48 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
 from software_auction.fastapi_app.rag.hybrid_rag import HybridRAG
 
 logger = logging.getLogger(__name__)
 
+# Orchestrated analysis stages: name -> fn(rag, prepared)
+ANALYSIS_STAGES = {
+    'insights': lambda rag, prepared: rag.generate_insights(prepared['transcription'], prepared=prepared),
+    'summary': lambda rag, prepared: rag.generate_summary(prepared['transcription'], prepared=prepared,
+                                                          identify_gaps=False),
+    'knowledge_gaps': lambda rag, prepared: rag._identify_knowledge_gaps(
+        prepared['transcription'], prepared['retrieval']['context']
+    ),
+}
+
 class AnalysisService:
-    def __init__(self):
-        self.rag = HybridRAG()
+    def __init__(self, rag: HybridRAG = None):
+        # Prefer the process-wide instance from lifecycle.get_analysis_service()
+        self.rag = rag or HybridRAG()
         
-    def analyze_text(self, text: str) -> Dict[str, Any]:
-        """Analyze text using RAG-enhanced analysis"""
+    def analyze_text(self, text: str, orchestrated: bool = True) -> Dict[str, Any]:
+        """
+        Analyze text using RAG-enhanced analysis
+
+        Orchestrated (the default) retrieves once and runs the insights,
+        summary and knowledge-gap completions concurrently; the result has
+        the same shape as the serial path.
+        """
         try:
+            if orchestrated:
+                results = {}
+                for event in self.iter_analysis(text):
+                    if event['stage'] == 'error':
+                        return {'error': event['error']}
+                    if event['stage'] in ANALYSIS_STAGES:
+                        results[event['stage']] = event['result']
+                summary = results['summary']
+                if 'error' not in summary:
+                    summary['suggested_updates'] = results['knowledge_gaps']
+                return {'insights': results['insights'], 'summary': summary}
+
             # Get insights using RAG
             insights = self.rag.generate_insights(text)
             
@@ -26,6 +57,55 @@ class AnalysisService:
         except Exception as e:
             logger.error(f"Error in text analysis: {str(e)}")
             return {'error': str(e)}
+
+    def iter_analysis(self, text: str, long_input: bool = None) -> Iterator[Dict[str, Any]]:
+        """
+        Orchestrated analysis as a stream of events, each stage reported as
+        soon as it finishes:
+
+            {'stage': 'retrieval', 'elapsed_ms', 'sources', 'long_input'}
+            {'stage': 'insights' | 'summary' | 'knowledge_gaps', 'result', 'elapsed_ms'}
+            {'stage': 'done', 'elapsed_ms', 'timings'}
+
+        or a single {'stage': 'error', 'error'} if retrieval fails. Total time
+        is retrieval plus the slowest completion instead of the sum of all.
+        """
+        start = time.perf_counter()
+        try:
+            prepared = self.rag.prepare_analysis(text, long_input)
+        except Exception as e:
+            logger.error(f"Error preparing analysis: {str(e)}")
+            yield {'stage': 'error', 'error': str(e)}
+            return
+
+        timings = {'retrieval': round((time.perf_counter() - start) * 1000, 1)}
+        yield {
+            'stage': 'retrieval',
+            'elapsed_ms': timings['retrieval'],
+            'sources': len(prepared['retrieval'].get('documents', [])),
+            'long_input': prepared['condensed'],
+        }
+
+        executor = ThreadPoolExecutor(max_workers=len(ANALYSIS_STAGES), thread_name_prefix='analysis')
+        try:
+            futures = {
+                executor.submit(stage, self.rag, prepared): name
+                for name, stage in ANALYSIS_STAGES.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error in analysis stage {name}: {str(e)}")
+                    result = {'error': str(e)}
+                timings[name] = round((time.perf_counter() - start) * 1000, 1)
+                yield {'stage': name, 'result': result, 'elapsed_ms': timings[name]}
+        finally:
+            # A client that disconnects mid-stream doesn't wait for the remaining stages
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield {'stage': 'done', 'elapsed_ms': round((time.perf_counter() - start) * 1000, 1), 'timings': timings}
             
     def query_knowledge_base(self, question: str, style: str = "conversation", user_context: Dict = None) -> Dict[str, Any]:
         """Query the knowledge base"""
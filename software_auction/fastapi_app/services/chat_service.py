@@ -1,11 +1,12 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 import logging
 import os
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
 from ..settings import AI_MODEL_CONFIG
+from .openai_clients import get_openai_client, get_async_openai_client
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
@@ -22,7 +23,9 @@ class ChatService:
             self.logger.error("OPENAI_API_KEY not found in environment variables")
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # Shared clients: async for get_response(), sync for the threaded stream_response()
+        self.client = get_openai_client()
+        self.async_client = get_async_openai_client()
         self.model = AI_MODEL_CONFIG['OPENAI_MODEL']
         self.temperature = AI_MODEL_CONFIG['TEMPERATURE']
         self.logger.info(f"ChatService initialized successfully with model: {self.model}")
@@ -40,13 +43,7 @@ class ChatService:
             self.logger.info(f"Processing query: {query}")
             
             # Get information about available tables
-            with self.db_conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT table_name, column_names
-                    FROM csv_metadata
-                    ORDER BY upload_date DESC
-                """)
-                tables_info = [dict(row) for row in cur.fetchall()]
+            tables_info = await asyncio.to_thread(self._tables_info)
             
             if not tables_info:
                 return "No datasets are available for analysis."
@@ -68,48 +65,115 @@ class ChatService:
             self.logger.error(f"Error processing query: {str(e)}")
             return f"Error processing your query: {str(e)}"
 
+    def stream_response(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        get_response() as events: {'type': 'status', 'stage': 'sql', 'sql'} once
+        the query is generated, {'type': 'token', 'content'} per answer delta,
+        then {'type': 'done', 'sql_query', 'rows'}. Blocking generator.
+        """
+        try:
+            self.logger.info(f"Processing streamed query: {query}")
+            tables_info = self._tables_info()
+            if not tables_info:
+                yield {'type': 'token', 'content': "No datasets are available for analysis."}
+                yield {'type': 'done', 'sql_query': None, 'rows': 0}
+                return
+
+            sql_query = self._sql_for(query, tables_info)
+            yield {'type': 'status', 'stage': 'sql', 'sql': sql_query}
+            sql_results = self._run_sql(sql_query)
+
+            if not sql_results:
+                yield {'type': 'token', 'content': "No results found for your query."}
+            else:
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._response_messages(query, sql_results, sql_query),
+                    temperature=self.temperature,
+                    max_tokens=1000,
+                    stream=True
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield {'type': 'token', 'content': chunk.choices[0].delta.content}
+            yield {'type': 'done', 'sql_query': sql_query, 'rows': len(sql_results)}
+
+        except Exception as e:
+            self.logger.error(f"Error streaming query: {str(e)}")
+            yield {'type': 'error', 'error': f"Error processing your query: {str(e)}"}
+
+    def _tables_info(self) -> List[Dict[str, Any]]:
+        with self.db_conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT table_name, column_names
+                FROM csv_metadata
+                ORDER BY upload_date DESC
+            """)
+            return [dict(row) for row in cur.fetchall()]
+
     async def _convert_to_sql(self, query: str, tables_info: List[Dict[str, Any]]) -> str:
         """Convert natural language query to SQL"""
         try:
-            # Create context about available tables
-            tables_context = "\n".join([
-                f"Table: {table['table_name']}\nColumns: {', '.join(table['column_names'])}"
-                for table in tables_info
-            ])
-            
             # Ask AI to convert to SQL
-            response = self.client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": """You are a SQL expert. Convert the user's question into a SQL query.
-                    Use the following guidelines:
-                    1. Only use tables and columns that are available
-                    2. Use proper SQL syntax
-                    3. Include necessary JOINs if querying multiple tables
-                    4. Use appropriate aggregation functions when needed
-                    5. Return ONLY the SQL query, no markdown formatting, no explanations, no backticks"""},
-                    {"role": "system", "content": f"Available tables and columns:\n{tables_context}"},
-                    {"role": "user", "content": f"Convert this question to SQL: {query}"}
-                ],
+                messages=self._sql_messages(query, tables_info),
                 temperature=0.3,
                 max_tokens=500
             )
+            return self._clean_sql(response)
             
-            if not response.choices or not response.choices[0].message:
-                raise ValueError("Invalid response format from OpenAI")
-            
-            # Clean up the SQL query - remove any markdown formatting
-            sql_query = response.choices[0].message.content.strip()
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-            
-            return sql_query
+        except Exception as e:
+            self.logger.error(f"Error converting to SQL: {str(e)}")
+            raise
+
+    def _sql_for(self, query: str, tables_info: List[Dict[str, Any]]) -> str:
+        """_convert_to_sql() on the sync client"""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._sql_messages(query, tables_info),
+                temperature=0.3,
+                max_tokens=500
+            )
+            return self._clean_sql(response)
             
         except Exception as e:
             self.logger.error(f"Error converting to SQL: {str(e)}")
             raise
 
+    def _sql_messages(self, query: str, tables_info: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        # Create context about available tables
+        tables_context = "\n".join([
+            f"Table: {table['table_name']}\nColumns: {', '.join(table['column_names'])}"
+            for table in tables_info
+        ])
+        
+        return [
+            {"role": "system", "content": """You are a SQL expert. Convert the user's question into a SQL query.
+            Use the following guidelines:
+            1. Only use tables and columns that are available
+            2. Use proper SQL syntax
+            3. Include necessary JOINs if querying multiple tables
+            4. Use appropriate aggregation functions when needed
+            5. Return ONLY the SQL query, no markdown formatting, no explanations, no backticks"""},
+            {"role": "system", "content": f"Available tables and columns:\n{tables_context}"},
+            {"role": "user", "content": f"Convert this question to SQL: {query}"}
+        ]
+
+    def _clean_sql(self, response) -> str:
+        if not response.choices or not response.choices[0].message:
+            raise ValueError("Invalid response format from OpenAI")
+        
+        # Clean up the SQL query - remove any markdown formatting
+        sql_query = response.choices[0].message.content.strip()
+        return sql_query.replace('```sql', '').replace('```', '').strip()
+
     async def _execute_sql(self, sql_query: str) -> List[Dict[str, Any]]:
         """Execute SQL query and return results"""
+        return await asyncio.to_thread(self._run_sql, sql_query)
+
+    def _run_sql(self, sql_query: str) -> List[Dict[str, Any]]:
         try:
             with self.db_conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute(sql_query)
@@ -126,31 +190,9 @@ class ChatService:
             if not sql_results:
                 return "No results found for your query."
                 
-            # Format results for context
-            results_context = []
-            for i, row in enumerate(sql_results, 1):
-                row_str = f"Row {i}:"
-                for key, value in row.items():
-                    if value is None:
-                        value = "NULL"
-                    row_str += f"\n  {key}: {value}"
-                results_context.append(row_str)
-            
-            results_text = "\n\n".join(results_context)
-            
-            response = self.client.chat.completions.create(
+            response = await self.async_client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": """You are a data analyst. Generate a clear, natural language response based on the SQL query results.
-                    Guidelines:
-                    1. Use specific numbers and values from the results
-                    2. Explain the findings in simple terms
-                    3. Highlight key insights
-                    4. If no results were found, explain why
-                    5. Be precise and data-driven"""},
-                    {"role": "system", "content": f"Original question: {query}\nSQL query used: {sql_query}\nQuery results:\n{results_text}"},
-                    {"role": "user", "content": "Please provide a clear answer to the original question based on these results."}
-                ],
+                messages=self._response_messages(query, sql_results, sql_query),
                 temperature=self.temperature,
                 max_tokens=1000
             )
@@ -162,4 +204,29 @@ class ChatService:
             
         except Exception as e:
             self.logger.error(f"Error generating response: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def _response_messages(self, query: str, sql_results: List[Dict[str, Any]], sql_query: str) -> List[Dict[str, str]]:
+        # Format results for context
+        results_context = []
+        for i, row in enumerate(sql_results, 1):
+            row_str = f"Row {i}:"
+            for key, value in row.items():
+                if value is None:
+                    value = "NULL"
+                row_str += f"\n  {key}: {value}"
+            results_context.append(row_str)
+        
+        results_text = "\n\n".join(results_context)
+        
+        return [
+            {"role": "system", "content": """You are a data analyst. Generate a clear, natural language response based on the SQL query results.
+            Guidelines:
+            1. Use specific numbers and values from the results
+            2. Explain the findings in simple terms
+            3. Highlight key insights
+            4. If no results were found, explain why
+            5. Be precise and data-driven"""},
+            {"role": "system", "content": f"Original question: {query}\nSQL query used: {sql_query}\nQuery results:\n{results_text}"},
+            {"role": "user", "content": "Please provide a clear answer to the original question based on these results."}
+        ]
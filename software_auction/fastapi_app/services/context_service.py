@@ -1,13 +1,14 @@
 from typing import List, Dict, Any
 import logging
-from openai import OpenAI
+from .openai_clients import get_openai_client
 import os
+from .embedding_providers import similarity_embedding_provider
 
 logger = logging.getLogger(__name__)
 
 class ContextService:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.openai_client = get_openai_client()
 
     def get_context_embedding(self, text: str, context_docs: List[str]) -> Dict[str, Any]:
         """Get embedding for context text"""
@@ -19,19 +20,16 @@ class ContextService:
             # Combine context documents
             combined_context = " ".join(context_docs)
             
-            # Get embedding for the context
-            response = self.openai_client.embeddings.create(
-                input=combined_context,
-                model="text-embedding-ada-002"
-            )
+            # Get embedding for the context; unchanged context is served from the cache
+            embedding = similarity_embedding_provider().embed_one(combined_context)
             
-            if not response or not response.data or not response.data[0]:
+            if not embedding:
                 logger.warning("No valid embedding response")
                 return None
             
             # Ensure we return a dictionary with the embedding
             return {
-                'embedding': response.data[0].embedding,
+                'embedding': embedding,
                 'documents': context_docs
             }
         except Exception as e:
@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Any, Awaitable, Callable, Optional
+
+from ..settings import EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts up to 2048 inputs per embeddings request
+MAX_BATCH_SIZE = 256
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace differences don't change what we embed"""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of an embedding: sha256 over model and normalized text"""
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+def response_embeddings(response) -> List[List[float]]:
+    """Vectors from an embeddings API response, in input order"""
+    # Results are not guaranteed to come back in input order
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _decode(vector: bytes) -> List[float]:
+    values = array('f')
+    values.frombytes(vector)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed embedding cache.
+
+    The memory tier is an LRU bounded by the size of the stored vectors. The
+    disk tier is a sqlite database in WAL mode, so it survives restarts and
+    can be read and written by several worker processes at once. Vectors are
+    stored as float32, the precision the embeddings API returns.
+    """
+
+    def __init__(self, max_memory_bytes: int = 64 * 1024 * 1024, disk_path: Optional[str] = None):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'bytes_saved': 0,  # input text that did not have to be sent to the API
+            'api_requests': 0,
+        }
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """One sqlite connection per thread"""
+        if not self.disk_path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _remember(self, key: str, vector: bytes):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = vector
+            self._memory_bytes += len(vector)
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._counters['evictions'] += 1
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[int, List[float]]:
+        """Cached embeddings for texts, keyed by position in the input list"""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        pending = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self._counters['memory_hits'] += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        conn = self._connection()
+        if pending and conn is not None:
+            try:
+                pending_keys = list(pending)
+                # Stay well below sqlite's bound-parameter limit
+                for start in range(0, len(pending_keys), 500):
+                    batch = pending_keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, vector in rows:
+                        self._remember(key, vector)
+                        for i in pending.pop(key):
+                            found[i] = vector
+                            self._count('disk_hits')
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed: {str(e)}")
+
+        self._count('misses', sum(len(positions) for positions in pending.values()))
+        self._count('bytes_saved', sum(len(texts[i].encode('utf-8')) for i in found))
+        return {i: _decode(vector) for i, vector in found.items()}
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store embeddings in both tiers"""
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            key = cache_key(model, text)
+            vector = array('f', embedding).tobytes()
+            self._remember(key, vector)
+            rows.append((key, model, len(embedding), vector))
+
+        conn = self._connection()
+        if rows and conn is not None:
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def embed(self, openai_client, texts: List[str], model: str = EMBEDDING_MODEL_NAME,
+              batch_size: int = MAX_BATCH_SIZE) -> List[List[float]]:
+        """Embed texts with the OpenAI API through the cache"""
+        def fetch(batch: List[str]) -> List[List[float]]:
+            return response_embeddings(openai_client.embeddings.create(input=batch, model=model))
+        return self.embed_with(fetch, texts, model, batch_size)
+
+    async def aembed(self, async_openai_client, texts: List[str], model: str = EMBEDDING_MODEL_NAME,
+                     batch_size: int = MAX_BATCH_SIZE) -> List[List[float]]:
+        """embed() for an AsyncOpenAI client"""
+        async def fetch(batch: List[str]) -> List[List[float]]:
+            return response_embeddings(await async_openai_client.embeddings.create(input=batch, model=model))
+        return await self.aembed_with(fetch, texts, model, batch_size)
+
+    def embed_with(self, fetch: Callable[[List[str]], List[List[float]]], texts: List[str], model: str,
+                   batch_size: int = MAX_BATCH_SIZE) -> List[List[float]]:
+        """
+        Embed texts, calling fetch only for texts not found in either tier.
+        Duplicates within the request are sent once. Output order matches input.
+        model namespaces the cache keys, so it must identify the embedding model.
+        """
+        embeddings, missing, unique = self._lookup(model, texts)
+        if missing:
+            fetched = []
+            for start in range(0, len(unique), batch_size):
+                fetched.extend(fetch(unique[start:start + batch_size]))
+                self._count('api_requests')
+            self._fill(model, embeddings, missing, unique, fetched)
+        return [embeddings[i] for i in range(len(texts))]
+
+    async def aembed_with(self, fetch: Callable[[List[str]], Awaitable[List[List[float]]]], texts: List[str],
+                          model: str, batch_size: int = MAX_BATCH_SIZE) -> List[List[float]]:
+        """embed_with() for a coroutine fetch"""
+        embeddings, missing, unique = self._lookup(model, texts)
+        if missing:
+            fetched = []
+            for start in range(0, len(unique), batch_size):
+                fetched.extend(await fetch(unique[start:start + batch_size]))
+                self._count('api_requests')
+            self._fill(model, embeddings, missing, unique, fetched)
+        return [embeddings[i] for i in range(len(texts))]
+
+    def _lookup(self, model: str, texts: List[str]):
+        """Cached embeddings by position, positions of each missing key, and the texts to request"""
+        embeddings = self.get_many(model, texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            if i not in embeddings:
+                missing.setdefault(cache_key(model, text), []).append(i)
+        unique = [normalize_text(texts[positions[0]]) for positions in missing.values()]
+        return embeddings, missing, unique
+
+    def _fill(self, model: str, embeddings: Dict[int, List[float]], missing: Dict[str, List[int]],
+              unique: List[str], fetched: List[List[float]]):
+        self.put_many(model, unique, fetched)
+        for positions, embedding in zip(missing.values(), fetched):
+            for i in positions:
+                embeddings[i] = embedding
+
+    def embed_one(self, openai_client, text: str, model: str = EMBEDDING_MODEL_NAME) -> List[float]:
+        return self.embed(openai_client, [text], model=model)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_entries'] = len(self._memory)
+            counters['memory_bytes'] = self._memory_bytes
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = round((counters['memory_hits'] + counters['disk_hits']) / lookups, 4) if lookups else 0.0
+        counters['max_memory_bytes'] = self.max_memory_bytes
+        counters['disk_path'] = self.disk_path
+        return counters
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        conn = self._connection()
+        if disk and conn is not None:
+            with conn:
+                conn.execute("DELETE FROM embeddings")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache shared by HybridRAG, ContextService and WebSearchService"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_memory_bytes=EMBEDDING_CACHE_CONFIG['MEMORY_MAX_BYTES'],
+                    disk_path=EMBEDDING_CACHE_CONFIG['DISK_PATH'] if EMBEDDING_CACHE_CONFIG['DISK_ENABLED'] else None
+                )
+    return _cache
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from ..settings import EMBEDDING_CONFIG, EMBEDDING_MODEL_NAME, OPENAI_CLIENT_CONFIG
+from .embedding_cache import MAX_BATCH_SIZE, get_embedding_cache, response_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Output dimensions of the OpenAI embedding models
+OPENAI_DIMENSIONS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+}
+
+
+class EmbeddingProvider:
+    """
+    An embedding model. embed() goes through the shared embedding cache,
+    keyed by the provider name, so vectors from different models never mix.
+    Subclasses implement _fetch() for texts the cache does not have.
+    """
+    backend = None
+
+    def __init__(self, name: str, dimensions: Optional[int] = None, batch_size: int = MAX_BATCH_SIZE):
+        self.name = name
+        self._dimensions = dimensions
+        self.batch_size = batch_size
+        self.tokens_used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return self._dimensions
+
+    def _fetch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def _count_tokens(self, tokens: int):
+        with self._lock:
+            self.tokens_used += tokens
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return get_embedding_cache().embed_with(self._fetch, texts, self.name, self.batch_size)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+    async def aclose(self):
+        """Release resources tied to the running event loop; called before the loop ends"""
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def verify(self) -> Dict[str, Any]:
+        """Embed a probe text, bypassing the cache, and check the vector size"""
+        vector = self._fetch(["test"])[0]
+        if self.dimensions is not None and len(vector) != self.dimensions:
+            raise ValueError(f"Embedding provider '{self.name}' returned {len(vector)} dimensions, "
+                             f"expected {self.dimensions}")
+        return self.describe()
+
+    def describe(self) -> Dict[str, Any]:
+        return {'name': self.name, 'backend': self.backend, 'dimensions': self.dimensions,
+                'tokens_used': self.tokens_used}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API"""
+    backend = 'openai'
+
+    def __init__(self, model: str = EMBEDDING_MODEL_NAME, client=None, async_client=None,
+                 dimensions: Optional[int] = None, batch_size: int = MAX_BATCH_SIZE):
+        super().__init__(model, dimensions or OPENAI_DIMENSIONS.get(model), batch_size)
+        self.model = model
+        self._client = client
+        self._async_client = async_client
+        # event loop -> client: an httpx pool only works on the loop it was created on
+        self._loop_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .openai_clients import get_openai_client
+            self._client = get_openai_client()
+        return self._client
+
+    @property
+    def async_client(self):
+        """A client for the running event loop; ingestion runs each pipeline on a loop of its own"""
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            from .openai_gateway import GatewayClient, get_openai_gateway
+            client = self._loop_clients[loop] = GatewayClient(
+                AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=OPENAI_CLIENT_CONFIG['MAX_RETRIES']),
+                get_openai_gateway(), is_async=True
+            )
+        return client
+
+    async def aclose(self):
+        """Close the running loop's client and its connection pool"""
+        client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _record_usage(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self._count_tokens(usage.total_tokens)
+
+    def _fetch(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(input=texts, model=self.model)
+        self._record_usage(response)
+        return response_embeddings(response)
+
+    async def _afetch(self, texts: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(input=texts, model=self.model)
+        self._record_usage(response)
+        return response_embeddings(response)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        return await get_embedding_cache().aembed_with(self._afetch, texts, self.name, self.batch_size)
+
+
+class OnnxEmbeddingProvider(EmbeddingProvider):
+    """
+    A sentence-embedding model exported to ONNX (e.g. all-MiniLM-L6-v2), run
+    locally on CPU with onnxruntime. Inputs are sorted by length so each
+    batch pads to similar lengths, token states are mean- or CLS-pooled and
+    the vectors L2-normalised. The session runs with `threads` intra-op
+    threads and is safe to call from several threads at once.
+    """
+    backend = 'onnx'
+
+    def __init__(self, model_path: str, tokenizer: str = None, dimensions: Optional[int] = None,
+                 pooling: str = 'mean', normalize: bool = True, max_length: int = 256,
+                 batch_size: int = 32, threads: Optional[int] = None, name: str = None):
+        if pooling not in ('mean', 'cls'):
+            raise ValueError(f"Unknown pooling '{pooling}'. Choose from: mean, cls")
+        self.model_path = Path(model_path)
+        # The cache hands over up to MAX_BATCH_SIZE texts; they are length-sorted and run batch_size at a time
+        super().__init__(name or f"onnx:{self.model_path.parent.name or self.model_path.stem}", dimensions)
+        self.inference_batch_size = batch_size
+        self.tokenizer_name = tokenizer or str(self.model_path.parent / 'tokenizer.json')
+        self.pooling = pooling
+        self.normalize = normalize
+        self.max_length = max_length
+        self.threads = threads or os.cpu_count() or 1
+        self._session = None
+        self._tokenizer = None
+        self._input_names = set()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._load_session()
+        return self._session
+
+    def _load_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(str(self.model_path), sess_options=options,
+                                       providers=['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in session.get_inputs()}
+
+        output_size = session.get_outputs()[0].shape[-1]
+        if isinstance(output_size, int):
+            if self._dimensions is not None and self._dimensions != output_size:
+                raise ValueError(f"{self.model_path} outputs {output_size} dimensions, configured {self._dimensions}")
+            self._dimensions = output_size
+        logger.info(f"Loaded ONNX embedding model {self.model_path} ({self._dimensions} dimensions, "
+                    f"{self.threads} threads)")
+        return session
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from tokenizers import Tokenizer
+
+            if os.path.exists(self.tokenizer_name):
+                tokenizer = Tokenizer.from_file(self.tokenizer_name)
+            else:
+                tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        if self._dimensions is None:
+            self.session
+        return self._dimensions
+
+    def _fetch(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        session = self.session
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.inference_batch_size):
+            positions = order[start:start + self.inference_batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in positions])
+            mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {
+                'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': mask,
+            }
+            if 'token_type_ids' in self._input_names:
+                feeds['token_type_ids'] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+            hidden = session.run(None, feeds)[0]
+            if hidden.ndim == 3:
+                if self.pooling == 'cls':
+                    hidden = hidden[:, 0]
+                else:
+                    weights = mask[:, :, None].astype(hidden.dtype)
+                    hidden = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                hidden = hidden / np.clip(np.linalg.norm(hidden, axis=1, keepdims=True), 1e-12, None)
+
+            self._count_tokens(int(mask.sum()))
+            for i, vector in zip(positions, hidden.astype(np.float32).tolist()):
+                vectors[i] = vector
+        return vectors
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), 'model_path': str(self.model_path), 'threads': self.threads}
+
+
+BACKENDS = {
+    'openai': lambda config: OpenAIEmbeddingProvider(
+        model=config.get('MODEL', EMBEDDING_MODEL_NAME),
+        dimensions=config.get('DIMENSIONS'),
+    ),
+    'onnx': lambda config: OnnxEmbeddingProvider(
+        config['MODEL_PATH'],
+        tokenizer=config.get('TOKENIZER'),
+        dimensions=config.get('DIMENSIONS'),
+        pooling=config.get('POOLING', 'mean'),
+        max_length=config.get('MAX_LENGTH', 256),
+        batch_size=config.get('BATCH_SIZE', 32),
+        threads=config.get('THREADS'),
+    ),
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_embedding_provider(name: str) -> EmbeddingProvider:
+    """Shared provider by its EMBEDDING_CONFIG['PROVIDERS'] name"""
+    if name not in _providers:
+        with _providers_lock:
+            if name not in _providers:
+                config = EMBEDDING_CONFIG['PROVIDERS'].get(name)
+                if config is None:
+                    raise ValueError(f"Unknown embedding provider '{name}'. "
+                                     f"Choose from: {', '.join(sorted(EMBEDDING_CONFIG['PROVIDERS']))}")
+                _providers[name] = BACKENDS[config['BACKEND']](config)
+    return _providers[name]
+
+
+def _reset_after_fork():
+    # Providers hold clients bound to the parent's connection pools and gateway
+    global _providers_lock
+    _providers.clear()
+    _providers_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def check_dimensions(provider: EmbeddingProvider):
+    """Raise if the provider's vectors cannot be stored in Document.embedding"""
+    from ..models import Document
+
+    expected = Document._meta.get_field('embedding').dimensions
+    if provider.dimensions is not None and provider.dimensions != expected:
+        raise ValueError(
+            f"Embedding provider '{provider.name}' produces {provider.dimensions}-dimensional vectors but "
+            f"Document.embedding is vector({expected}). Configure a matching model, or change the VectorField "
+            f"dimensions with a migration and re-ingest the knowledge base."
+        )
+
+
+def document_embedding_provider() -> EmbeddingProvider:
+    """Provider for Document rows and retrieval queries, checked against the VectorField"""
+    provider = get_embedding_provider(EMBEDDING_CONFIG['DOCUMENTS'])
+    check_dimensions(provider)
+    return provider
+
+
+def similarity_embedding_provider() -> EmbeddingProvider:
+    """Provider for text-to-text similarity that never touches the vector column"""
+    return get_embedding_provider(EMBEDDING_CONFIG['SIMILARITY'])
@@ -0,0 +1,91 @@
+"""
+Process-wide OpenAI clients.
+
+Every caller shares one AsyncOpenAI (for async handlers) and one OpenAI
+(for code that runs in worker threads: HybridRAG, the job worker, SSE
+generators) instead of constructing a client, and with it a fresh
+connection pool, per request or per service. Both pools are sized by
+OPENAI_CLIENT_CONFIG and closed by close_openai_clients() on shutdown.
+Both clients are wrapped in a GatewayClient, so their calls are rate
+limited, retried and prioritised by the process-wide OpenAIGateway.
+"""
+import logging
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from ..settings import OPENAI_CLIENT_CONFIG
+from .openai_gateway import GatewayClient, get_openai_gateway
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_async_client = None
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_CLIENT_CONFIG['MAX_CONNECTIONS'],
+        max_keepalive_connections=OPENAI_CLIENT_CONFIG['MAX_KEEPALIVE_CONNECTIONS'],
+        keepalive_expiry=OPENAI_CLIENT_CONFIG['KEEPALIVE_EXPIRY'],
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_CLIENT_CONFIG['TIMEOUT'], connect=OPENAI_CLIENT_CONFIG['CONNECT_TIMEOUT'])
+
+
+def get_openai_client() -> OpenAI:
+    """Shared synchronous client, for code running outside the event loop"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = GatewayClient(OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    max_retries=OPENAI_CLIENT_CONFIG['MAX_RETRIES'],
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                ), get_openai_gateway(), is_async=False)
+    return _client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Shared async client; await it from request handlers"""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = GatewayClient(AsyncOpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    max_retries=OPENAI_CLIENT_CONFIG['MAX_RETRIES'],
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+                ), get_openai_gateway(), is_async=True)
+    return _async_client
+
+
+async def close_openai_clients():
+    """Close both connection pools; the next get_*() call opens new ones"""
+    global _client, _async_client
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    try:
+        if async_client is not None:
+            await async_client.close()
+        if client is not None:
+            client.close()
+    except Exception as e:
+        logger.warning(f"Error closing OpenAI clients: {str(e)}")
+
+
+def _reset_after_fork():
+    # The parent's pooled sockets are shared with it, so a forked worker forgets them instead of closing them
+    global _client, _async_client, _lock
+    _client = _async_client = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
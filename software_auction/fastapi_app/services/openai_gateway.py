@@ -0,0 +1,506 @@
+"""
+Gateway for every OpenAI API call made by this process.
+
+The shared clients from services.openai_clients wrap the SDK clients in a
+GatewayClient, so `client.chat.completions.create(...)`,
+`client.embeddings.create(...)`, `client.audio.transcriptions.create(...)`
+and `client.audio.speech.create(...)` all pass through one OpenAIGateway:
+
+    budgets      per-model token buckets for requests and tokens per minute
+                 (OPENAI_GATEWAY_CONFIG['LIMITS'], split between PROCESSES
+                 workers); token use is estimated up front and corrected
+                 from the response's usage
+    concurrency  per-model in-flight limit adjusted AIMD-style: +1/limit per
+                 success, halved on a 429, cut by LATENCY_DECREASE when a
+                 call is much slower than that model's moving average
+    retries      429s, 5xx, timeouts and connection errors are retried with
+                 full-jitter exponential backoff, honouring Retry-After; the
+                 SDK clients' own retries are off
+    priority     requests wait in a per-model queue ordered by priority
+                 (realtime voice < interactive < batch) and arrival, with
+                 AGING_SECONDS of waiting worth one priority level
+
+Callers pick a priority with `with openai_priority('batch'):` around the
+calls (a ContextVar, so it follows asyncio tasks and asyncio.to_thread).
+Sync and async callers share the same queues; a dispatcher thread grants
+slots as capacity and budget become available.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Callable, Optional
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from ..settings import OPENAI_GATEWAY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)  # APITimeoutError is an APIConnectionError
+# Latency moving average weight of the newest call
+LATENCY_EWMA_ALPHA = 0.2
+
+_priority: ContextVar[Optional[str]] = ContextVar('openai_priority', default=None)
+
+
+@contextmanager
+def openai_priority(name: str):
+    """Queue OpenAI calls made inside the block at this priority"""
+    if name not in OPENAI_GATEWAY_CONFIG['PRIORITIES']:
+        raise ValueError(f"Unknown priority '{name}'. Choose from: {', '.join(OPENAI_GATEWAY_CONFIG['PRIORITIES'])}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get() or OPENAI_GATEWAY_CONFIG['DEFAULT_PRIORITY']
+
+
+class GatewayQueueTimeout(TimeoutError):
+    """A request waited longer than QUEUE_TIMEOUT for a slot"""
+
+
+def _text_chars(content) -> int:
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, list):
+        # Multi-part message content, or a batch of embedding inputs
+        return sum(_text_chars(part.get('text', '') if isinstance(part, dict) else part) for part in content)
+    return 0
+
+
+def estimate_tokens(endpoint: str, kwargs: Dict[str, Any]) -> int:
+    """Tokens a call will count against TPM: ~4 characters per token, plus the completion allowance"""
+    if endpoint == 'chat.completions.create':
+        prompt = sum(_text_chars(message.get('content')) for message in kwargs.get('messages', []))
+        completion = (kwargs.get('max_completion_tokens') or kwargs.get('max_tokens')
+                      or OPENAI_GATEWAY_CONFIG['DEFAULT_COMPLETION_TOKENS'])
+        return prompt // 4 + 1 + completion
+    if endpoint == 'embeddings.create':
+        inputs = kwargs.get('input', '')
+        if isinstance(inputs, list) and inputs and isinstance(inputs[0], int):
+            return len(inputs)  # Already tokenized
+        return _text_chars(inputs) // 4 + 1
+    return 0
+
+
+def _usage_tokens(result) -> Optional[int]:
+    usage = getattr(result, 'usage', None)
+    return getattr(usage, 'total_tokens', None) if usage is not None else None
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return 0.0
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second up to BURST_SECONDS worth of budget"""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` (capped at capacity, so oversized requests still run) is available"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def drain(self):
+        """Spend the burst, e.g. after the API answered 429"""
+        self.level = min(self.level, 0.0)
+
+
+class _Waiter:
+    __slots__ = ('rank', 'seq', 'tokens', 'enqueued', 'grant', 'granted', 'cancelled')
+
+    def __init__(self, rank: int, seq: int, tokens: int, grant: Callable[[], None]):
+        self.rank = rank
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.grant = grant
+        self.granted = False
+        self.cancelled = False
+
+
+class _ModelState:
+    """Budgets, concurrency limit, queue and counters for one model"""
+
+    def __init__(self, model: str, limits: Dict[str, Any], config: Dict[str, Any]):
+        self.model = model
+        burst = config['BURST_SECONDS']
+        # Worker processes split the account's budgets evenly
+        share = max(1, config.get('PROCESSES', 1))
+        self.requests = TokenBucket(limits['RPM'] / share, burst) if limits.get('RPM') else None
+        self.tokens = TokenBucket(limits['TPM'] / share, burst) if limits.get('TPM') else None
+        self.limit = float(config['INITIAL_CONCURRENCY'])
+        self.in_flight = 0
+        self.waiting: List[_Waiter] = []
+        self.latency_ewma = None
+        self.counters = {
+            'requests': 0,
+            'ok': 0,
+            'rate_limited': 0,
+            'errors': 0,
+            'retries': 0,
+            'queue_timeouts': 0,
+            'tokens': 0,
+            'queue_seconds': 0.0,
+        }
+
+    def budget_wait(self, tokens: int, now: float) -> float:
+        wait = self.requests.wait_time(1, now) if self.requests else 0.0
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+
+class OpenAIGateway:
+    """Admission control, adaptive concurrency and retries shared by all OpenAI calls in the process"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or OPENAI_GATEWAY_CONFIG
+        self._cond = threading.Condition()
+        self._models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count()
+        self._thread = None
+
+    # Admission
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            limits = self.config['LIMITS'].get(model) or self.config['LIMITS']['default']
+            state = self._models[model] = _ModelState(model, limits, self.config)
+        return state
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch_loop, name='openai-gateway', daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, model: str, tokens: int, priority: str, grant: Callable[[], None]) -> _Waiter:
+        rank = self.config['PRIORITIES'].get(priority, self.config['PRIORITIES'][self.config['DEFAULT_PRIORITY']])
+        with self._cond:
+            self._ensure_dispatcher()
+            waiter = _Waiter(rank, next(self._seq), tokens, grant)
+            state = self._state(model)
+            state.waiting.append(waiter)
+            state.counters['requests'] += 1
+            self._cond.notify()
+        return waiter
+
+    def _next_waiter(self, state: _ModelState, now: float) -> _Waiter:
+        aging = self.config['AGING_SECONDS']
+        return min(state.waiting, key=lambda w: (w.rank - (now - w.enqueued) / aging, w.seq))
+
+    def _dispatch(self) -> Optional[float]:
+        """Grant every slot that is free and within budget; returns seconds until a budget refills"""
+        now = time.monotonic()
+        wake = None
+        for state in self._models.values():
+            state.waiting = [waiter for waiter in state.waiting if not waiter.cancelled]
+            while state.waiting and state.in_flight < int(state.limit):
+                waiter = self._next_waiter(state, now)
+                wait = state.budget_wait(waiter.tokens, now)
+                if wait > 0:
+                    # The head of the queue waits for budget; lower priorities don't overtake it
+                    wake = wait if wake is None else min(wake, wait)
+                    break
+                state.waiting.remove(waiter)
+                if state.requests:
+                    state.requests.take(1, now)
+                if state.tokens and waiter.tokens:
+                    state.tokens.take(waiter.tokens, now)
+                state.in_flight += 1
+                state.counters['queue_seconds'] += now - waiter.enqueued
+                waiter.granted = True
+                waiter.grant()
+        return wake
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                wake = self._dispatch()
+                self._cond.wait(timeout=wake)
+
+    def _cancel(self, model: str, waiter: _Waiter):
+        """Withdraw a waiter, handing its slot back if it was already granted"""
+        with self._cond:
+            if waiter.granted:
+                self._state(model).in_flight -= 1
+            waiter.cancelled = True
+            self._cond.notify()
+
+    def _abandon(self, model: str, waiter: _Waiter):
+        """Give up on a waiter that timed out, unless it was granted in the meantime"""
+        with self._cond:
+            if waiter.granted:
+                return
+            waiter.cancelled = True
+            self._state(model).counters['queue_timeouts'] += 1
+        raise GatewayQueueTimeout(f"No OpenAI capacity for {model} within {self.config['QUEUE_TIMEOUT']}s")
+
+    def acquire(self, model: str, tokens: int, priority: str):
+        granted = threading.Event()
+        waiter = self._enqueue(model, tokens, priority, granted.set)
+        if not granted.wait(self.config['QUEUE_TIMEOUT']):
+            self._abandon(model, waiter)
+
+    async def aacquire(self, model: str, tokens: int, priority: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._enqueue(model, tokens, priority, lambda: loop.call_soon_threadsafe(resolve))
+        try:
+            await asyncio.wait_for(future, self.config['QUEUE_TIMEOUT'])
+        except asyncio.TimeoutError:
+            self._abandon(model, waiter)
+        except asyncio.CancelledError:
+            # Client went away while queued (or just after the grant): give the slot back
+            self._cancel(model, waiter)
+            raise
+
+    def release(self, model: str, outcome: str, latency: float = 0.0, estimated: int = 0, used: int = None):
+        """
+        Return a slot and feed the outcome ('ok', 'rate_limited' or 'error')
+        into the concurrency limit and the token budget.
+        """
+        config = self.config
+        with self._cond:
+            state = self._state(model)
+            state.in_flight -= 1
+            if outcome == 'rate_limited':
+                state.counters['rate_limited'] += 1
+                state.limit = max(config['MIN_CONCURRENCY'], state.limit * config['DECREASE_FACTOR'])
+                for bucket in (state.requests, state.tokens):
+                    if bucket:
+                        bucket.drain()
+            elif outcome == 'ok':
+                state.counters['ok'] += 1
+                if state.latency_ewma and latency > state.latency_ewma * config['LATENCY_FACTOR']:
+                    state.limit = max(config['MIN_CONCURRENCY'], state.limit * config['LATENCY_DECREASE'])
+                else:
+                    state.limit = min(config['MAX_CONCURRENCY'], state.limit + 1 / state.limit)
+                state.latency_ewma = latency if state.latency_ewma is None else (
+                    LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * state.latency_ewma
+                )
+            else:
+                state.counters['errors'] += 1
+
+            tokens = estimated if used is None else used
+            state.counters['tokens'] += tokens
+            if state.tokens and used is not None and used != estimated:
+                # Refund an overestimate, charge an underestimate
+                state.tokens.take(used - estimated, time.monotonic())
+            self._cond.notify()
+
+    # Calls
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        ceiling = min(self.config['BACKOFF_MAX'], self.config['BACKOFF_BASE'] * 2 ** attempt)
+        return max(_retry_after(error), random.uniform(0, ceiling))
+
+    def _retrying(self, model: str, attempt: int, error: Exception) -> Optional[float]:
+        """Release the slot of a failed attempt; the backoff before the next one, or None to give up"""
+        self.release(model, 'rate_limited' if isinstance(error, RateLimitError) else 'error')
+        if not isinstance(error, RETRYABLE_ERRORS) or attempt >= self.config['MAX_RETRIES']:
+            return None
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            # A 429 that waiting won't fix
+            return None
+        with self._cond:
+            self._state(model).counters['retries'] += 1
+        delay = self._backoff(attempt, error)
+        logger.warning(f"OpenAI {model} call failed ({type(error).__name__}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def call(self, endpoint: str, fn: Callable, kwargs: Dict[str, Any]):
+        model = kwargs.get('model') or 'default'
+        tokens = estimate_tokens(endpoint, kwargs)
+        priority = current_priority()
+        for attempt in itertools.count():
+            self.acquire(model, tokens, priority)
+            start = time.monotonic()
+            try:
+                result = fn(**kwargs)
+            except Exception as e:
+                delay = self._retrying(model, attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            if kwargs.get('stream'):
+                return _GuardedStream(result, lambda: self.release(model, 'ok', time.monotonic() - start, tokens))
+            self.release(model, 'ok', time.monotonic() - start, tokens, _usage_tokens(result))
+            return result
+
+    async def acall(self, endpoint: str, fn: Callable, kwargs: Dict[str, Any]):
+        model = kwargs.get('model') or 'default'
+        tokens = estimate_tokens(endpoint, kwargs)
+        priority = current_priority()
+        for attempt in itertools.count():
+            await self.aacquire(model, tokens, priority)
+            start = time.monotonic()
+            try:
+                result = await fn(**kwargs)
+            except asyncio.CancelledError:
+                self.release(model, 'error')
+                raise
+            except Exception as e:
+                delay = self._retrying(model, attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if kwargs.get('stream'):
+                return _GuardedStream(result, lambda: self.release(model, 'ok', time.monotonic() - start, tokens))
+            self.release(model, 'ok', time.monotonic() - start, tokens, _usage_tokens(result))
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        priorities = {rank: name for name, rank in self.config['PRIORITIES'].items()}
+        with self._cond:
+            models = {}
+            for model, state in self._models.items():
+                counters = dict(state.counters)
+                granted = counters['requests'] - len(state.waiting)
+                counters['mean_queue_ms'] = round(counters.pop('queue_seconds') / granted * 1000, 3) if granted else 0.0
+                queued = {}
+                for waiter in state.waiting:
+                    name = priorities.get(waiter.rank, str(waiter.rank))
+                    queued[name] = queued.get(name, 0) + 1
+                models[model] = {
+                    **counters,
+                    'concurrency_limit': round(state.limit, 2),
+                    'in_flight': state.in_flight,
+                    'queued': queued,
+                    'latency_ewma_ms': round(state.latency_ewma * 1000, 3) if state.latency_ewma else None,
+                }
+        return models
+
+
+class _GuardedStream:
+    """A streamed response that keeps its gateway slot until it is consumed or closed"""
+
+    def __init__(self, stream, on_done: Callable[[], None]):
+        self._stream = stream
+        self._on_done = on_done
+        self._done = False
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._on_done()
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._finish()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            self._finish()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        # Abandoned without being read to the end
+        self._finish()
+
+
+class GatewayClient:
+    """
+    An OpenAI / AsyncOpenAI client whose `.create()` calls go through the
+    gateway. Everything else (resources, attributes, close()) is the SDK's.
+    """
+
+    def __init__(self, client, gateway: OpenAIGateway, is_async: bool, path: str = ''):
+        self._client = client
+        self._gateway = gateway
+        self._is_async = is_async
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if name == 'create' and callable(attr):
+            gateway = self._gateway
+            if self._is_async:
+                async def create(**kwargs):
+                    return await gateway.acall(path, attr, kwargs)
+            else:
+                def create(**kwargs):
+                    return gateway.call(path, attr, kwargs)
+            return create
+        if callable(attr) or isinstance(attr, (str, bytes, int, float, bool, dict, list, tuple, type(None))):
+            return attr
+        return GatewayClient(attr, self._gateway, self._is_async, path)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_openai_gateway() -> OpenAIGateway:
+    """Process-wide gateway; its counters back /api/metrics"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = OpenAIGateway()
+    return _gateway
+
+
+def _reset_after_fork():
+    # A forked worker starts with its own gateway; the parent's may hold locks taken by threads that don't exist here
+    global _gateway, _gateway_lock
+    _gateway = None
+    _gateway_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
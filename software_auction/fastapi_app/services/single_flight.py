@@ -0,0 +1,240 @@
+"""
+Single-flight coalescing of identical upstream work.
+
+Callers that ask for the same thing while it is already being computed -
+several attendees requesting the summary of a meeting that just ended, a
+dashboard polling the same web search - wait for the one in-flight call
+instead of repeating its embeddings, vector search, CSE and completion
+calls. Nothing is kept once the call finishes; this is not a cache.
+
+Within a process, followers share the leader's result directly. When
+SINGLE_FLIGHT_CONFIG['CACHE_ALIAS'] names a shared Django cache (Redis,
+Memcached, database), processes coalesce too: the leader holds a lock key
+while it runs and publishes its result for RESULT_TTL seconds, and other
+processes poll for it. For example:
+
+    CACHES['single_flight'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/2',
+    }
+
+Cache failures fall back to calling upstream, so coalescing can never
+break a request.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, Callable, Optional
+
+from ..settings import SINGLE_FLIGHT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_LOCAL_BACKENDS = ('LocMemCache', 'DummyCache')
+_MISSING = object()
+
+
+def request_key(namespace: str, **params) -> str:
+    """Canonical key of an upstream request: sha256 over its namespace and parameters"""
+    payload = json.dumps({'namespace': namespace, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def shared_cache_alias() -> Optional[str]:
+    """The configured Django cache alias if it is shared between processes, else None"""
+    alias = SINGLE_FLIGHT_CONFIG['CACHE_ALIAS']
+    if not alias:
+        return None
+    try:
+        from django.conf import settings
+        backend = getattr(settings, 'CACHES', {}).get(alias, {}).get('BACKEND', '')
+    except Exception as e:
+        logger.error(f"Error reading cache settings: {str(e)}")
+        return None
+    if not backend or backend.endswith(_LOCAL_BACKENDS):
+        return None
+    return alias
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    do() runs fn once per key at a time and hands every caller its own
+    copy of the result; async handlers reach it through asyncio.to_thread.
+    Exceptions reach every caller.
+    """
+
+    def __init__(self, enabled: bool = None, cache_alias: str = _MISSING):
+        self.enabled = SINGLE_FLIGHT_CONFIG['ENABLED'] if enabled is None else enabled
+        self.cache_alias = shared_cache_alias() if cache_alias is _MISSING else cache_alias
+        self.lock_timeout = SINGLE_FLIGHT_CONFIG['LOCK_TIMEOUT']
+        self.result_ttl = SINGLE_FLIGHT_CONFIG['RESULT_TTL']
+        self.poll_interval = SINGLE_FLIGHT_CONFIG['POLL_INTERVAL']
+        self.wait_timeout = SINGLE_FLIGHT_CONFIG['WAIT_TIMEOUT']
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def count(self, namespace: str, name: str, n: int = 1):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {
+                'calls': 0,
+                'upstream': 0,  # Calls that actually ran fn
+                'coalesced': 0,  # Shared another caller's in-flight call in this process
+                'coalesced_remote': 0,  # Picked up a result published by another process
+                'errors': 0,
+            })
+            counters[name] += n
+
+    def do(self, key: str, fn: Callable[[], Any], namespace: str = 'default') -> Any:
+        """fn(), or the result of the identical call already in flight"""
+        if not self.enabled:
+            return fn()
+        self.count(namespace, 'calls')
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+
+        if not leader:
+            flight.done.wait()
+            self.count(namespace, 'coalesced')
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            result = self._remote(key, fn, namespace) if self.cache_alias else self._upstream(fn, namespace)
+        except BaseException as e:
+            flight.error = e
+            self._land(key, flight)
+            flight.done.set()
+            raise
+        # Followers copy a snapshot the leader's caller can't mutate under them
+        flight.result = copy.deepcopy(result) if self._land(key, flight) else result
+        flight.done.set()
+        return result
+
+    def _land(self, key: str, flight: _Flight) -> int:
+        """Stop new callers joining the flight; returns how many joined it"""
+        with self._lock:
+            self._flights.pop(key, None)
+            return flight.followers
+
+    def _upstream(self, fn: Callable[[], Any], namespace: str) -> Any:
+        self.count(namespace, 'upstream')
+        try:
+            return fn()
+        except Exception:
+            self.count(namespace, 'errors')
+            raise
+
+    def _remote(self, key: str, fn: Callable[[], Any], namespace: str) -> Any:
+        """Cross-process single flight through the shared cache"""
+        lock_key, result_key = f"single_flight:{key}:lock", f"single_flight:{key}:result"
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            acquired = self._cache_call('add', lock_key, self._owner, self.lock_timeout)
+            if acquired is None:
+                break  # Cache unavailable
+            if acquired:
+                try:
+                    result = self._upstream(fn, namespace)
+                    self._cache_call('set', result_key, result, self.result_ttl)
+                    return result
+                finally:
+                    self._cache_call('delete', lock_key)
+
+            # Another process is computing it
+            while time.monotonic() < deadline:
+                found = self._remote_result(result_key, lock_key)
+                if found is None:
+                    break
+                if found is not _MISSING:
+                    self.count(namespace, 'coalesced_remote')
+                    return found
+                time.sleep(self.poll_interval)
+        return self._upstream(fn, namespace)
+
+    def _remote_result(self, result_key: str, lock_key: str):
+        """The published result, _MISSING while the leader still runs, None once it is gone without one"""
+        found = self._cache_call('get', result_key, _MISSING)
+        if found is not None and found is not _MISSING:
+            return found
+        if self._cache_call('get', lock_key) is None:
+            # Leader finished (or failed) between the two reads
+            found = self._cache_call('get', result_key, _MISSING)
+            return None if found is _MISSING else found
+        return _MISSING
+
+    def _cache_call(self, method: str, *args):
+        """A cache operation, or None when the cache fails"""
+        from django.core.cache import caches
+        try:
+            return getattr(caches[self.cache_alias], method)(*args)
+        except Exception as e:
+            logger.error(f"Single-flight cache {method} failed: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._counters.items()}
+            in_flight = len(self._flights)
+        totals = {'calls': 0, 'upstream': 0, 'coalesced': 0, 'coalesced_remote': 0, 'errors': 0}
+        for counters in namespaces.values():
+            counters['saved_upstream_calls'] = counters['coalesced'] + counters['coalesced_remote']
+            for name in totals:
+                totals[name] += counters[name]
+        totals['saved_upstream_calls'] = totals['coalesced'] + totals['coalesced_remote']
+        totals['saved_rate'] = round(totals['saved_upstream_calls'] / totals['calls'], 4) if totals['calls'] else 0.0
+        return {
+            'enabled': self.enabled,
+            'shared_cache': self.cache_alias,
+            'in_flight': in_flight,
+            **totals,
+            'namespaces': namespaces,
+        }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide coalescer; its counters back the metrics endpoints"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def _reset_after_fork():
+    # Flights in progress in the parent never finish in a forked worker
+    global _single_flight, _single_flight_lock
+    _single_flight = None
+    _single_flight_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
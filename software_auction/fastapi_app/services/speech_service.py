@@ -1,7 +1,8 @@
 from pathlib import Path
 import os
 import logging
-from openai import OpenAI
+from .openai_clients import get_async_openai_client
+from .openai_gateway import openai_priority
 from fastapi import HTTPException
 import uuid
 import json
@@ -16,7 +17,7 @@ logger = logging.getLogger(__name__)
 
 class SpeechService:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = get_async_openai_client()
         # Update path to be relative to Django project
         self.audio_dir = Path(__file__).resolve().parent.parent.parent.parent / 'media' / 'tts_audio'
         self.audio_dir.mkdir(parents=True, exist_ok=True)
@@ -33,13 +34,14 @@ class SpeechService:
             filename = f"speech_{uuid.uuid4()}.mp3"
             speech_file_path = self.audio_dir / filename
             
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
+            with openai_priority('realtime'):
+                response = await self.client.audio.speech.create(
+                    model="tts-1",
+                    voice=voice,
+                    input=text
+                )
             
-            response.stream_to_file(str(speech_file_path))
+            await asyncio.to_thread(speech_file_path.write_bytes, response.content)
             
             return {
                 'status': 'success',
@@ -2,7 +2,8 @@ import os
 import logging
 from pathlib import Path
 import tempfile
-from openai import OpenAI
+from .openai_clients import get_async_openai_client
+from .openai_gateway import openai_priority
 from fastapi import HTTPException, UploadFile, File
 import aiofiles
 
@@ -15,7 +16,7 @@ class TranscriptionService:
             logger.error("OPENAI_API_KEY environment variable is not set!")
             raise RuntimeError("OpenAI API key is not configured")
             
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_async_openai_client()
         
     async def transcribe_audio(self, audio_file: UploadFile) -> dict:
         """Transcribe audio file using OpenAI Whisper"""
@@ -42,8 +43,8 @@ class TranscriptionService:
             try:
                 # Transcribe the audio
                 logger.info("Starting transcription...")
-                with open(tmp_file_path, 'rb') as f:
-                    transcript = self.client.audio.transcriptions.create(
+                with open(tmp_file_path, 'rb') as f, openai_priority('realtime'):
+                    transcript = await self.client.audio.transcriptions.create(
                         model="whisper-1",
                         file=f,
                         response_format="text",
@@ -1,6 +1,8 @@
 import os
 import logging
-from openai import OpenAI
+import asyncio
+from .openai_clients import get_openai_client
+from .openai_gateway import openai_priority
 from pathlib import Path
 import uuid
 from fastapi import HTTPException, Form
@@ -14,7 +16,7 @@ class TTSService:
             logger.error("OPENAI_API_KEY environment variable is not set!")
             raise RuntimeError("OpenAI API key is not configured")
         
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_openai_client()
         # Get the media directory path from the FastAPI app
         self.media_dir = Path(__file__).resolve().parent.parent.parent.parent / 'media' / 'tts_audio'
         self.media_dir.mkdir(parents=True, exist_ok=True)
@@ -28,11 +30,12 @@ class TTSService:
                     'message': 'Text is required'
                 }
 
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
+            with openai_priority('realtime'):
+                response = self.client.audio.speech.create(
+                    model="tts-1",
+                    voice=voice,
+                    input=text
+                )
             
             # Generate a unique filename
             filename = f"speech_{uuid.uuid4()}.mp3"
@@ -60,7 +63,7 @@ class TTSService:
         if not text:
             raise HTTPException(status_code=422, detail="Text is required")
             
-        result = self.generate_speech(text, voice)
+        result = await asyncio.to_thread(self.generate_speech, text, voice)
         if result['status'] == 'error':
             raise HTTPException(status_code=500, detail=result['message'])
         return result 
\ No newline at end of file
@@ -25,4 +25,251 @@ ALLOWED_ORIGINS = [
     "http://localhost:8000",   # Django server alternative
     "http://127.0.0.1:8001",  # FastAPI server
     "http://localhost:8001",   # FastAPI server alternative
-] 
\ No newline at end of file
+] 
+
+# Vector Index Settings
+# The ANN index operator class must match the distance function used at query time
+VECTOR_DISTANCE_METRIC = "l2"  # Options: "l2", "cosine", "inner_product"
+VECTOR_INDEX_CONFIG = {
+    'TYPE': 'hnsw',  # Options: "hnsw", "ivfflat"
+    'HNSW_M': 16,
+    'HNSW_EF_CONSTRUCTION': 64,
+    'HNSW_EF_SEARCH': 40,  # pgvector default, raise for better recall
+    'IVFFLAT_LISTS': None,  # None derives lists from the row count at build time
+    'IVFFLAT_PROBES': 1,
+    'MAINTENANCE_WORK_MEM': '512MB',
+    # Search a compressed index ("halfvec" or "binary", pgvector >= 0.7) and rerank
+    # the candidates on full-precision vectors. Must match the index that was built.
+    'QUANTIZATION': None,
+    'RERANK_FACTOR': 4,  # Coarse candidates per requested result (binary needs more than halfvec)
+}
+
+# Embedding Cache Settings
+# Memory tier is per process; the sqlite disk tier is shared by all workers
+EMBEDDING_CACHE_CONFIG = {
+    'MEMORY_MAX_BYTES': 64 * 1024 * 1024,  # ~10k ada-002 vectors at float32
+    'DISK_ENABLED': True,
+    'DISK_PATH': os.getenv(
+        'EMBEDDING_CACHE_PATH',
+        os.path.join(BASE_DIR, '.cache', 'embeddings.sqlite3')
+    ),
+}
+
+# Embedding Provider Settings
+# 'DOCUMENTS' embeds Document rows and retrieval queries, so its dimensions must
+# match Document.embedding. 'SIMILARITY' only compares texts with each other
+# (context / web result filtering) and can be any model, e.g. the local ONNX one.
+EMBEDDING_CONFIG = {
+    'PROVIDERS': {
+        'openai': {'BACKEND': 'openai', 'MODEL': EMBEDDING_MODEL_NAME},
+        'local': {
+            'BACKEND': 'onnx',
+            'MODEL_PATH': os.getenv(
+                'LOCAL_EMBEDDING_MODEL',
+                os.path.join(BASE_DIR, 'models', 'all-MiniLM-L6-v2', 'model.onnx')
+            ),
+            'TOKENIZER': None,  # tokenizer.json path or Hugging Face repo; None looks next to the model
+            'DIMENSIONS': None,  # None reads it from the model's output shape
+            'POOLING': 'mean',  # Options: "mean", "cls"
+            'MAX_LENGTH': 256,  # Tokens per input; longer inputs are truncated
+            'BATCH_SIZE': 32,
+            'THREADS': None,  # onnxruntime intra-op threads; None uses every core
+        },
+    },
+    'DOCUMENTS': os.getenv('EMBEDDING_PROVIDER', 'openai'),
+    'SIMILARITY': os.getenv('SIMILARITY_EMBEDDING_PROVIDER', 'openai'),
+}
+
+# Lexical / Hybrid Retrieval Settings
+# Baked into Document.search_vector; changing it needs a migration
+TEXT_SEARCH_CONFIG = "english"
+RETRIEVAL_CONFIG = {
+    # Options: "vector", "lexical", "hybrid" (reciprocal-rank fusion of both), "auto" (lexical
+    # first for identifier and code lookups, hybrid otherwise)
+    'MODE': 'hybrid',
+    'RRF_K': 60,  # Reciprocal-rank fusion constant
+    'CANDIDATES': 20,  # Candidates taken from each retriever before fusion
+    'KEYWORD_MAX_TERMS': 4,  # Identifier queries up to this many terms may take the lexical fast path (auto)
+    # Filtered ANN search: "overfetch" widens ef_search/probes, "iterative" needs pgvector >= 0.8,
+    # "plain" leaves the scan as is
+    'FILTER_STRATEGY': 'overfetch',
+    'FILTER_OVERFETCH': 10,  # ef_search >= k * FILTER_OVERFETCH, probes * FILTER_OVERFETCH
+    'MAX_EF_SEARCH': 1000,  # pgvector upper bound
+}
+
+# Post-retrieval chunk selection for prompts (rag.context_packing)
+CONTEXT_PACKING_CONFIG = {
+    'ENABLED': True,
+    'OVERFETCH': 4,  # Candidates fetched per requested chunk
+    'MMR_LAMBDA': 0.7,  # 1.0 ranks by relevance only, lower values favour diversity
+    'DUPLICATE_SIMILARITY': 0.98,  # Cosine similarity at which a candidate counts as a copy of a chosen chunk
+    'TOKEN_BUDGET': 1500,  # Context tokens per prompt
+    'DISTANCE_GAP': 0.3,  # Relative jump in cosine distance that ends the relevant candidates (vector, hybrid)
+    'MIN_K': 1,  # Chunks kept regardless of the distance gap
+}
+
+# Chunking Settings
+# Chunks are sized in embedding-model tokens and cut at sentence boundaries. The
+# tokenizer.json is read from TOKENIZER when the file exists, so offline hosts never
+# reach the Hugging Face hub; fetch it once with
+#   huggingface-cli download Xenova/text-embedding-ada-002 tokenizer.json --local-dir models/text-embedding-ada-002
+# Without it TOKENIZER_REPO is downloaded, and if that fails too chunks are sized by
+# an approximate word-piece count (rag.chunking.ApproximateTokenizer).
+CHUNKING_CONFIG = {
+    'TOKENIZER': os.getenv(
+        'CHUNKING_TOKENIZER',
+        os.path.join(BASE_DIR, 'models', 'text-embedding-ada-002', 'tokenizer.json')
+    ),
+    'TOKENIZER_REPO': 'Xenova/text-embedding-ada-002',  # cl100k_base; None never downloads
+    'MAX_TOKENS': 512,
+    'OVERLAP_TOKENS': 64,
+}
+
+# Document Extraction Settings
+EXTRACTION_CONFIG = {
+    'WORKERS': None,  # Extraction processes; None uses every core
+    'MAX_PENDING_PER_WORKER': 2,  # Files queued per worker ahead of chunking/embedding
+}
+
+# Concurrent ingestion pipeline (mode="pipeline")
+PIPELINE_CONFIG = {
+    'EMBED_CONCURRENCY': int(os.getenv('PIPELINE_EMBED_CONCURRENCY', 4)),  # Embedding requests in flight
+    'QUEUE_SIZE': 8,  # Items buffered between stages before upstream waits
+    'METRICS_INTERVAL': 5,  # Seconds between progress log lines
+}
+
+# Background job queue (manage.py run_job_worker)
+JOB_CONFIG = {
+    'POLL_INTERVAL': 2,  # Seconds an idle worker waits before polling again
+    'STALE_AFTER': 600,  # Seconds without a checkpoint or heartbeat before a running job is reclaimed
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 30,  # Seconds; doubled on every failed attempt
+}
+
+# Map-reduce summaries of long transcripts (rag.summarization)
+SUMMARIZATION_CONFIG = {
+    'LONG_INPUT_TOKENS': 6000,  # Longer transcripts are condensed segment by segment first
+    'SEGMENT_TOKENS': 1500,
+    'SEGMENT_OVERLAP_TOKENS': 100,
+    'MAP_CONCURRENCY': 8,  # Segment completions in flight
+    'MAP_MAX_TOKENS': 400,  # Notes per segment
+    'REDUCE_INPUT_TOKENS': 6000,  # Notes are merged in groups until they fit in one prompt
+    'MEMORY_MAX_ENTRIES': 10_000,
+    'CACHE_ENABLED': True,
+    'CACHE_PATH': os.getenv(
+        'SEGMENT_CACHE_PATH',
+        os.path.join(BASE_DIR, '.cache', 'segment_summaries.sqlite3')
+    ),
+}
+
+# Semantic cache of HybridRAG.query answers (rag.answer_cache). Questions retrieval answers
+# from the full-text index alone (lexical mode, identifier lookups in auto) skip it.
+ANSWER_CACHE_CONFIG = {
+    'ENABLED': os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true',
+    'SIMILARITY_THRESHOLD': 0.95,  # Cosine similarity a new question needs to reuse a stored answer
+    'TTL_SECONDS': 7 * 24 * 3600,  # Answers also expire when the knowledge base version changes
+    'EF_SEARCH': 40,
+}
+
+# Shared OpenAI clients (services.openai_clients). One connection pool per
+# process; handlers await the async client instead of blocking the event loop.
+OPENAI_CLIENT_CONFIG = {
+    'MAX_CONNECTIONS': int(os.getenv('OPENAI_MAX_CONNECTIONS', 100)),
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'KEEPALIVE_EXPIRY': 30.0,  # Seconds an idle pooled connection is kept
+    'CONNECT_TIMEOUT': 10.0,
+    'TIMEOUT': 120.0,  # Whole request; transcriptions of long recordings take a while
+    'MAX_RETRIES': 0,  # Retries are the gateway's (OPENAI_GATEWAY_CONFIG)
+}
+
+# Production serving (gunicorn_conf.py): a preloaded parent forks WORKERS uvicorn workers.
+# FASTAPI_WORKERS=0 starts one worker per core.
+SERVING_CONFIG = {
+    'WORKERS': int(os.getenv('FASTAPI_WORKERS', 1)) or os.cpu_count() or 1,
+    'PRELOAD': os.getenv('FASTAPI_PRELOAD', 'true').lower() == 'true',  # Import the app once, share it copy-on-write
+    'WORKER_CLASS': 'uvicorn.workers.UvicornWorker',
+    'TIMEOUT': 120,  # Seconds a silent worker lives before it is killed and replaced
+    'GRACEFUL_TIMEOUT': 30,  # Seconds a stopping worker gets to finish in-flight requests
+    'KEEPALIVE': 5,
+    'MAX_REQUESTS': int(os.getenv('FASTAPI_MAX_REQUESTS', 0)),  # Recycle workers after this many requests; 0 never
+    'MAX_REQUESTS_JITTER': 100,
+}
+
+# Admission control for every OpenAI call (services.openai_gateway). Budgets are
+# per process, so each process enforces 1/PROCESSES of LIMITS. PROCESSES defaults
+# to the gunicorn worker count (gunicorn_conf.py also picks up `-w`). Job workers
+# and the Django server call OpenAI too: set OPENAI_GATEWAY_PROCESSES to the total
+# number of processes sharing the account to keep all of them within its limits.
+OPENAI_GATEWAY_CONFIG = {
+    'LIMITS': {  # Requests and tokens per minute by model; None disables a budget
+        'default': {'RPM': 500, 'TPM': 200_000},
+        'gpt-4o': {'RPM': 500, 'TPM': 300_000},
+        'gpt-4': {'RPM': 500, 'TPM': 40_000},
+        'gpt-4-turbo-preview': {'RPM': 500, 'TPM': 300_000},
+        'gpt-3.5-turbo': {'RPM': 3500, 'TPM': 200_000},
+        'text-embedding-ada-002': {'RPM': 3000, 'TPM': 1_000_000},
+        'text-embedding-3-small': {'RPM': 3000, 'TPM': 1_000_000},
+        'text-embedding-3-large': {'RPM': 3000, 'TPM': 1_000_000},
+        'whisper-1': {'RPM': 50, 'TPM': None},
+        'tts-1': {'RPM': 50, 'TPM': None},
+    },
+    # Processes sharing the account's budgets (see above)
+    'PROCESSES': int(os.getenv('OPENAI_GATEWAY_PROCESSES', 0)) or SERVING_CONFIG['WORKERS'],
+    'BURST_SECONDS': 10,  # Bucket capacity, in seconds of budget
+    'DEFAULT_COMPLETION_TOKENS': 500,  # Reserved for chat calls without max_tokens
+    'INITIAL_CONCURRENCY': 8,  # In-flight calls per model; grows by 1/limit per success
+    'MIN_CONCURRENCY': 1,
+    'MAX_CONCURRENCY': 64,
+    'DECREASE_FACTOR': 0.5,  # Limit multiplier on a 429
+    'LATENCY_FACTOR': 3.0,  # A call this many times slower than the model's average...
+    'LATENCY_DECREASE': 0.9,  # ...shrinks the limit by this factor
+    'MAX_RETRIES': int(os.getenv('OPENAI_MAX_RETRIES', 4)),
+    'BACKOFF_BASE': 0.5,  # Seconds; full jitter up to BASE * 2**attempt
+    'BACKOFF_MAX': 20.0,
+    'PRIORITIES': {'realtime': 0, 'interactive': 1, 'batch': 2},  # Lower is served first
+    'DEFAULT_PRIORITY': 'interactive',
+    'AGING_SECONDS': 30.0,  # Queued this long counts as one priority level higher
+    'QUEUE_TIMEOUT': 120.0,  # Seconds a call may wait for a slot before GatewayQueueTimeout
+}
+
+# Single-flight coalescing of identical in-flight upstream calls (services.single_flight)
+SINGLE_FLIGHT_CONFIG = {
+    'ENABLED': os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true',
+    # Django cache alias that coalesces across processes; ignored unless it is a shared backend
+    'CACHE_ALIAS': os.getenv('SINGLE_FLIGHT_CACHE', 'single_flight'),
+    'LOCK_TIMEOUT': 300,  # Seconds before a crashed leader's lock expires
+    'RESULT_TTL': 30,  # Seconds a published result stays readable for waiting processes
+    'POLL_INTERVAL': 0.1,
+    'WAIT_TIMEOUT': 300.0,  # Seconds to wait on another process before calling upstream anyway
+}
+
+# External endpoints. The OpenAI SDK reads OPENAI_BASE_URL itself; point both at
+# the stub server (manage.py run_stub_server) to run without network access.
+GOOGLE_CSE_URL = os.getenv('GOOGLE_CSE_URL', 'https://www.googleapis.com/customsearch/v1')
+
+# Local stand-in for OpenAI and Google Custom Search (software_auction.benchmarks.stub_server)
+STUB_SERVER_CONFIG = {
+    'HOST': '127.0.0.1',
+    'PORT': int(os.getenv('STUB_SERVER_PORT', 8900)),
+    'SEED': 0,  # Seeds latency and error sampling; response content is always a function of the input
+    # Lognormal latency per endpoint, in milliseconds. TOKEN_MS is the gap between streamed chat tokens.
+    'LATENCY': {
+        'embeddings': {'MEDIAN_MS': 60, 'P99_MS': 300},
+        'chat': {'MEDIAN_MS': 350, 'P99_MS': 1500, 'TOKEN_MS': 15},
+        'transcriptions': {'MEDIAN_MS': 800, 'P99_MS': 3000},
+        'speech': {'MEDIAN_MS': 400, 'P99_MS': 1500},
+        'search': {'MEDIAN_MS': 250, 'P99_MS': 900},
+        'models': {'MEDIAN_MS': 20, 'P99_MS': 80},
+    },
+    'LATENCY_SCALE': float(os.getenv('STUB_LATENCY_SCALE', 1.0)),  # 0 disables simulated latency
+    'ERROR_RATE': float(os.getenv('STUB_ERROR_RATE', 0.0)),  # Fraction of requests answered with a 5xx
+    # Requests and tokens per minute, enforced like the OpenAI API (429 + Retry-After)
+    'RATE_LIMITS': {
+        'embeddings': {'RPM': 3000, 'TPM': 1_000_000},
+        'chat': {'RPM': 500, 'TPM': 200_000},
+        'transcriptions': {'RPM': 50, 'TPM': None},
+        'speech': {'RPM': 50, 'TPM': None},
+        'search': {'RPM': 100, 'TPM': None},
+    },
+    'COMPLETION_TOKENS': 80,  # Length of chat replies when max_tokens allows
+}
@@ -0,0 +1,134 @@
+"""
+Server-Sent Events for token-streamed completions.
+
+Endpoints produce events as dicts with a 'type' ('token', 'status', 'done'
+or 'error') and sse_response() frames them as `event: <type>` /
+`data: <json>` messages. The time to the first 'token' event and to the
+end of the stream are added to the 'done' event and recorded per endpoint,
+so time-to-first-token can be tracked separately from total latency
+(/api/metrics 'streaming').
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per endpoint for the latency percentiles
+METRICS_WINDOW = 1000
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Keep nginx from buffering the stream
+}
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class StreamMetrics:
+    """Time-to-first-token and total stream time per endpoint, over the last METRICS_WINDOW streams"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, name: str, ttft: float = None, total: float = None, error: bool = False):
+        with self._lock:
+            endpoint = self._endpoints.setdefault(name, {
+                'streams': 0,
+                'errors': 0,
+                'ttft': deque(maxlen=self.window),
+                'total': deque(maxlen=self.window),
+            })
+            endpoint['streams'] += 1
+            if error:
+                endpoint['errors'] += 1
+            if ttft is not None:
+                endpoint['ttft'].append(ttft * 1000)
+            if total is not None:
+                endpoint['total'].append(total * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {
+                name: (endpoint['streams'], endpoint['errors'], list(endpoint['ttft']), list(endpoint['total']))
+                for name, endpoint in self._endpoints.items()
+            }
+        return {
+            name: {
+                'streams': streams,
+                'errors': errors,
+                'ttft_p50_ms': round(_percentile(ttft, 50), 1),
+                'ttft_p95_ms': round(_percentile(ttft, 95), 1),
+                'total_p50_ms': round(_percentile(total, 50), 1),
+                'total_p95_ms': round(_percentile(total, 95), 1),
+            }
+            for name, (streams, errors, ttft, total) in endpoints.items()
+        }
+
+
+stream_metrics = StreamMetrics()
+
+
+async def acompletion_events(client, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Start a streamed chat completion on an AsyncOpenAI client and yield
+    {'type': 'token', 'content'} per content delta.
+    """
+    stream = await client.chat.completions.create(stream=True, **kwargs)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield {'type': 'token', 'content': content}
+
+
+def sse_message(event: Dict[str, Any]) -> str:
+    payload = {key: value for key, value in event.items() if key != 'type'}
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def sse_stream(events: AsyncIterator[Dict[str, Any]], name: str) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    ttft = None
+    error = False
+    try:
+        async for event in events:
+            if event.get('type') == 'token' and ttft is None:
+                ttft = time.perf_counter() - start
+            elif event.get('type') == 'done':
+                event = {
+                    **event,
+                    'ttft_ms': round(ttft * 1000, 1) if ttft is not None else None,
+                    'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                }
+            elif event.get('type') == 'error':
+                error = True
+            yield sse_message(event)
+    except Exception as e:
+        logger.error(f"Error streaming {name}: {str(e)}")
+        error = True
+        yield sse_message({'type': 'error', 'error': str(e)})
+    finally:
+        stream_metrics.record(name, ttft=ttft, total=time.perf_counter() - start, error=error)
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], name: str, headers: Dict[str, str] = None) -> StreamingResponse:
+    """Stream events to the client as text/event-stream, recording latency under `name`"""
+    return StreamingResponse(
+        sse_stream(events, name),
+        media_type='text/event-stream',
+        headers={**SSE_HEADERS, **(headers or {})},
+    )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from software_auction.fastapi_app.rag.vector_index import (
+    INDEX_TYPES,
+    QUANTIZATIONS,
+    existing_vector_indexes,
+    rebuild_vector_index,
+)
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the ANN (HNSW / IVFFlat) index on Document.embedding"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='index_type', choices=INDEX_TYPES,
+                            help="Index type to build (defaults to VECTOR_INDEX_CONFIG['TYPE'])")
+        parser.add_argument('--m', type=int, help="HNSW: max connections per layer")
+        parser.add_argument('--ef-construction', type=int, help="HNSW: candidate list size at build time")
+        parser.add_argument('--lists', type=int, help="IVFFlat: number of inverted lists")
+        parser.add_argument('--quantization', choices=('none',) + QUANTIZATIONS,
+                            help="Index a compressed representation (defaults to VECTOR_INDEX_CONFIG['QUANTIZATION']); "
+                                 "queries only use it when the setting matches")
+        parser.add_argument('--concurrently', action='store_true',
+                            help="Build without locking writes (slower, cannot run in a transaction)")
+        parser.add_argument('--show', action='store_true', help="Only list existing ANN indexes")
+
+    def handle(self, *args, **options):
+        if options['show']:
+            for name, method in existing_vector_indexes().items():
+                self.stdout.write(f"{name}: {method}")
+            return
+
+        try:
+            result = rebuild_vector_index(
+                options['index_type'],
+                concurrently=options['concurrently'],
+                quantization=options['quantization'],
+                m=options['m'],
+                ef_construction=options['ef_construction'],
+                lists=options['lists'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {result['type']} index {result['name']} ({result['opclass']}, "
+            f"quantization: {result['quantization'] or 'none'}) "
+            f"with {result['options']}, replaced {result['dropped']} existing index(es)"
+        ))
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from software_auction.benchmarks import BENCHMARKS, get_benchmark
+from software_auction.benchmarks.common import compare_results
+
+
+def int_list(value: str):
+    try:
+        return [int(item.replace('_', '')) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError(f"Expected a comma-separated list of integers, got '{value}'")
+
+
+class Command(BaseCommand):
+    help = "Run a retrieval benchmark against the configured database and print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help="Benchmark to run")
+        parser.add_argument('--rows', type=int, help="Synthetic rows to seed (default depends on the benchmark)")
+        parser.add_argument('--queries', type=int, default=50, help="Number of query vectors")
+        parser.add_argument('--k', type=int, default=10, help="Results per query")
+        parser.add_argument('--keep', action='store_true',
+                            help="Keep the seeded rows so later runs can reuse them")
+        parser.add_argument('--output', help="Also write the results to this JSON file")
+        parser.add_argument('--baseline',
+                            help="Results JSON from an earlier run; fail if any case's p95 latency or recall regressed")
+        grid = parser.add_argument_group('retrieval benchmark grid (comma-separated)')
+        grid.add_argument('--sizes', type=int_list, help="Corpus sizes, e.g. 10000,100000,1000000,10000000")
+        grid.add_argument('--m', dest='m_values', type=int_list, help="HNSW m values")
+        grid.add_argument('--ef-search', dest='ef_search_values', type=int_list, help="HNSW ef_search values")
+        grid.add_argument('--probes', dest='probes_values', type=int_list, help="IVFFlat probes values")
+        grid.add_argument('--concurrency', type=int_list, help="Concurrent clients")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        params = {
+            key: options[key]
+            for key in ('rows', 'sizes', 'm_values', 'ef_search_values', 'probes_values', 'concurrency')
+            if options[key] is not None
+        }
+        try:
+            result = get_benchmark(options['name']).run(
+                queries=options['queries'],
+                k=options['k'],
+                keep=options['keep'],
+                **params,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if baseline is not None:
+            result['regressions'] = compare_results(result, baseline)
+
+        report = json.dumps(result, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report)
+        self.stdout.write(report)
+
+        if result.get('regressions'):
+            raise CommandError(f"{len(result['regressions'])} regression(s) against {options['baseline']}")
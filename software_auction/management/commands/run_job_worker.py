@@ -0,0 +1,38 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from software_auction.fastapi_app.jobs import JOB_HANDLERS, default_worker_id, run_worker
+
+
+class Command(BaseCommand):
+    help = ("Claim and run queued ingestion / enrichment jobs. Start one per core or node; "
+            "workers coordinate through the job table with SKIP LOCKED")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', dest='kinds', action='append', choices=sorted(JOB_HANDLERS),
+                            help="Only run jobs of this kind (repeatable)")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--poll-interval', type=float, help="Seconds between polls when idle")
+        parser.add_argument('--worker-id', help="Identifier recorded on claimed jobs (default: host:pid:random)")
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            # Finish the current item, checkpoint and hand the job back to the queue
+            self.stdout.write("Stopping after the current item...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        processed = run_worker(
+            worker_id=options['worker_id'] or default_worker_id(),
+            kinds=options['kinds'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            stopping=stopping,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Worker ran {processed} job(s)"))
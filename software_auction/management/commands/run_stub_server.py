@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from software_auction.fastapi_app.settings import STUB_SERVER_CONFIG
+
+
+class Command(BaseCommand):
+    help = ("Serve a local stand-in for the OpenAI and Google Custom Search APIs. Point the app at it with "
+            "OPENAI_BASE_URL=http://HOST:PORT/v1 and GOOGLE_CSE_URL=http://HOST:PORT/customsearch/v1")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=STUB_SERVER_CONFIG['HOST'])
+        parser.add_argument('--port', type=int, default=STUB_SERVER_CONFIG['PORT'])
+        parser.add_argument('--latency-scale', type=float,
+                            help="Multiply the configured latencies (0 disables simulated latency)")
+        parser.add_argument('--error-rate', type=float, help="Fraction of requests answered with a 5xx")
+        parser.add_argument('--seed', type=int, help="Seed for latency and error sampling")
+        parser.add_argument('--no-rate-limits', action='store_true', help="Disable RPM/TPM emulation")
+
+    def handle(self, *args, **options):
+        import uvicorn
+        from software_auction.benchmarks.stub_server import create_app
+
+        config = dict(STUB_SERVER_CONFIG)
+        for option, key in (('latency_scale', 'LATENCY_SCALE'), ('error_rate', 'ERROR_RATE'), ('seed', 'SEED')):
+            if options[option] is not None:
+                config[key] = options[option]
+        if options['no_rate_limits']:
+            config['RATE_LIMITS'] = {}
+
+        base = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(f"Stub server on {base}\n"
+                          f"  export OPENAI_BASE_URL={base}/v1 OPENAI_API_KEY=stub\n"
+                          f"  export GOOGLE_CSE_URL={base}/customsearch/v1")
+        uvicorn.run(create_app(config), host=options['host'], port=options['port'], log_level='warning')
@@ -0,0 +1,31 @@
+from django.db import migrations
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the B-tree index on Document.embedding, which cannot serve
+    nearest-neighbour ORDER BY queries, with an HNSW index using the
+    L2 operator class that matches HybridRAG's L2Distance lookups.
+    """
+
+    dependencies = [
+        ('software_auction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='document',
+            name='software_au_embeddi_683444_idx',
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=pgvector.django.HnswIndex(
+                ef_construction=64,
+                fields=['embedding'],
+                m=16,
+                name='document_embedding_hnsw_idx',
+                opclasses=['vector_l2_ops'],
+            ),
+        ),
+    ]
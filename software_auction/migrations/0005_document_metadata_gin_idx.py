@@ -0,0 +1,16 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('software_auction', '0004_document_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['metadata'], name='document_metadata_gin_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('software_auction', '0006_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeBaseVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnswerCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.TextField()),
+                ('embedding', pgvector.django.VectorField(dimensions=1536)),
+                ('embedding_model', models.CharField(max_length=128)),
+                ('params_hash', models.CharField(max_length=64)),
+                ('kb_version', models.BigIntegerField()),
+                ('response', models.JSONField(default=dict)),
+                ('latency_ms', models.FloatField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [
+                    pgvector.django.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='answercache_embedding_hnsw_idx', opclasses=['vector_cosine_ops']),
+                    models.Index(fields=['kb_version', 'params_hash'], name='answercache_version_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def build_vector_index(apps, schema_editor):
+    """Rebuild the HNSW index from 0002 if its operator class doesn't match VECTOR_DISTANCE_METRIC"""
+    from software_auction.fastapi_app.rag.vector_index import (
+        create_vector_index, index_expression, vector_index_definitions,
+    )
+
+    definitions = vector_index_definitions()
+    legacy = definitions.get('document_embedding_hnsw_idx')
+    if legacy and f" {index_expression()[1]}" in legacy:
+        return
+    if legacy:
+        schema_editor.execute('DROP INDEX IF EXISTS "document_embedding_hnsw_idx"')
+    if not definitions or legacy:
+        create_vector_index('hnsw', quantization='none')
+
+
+class Migration(migrations.Migration):
+    """
+    Hand the ANN index on Document.embedding over to rag.vector_index.
+    0002 declared it with vector_l2_ops regardless of the configured
+    metric, and rebuild_vector_index replaces it outside the migration
+    state. It is dropped from the model state only; the database index is
+    rebuilt with the metric's operator class when that doesn't match.
+    """
+
+    dependencies = [
+        ('software_auction', '0007_answer_cache'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='document', name='document_embedding_hnsw_idx'),
+            ],
+        ),
+        migrations.RunPython(build_vector_index, migrations.RunPython.noop),
+    ]
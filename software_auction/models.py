@@ -0,0 +1,9 @@
+# Models are defined alongside the FastAPI services; import them here so
+# Django registers them with the software_auction app and its migrations.
+from .fastapi_app.models import (  # noqa: F401
+    AnswerCacheEntry,
+    Document,
+    IngestionJob,
+    KnowledgeBaseFile,
+    KnowledgeBaseVersion,
+)
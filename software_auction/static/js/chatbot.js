@@ -288,7 +288,12 @@ class Chatbot {
                 body: JSON.stringify({})
             });
 
-            const data = await response.json();
+            const queued = await response.json();
+            if (queued.status !== 'queued') {
+                throw new Error(queued.message || 'Failed to enrich knowledge base');
+            }
+            const job = await this.waitForJob(queued.job_id);
+            const data = job.status === 'succeeded' ? { status: 'success', ...job.result } : { message: job.error };
 
             if (data.status === 'success') {
                 await this.addMessage('Knowledge base has been successfully enriched! I now have more information to help you.', 'bot');
@@ -317,6 +322,26 @@ class Chatbot {
         }
     }
 
+    async waitForJob(jobId, interval = 2000, timeout = 30 * 60 * 1000) {
+        // Poll a background job until it finishes or the deadline passes
+        const deadline = Date.now() + timeout;
+        while (Date.now() < deadline) {
+            const response = await fetch(`${this.fastApiUrl}/api/jobs/${jobId}`);
+            if (!response.ok) {
+                throw new Error(`Job status request failed (${response.status})`);
+            }
+            const job = await response.json();
+            if (!job.status) {
+                throw new Error(job.message || 'Invalid job status response');
+            }
+            if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+                return job;
+            }
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+        throw new Error(`Job ${jobId} did not finish in time - is a job worker running?`);
+    }
+
     showNotification(message, type = 'success') {
         const notification = document.createElement('div');
         notification.className = `notification ${type}`;
@@ -1,5 +1,5 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 import os
 import logging
@@ -11,7 +11,14 @@ from .fastapi_app.services.websearch_service import WebSearchService
 from .fastapi_app.rag.rag_service import RAGService
 from django.views.decorators.csrf import csrf_protect
 from django.middleware.csrf import get_token
-from .fastapi_app.services.analysis_service import AnalysisService
+from .fastapi_app.services.embedding_cache import get_embedding_cache
+from .fastapi_app.services.openai_clients import get_openai_client
+from .fastapi_app.services.openai_gateway import openai_priority, get_openai_gateway
+from .fastapi_app.services.single_flight import get_single_flight
+from .fastapi_app.rag.pipeline import active_pipelines
+from .fastapi_app.rag.answer_cache import get_answer_cache
+from .fastapi_app.lifecycle import get_rag, get_analysis_service, status as rag_status
+from .fastapi_app.jobs import enqueue_ingest, get_job_status, cancel_job as cancel_background_job
 from software_auction.fastapi_app.services.transcription_service import TranscriptionService
 
 logger = logging.getLogger(__name__)
@@ -23,7 +30,6 @@ KNOWLEDGE_BASE_DIR = os.path.join(
 )
 
 # Add to existing imports
-analysis_service = AnalysisService()
 transcription_service = TranscriptionService()
 
 @never_cache  # Add this decorator
@@ -44,11 +50,60 @@ def health_check(request):
             'error': str(e)
         }, status=500)
 
+@require_http_methods(["GET"])
+def readiness(request):
+    """Readiness probe: 200 once the shared RAG services are warmed up"""
+    state = rag_status()
+    return JsonResponse(state, status=200 if state['ready'] else 503)
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Process-local service counters"""
+    return JsonResponse({
+        'embedding_cache': get_embedding_cache().stats(),
+        'answer_cache': get_answer_cache().stats(),
+        'openai_gateway': get_openai_gateway().stats(),
+        'single_flight': get_single_flight().stats(),
+        'ingestion_pipelines': active_pipelines(),
+    })
+
 @csrf_protect
 @require_http_methods(["POST"])
 def enrich_knowledge_base(request):
-    """Enrich knowledge base with content"""
-    return RAGService.handle_enrich_knowledge_base(request)
+    """Queue a knowledge base enrichment job and return its ID"""
+    data = json.loads(request.body) if request.body else {}
+    result = RAGService.handle_enrich_knowledge_base(data)
+    return JsonResponse(result, status=202 if result['status'] == 'queued' else 500)
+
+@csrf_protect
+@require_http_methods(["POST"])
+def ingest_documents(request):
+    """Queue ingestion of a directory of documents and return the job ID"""
+    try:
+        data = json.loads(request.body) if request.body else {}
+        job = enqueue_ingest(data.get('directory'), data.get('workers'))
+        return JsonResponse({'status': 'queued', 'job_id': job.id}, status=202)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error queueing document ingestion: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def job_status(request, job_id):
+    """Status and progress of a background job"""
+    state = get_job_status(job_id)
+    if state is None:
+        return JsonResponse({'status': 'error', 'message': f'Job {job_id} not found'}, status=404)
+    return JsonResponse(state)
+
+@csrf_protect
+@require_http_methods(["POST"])
+def cancel_job(request, job_id):
+    state = cancel_background_job(job_id)
+    if state is None:
+        return JsonResponse({'status': 'error', 'message': f'Job {job_id} not found'}, status=404)
+    return JsonResponse(state)
 
 @require_http_methods(["GET"])
 def inspect_knowledge_base(request):
@@ -92,8 +147,8 @@ def generate_insights(request):
                 'error': 'No transcript provided'
             })
 
-        # Initialize HybridRAG with existing knowledge base
-        hybrid_rag = HybridRAG()
+        # Shared, pre-warmed HybridRAG instance
+        hybrid_rag = get_rag()
         
         # Generate insights using RAG
         result = hybrid_rag.generate_insights(transcript)
@@ -129,7 +184,7 @@ def generate_summary(request):
         data = json.loads(request.body)
         transcription = data.get('transcript', '')
         
-        hybrid_rag = HybridRAG()
+        hybrid_rag = get_rag()
         result = hybrid_rag.generate_summary(transcription)
         
         if 'error' in result:
@@ -148,6 +203,33 @@ def generate_summary(request):
         logger.error(f"Error generating summary: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+@require_http_methods(["POST"])
+@ensure_csrf_cookie
+def analyze_transcript(request):
+    """
+    Insights, summary and knowledge-base gaps for a transcript from one
+    retrieval, with the three completions running concurrently. Streams one
+    JSON object per line as each stage finishes (see AnalysisService.iter_analysis).
+    """
+    try:
+        data = json.loads(request.body)
+        transcript = data.get('transcript', '')
+        if not transcript:
+            return JsonResponse({'status': 'error', 'error': 'No transcript provided'}, status=400)
+
+        events = get_analysis_service().iter_analysis(transcript, long_input=data.get('long_input'))
+        response = StreamingHttpResponse(
+            (json.dumps(event, default=str) + "\n" for event in events),
+            content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error analyzing transcript: {str(e)}")
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=500)
+
 @require_http_methods(["POST"])
 def search_knowledge(request):
     try:
@@ -251,8 +333,8 @@ def transcribe_whisper(request):
         logger.info(f"Received audio file: {audio_file.name}, size: {audio_file.size} bytes, content_type: {audio_file.content_type}")
 
         try:
-            # Initialize OpenAI client
-            client = OpenAI()
+            # Shared OpenAI client
+            client = get_openai_client()
             
             # Convert InMemoryUploadedFile to bytes-like object
             audio_content = audio_file.read()
@@ -262,11 +344,12 @@ def transcribe_whisper(request):
             audio_io.name = 'audio.wav'  # OpenAI needs a filename
             
             # Send audio file to OpenAI API
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_io,
-                response_format="text"
-            )
+            with openai_priority('realtime'):
+                response = client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_io,
+                    response_format="text"
+                )
             
             # Convert response to string
             transcript_text = str(response)
@@ -301,7 +384,7 @@ def generate_analysis_instructions(request):
         transcript = data.get('transcript', '')
         use_llama = data.get('use_llama', False)  # Get model preference from request
         
-        result = analysis_service.generate_analysis_instructions(transcript, use_llama)
+        result = get_analysis_service().generate_analysis_instructions(transcript, use_llama)
         return JsonResponse(result)
         
     except Exception as e: